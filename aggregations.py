@@ -0,0 +1,287 @@
+import polars as pl
+
+from chart_specs import compute_specs, dataset_specs, section_charts
+from cohorts import cohort
+from dimensions import compute_linked, linked_summary
+from filters import FILTER_COLUMNS, apply_filters, effective_filters, selected_years
+from sketches import DistinctSketch
+from timeseries import compute_trends, trends_summary
+from tracing import traced
+
+# ============================================
+# AGREGACIONES PURAS (SIN STREAMLIT)
+# ============================================
+# Estas funciones calculan los mismos números que muestran las secciones del
+# dashboard, pero sin dibujar nada, para que puedan reutilizarse desde procesos
+# sin interfaz (reportes PDF, exportaciones por lotes, etc.).
+
+
+def _charts(charts: dict | None, frames: dict, dataset: str):
+    """Resultados del motor de especificaciones, calculándolos si no vienen dados"""
+    return charts if charts is not None else compute_specs(frames, dataset_specs(dataset))
+
+
+def _totals(totals: dict | None, df: pl.DataFrame):
+    """Totales escalares del dataset, calculándolos si no vienen dados"""
+    return totals if totals is not None else dataset_totals(df)
+
+
+def _total(data: pl.DataFrame | None, column: str):
+    return int(data[column].sum()) if data is not None else 0
+
+
+# Columnas que se suman para los totales de cada dataset
+TOTAL_COLUMNS = ["Personas por ocurrencia", "Personas que llegaron", "Eventos"]
+
+
+def dataset_totals(df: pl.DataFrame, mergeable: bool = False):
+    """Totales escalares de un dataset; con mergeable, los departamentos distintos van como DistinctSketch"""
+    totals = {"rows": df.shape[0], "sums": {col: df[col].sum() for col in TOTAL_COLUMNS if col in df.columns}}
+    if "Vigencia" in df.columns:
+        years = df["Vigencia"].drop_nulls()
+        totals["min_year"] = years.min() if years.len() else None
+        totals["max_year"] = years.max() if years.len() else None
+    if "ESTADO_DEPTO" in df.columns:
+        depts = df["ESTADO_DEPTO"]
+        totals["depts"] = DistinctSketch().update(depts) if mergeable else depts.n_unique()
+    return totals
+
+
+def merge_totals(parts: list):
+    """Combina los totales de porciones disjuntas de un mismo dataset (dataset_totals con mergeable)"""
+    merged = {"rows": sum(part["rows"] for part in parts), "sums": {}}
+    for part in parts:
+        for col, value in part["sums"].items():
+            merged["sums"][col] = merged["sums"].get(col, 0) + value
+        for key, pick in (("min_year", min), ("max_year", max)):
+            if key in part:
+                values = [v for v in (merged.get(key), part[key]) if v is not None]
+                merged[key] = pick(values) if values else None
+        if "depts" in part:
+            merged["depts"] = merged["depts"].merge(part["depts"]) if "depts" in merged else part["depts"]
+    return merged
+
+
+def kpi_totals(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame,
+               subject_totals: dict | None = None, arrival_totals: dict | None = None):
+    """Totales de la sección de indicadores clave"""
+    subjects = _totals(subject_totals, df_subjects)
+    arrivals = _totals(arrival_totals, df_arrivals)
+    kpis = {}
+    if "Personas por ocurrencia" in subjects["sums"]:
+        kpis["total_victims"] = int(subjects["sums"]["Personas por ocurrencia"])
+    if "Personas que llegaron" in arrivals["sums"]:
+        kpis["total_displaced"] = int(arrivals["sums"]["Personas que llegaron"])
+    if "Eventos" in arrivals["sums"]:
+        kpis["total_events"] = int(arrivals["sums"]["Eventos"])
+    if "depts" in arrivals:
+        depts = arrivals["depts"]
+        kpis["unique_depts"] = depts.estimate() if isinstance(depts, DistinctSketch) else depts
+    return kpis
+
+
+def temporal_summary(df_arrivals: pl.DataFrame, charts: dict | None = None):
+    """Serie anual de personas desplazadas y eventos"""
+    return _charts(charts, {"arrivals": df_arrivals}, "arrivals")["temporal"]
+
+
+def geographic_summary(df_arrivals: pl.DataFrame, charts: dict | None = None):
+    """Top 10 departamentos con mayor recepción de desplazados"""
+    return _charts(charts, {"arrivals": df_arrivals}, "arrivals")["geographic"]
+
+
+def demographic_summary(df_subjects: pl.DataFrame, charts: dict | None = None):
+    """Distribuciones por etnia, ciclo vital y sexo"""
+    return section_charts(_charts(charts, {"subjects": df_subjects}, "subjects"), "demographic")
+
+
+def comparative_summary(df_subjects: pl.DataFrame, charts: dict | None = None):
+    """Hechos victimizantes principales y víctimas por discapacidad"""
+    return section_charts(_charts(charts, {"subjects": df_subjects}, "subjects"), "comparative")
+
+
+def minorities_summary(df_subjects: pl.DataFrame, charts: dict | None = None, totals: dict | None = None):
+    """Agregados de minorías étnicas (excluye 'Ninguna')"""
+    minorities = section_charts(_charts(charts, {"subjects": df_subjects}, "subjects"), "minorities")
+    if minorities["by_etnia"] is None:
+        return None
+
+    return {
+        "total_minorities": _total(minorities["by_etnia"], "Total Víctimas"),
+        "total_all_victims": int(_totals(totals, df_subjects)["sums"]["Personas por ocurrencia"]),
+        "ninguna_count": _total(minorities["sin_etnia"], "Total"),
+        "by_etnia": minorities["by_etnia"],
+        "by_hecho": minorities["by_hecho"],
+    }
+
+
+def children_summary(df_subjects: pl.DataFrame, charts: dict | None = None, totals: dict | None = None):
+    """Agregados de menores de edad"""
+    children = section_charts(_charts(charts, {"subjects": df_subjects}, "subjects"), "children")
+    by_age = children["by_age"]
+    if by_age is None:
+        return None
+
+    summary = {
+        "total_children": _total(by_age, "Total Víctimas"),
+        "total_victims": int(_totals(totals, df_subjects)["sums"]["Personas por ocurrencia"]),
+        "children_events": _total(by_age, "Registros"),
+        "by_age": by_age,
+        "by_hecho": children["by_hecho"],
+        "by_hecho_full": children["by_hecho_full"],
+        "by_etnia": children["by_etnia"],
+        "total_minority_children": _total(children["etnia_full"], "Total Menores"),
+        "by_sexo": children["by_sexo"],
+        "yearly": children["yearly"],
+    }
+
+    # Niñas y niños salen del mismo agregado por sexo
+    by_sexo = children["by_sexo"]
+    if by_sexo is not None:
+        summary["girls"] = _total(by_sexo.filter(cohort(by_sexo, "mujer")), "Total")
+        summary["boys"] = _total(by_sexo.filter(cohort(by_sexo, "hombre")), "Total")
+    return summary
+
+
+def critical_summary(df_arrivals: pl.DataFrame, charts: dict | None = None, totals: dict | None = None):
+    """Indicadores de calidad de datos: departamentos sin definir y cobertura temporal"""
+    undefined = _charts(charts, {"arrivals": df_arrivals}, "arrivals")["critical.undefined"]
+    totals = _totals(totals, df_arrivals)
+    summary = {}
+
+    if undefined is not None:
+        summary["total_arrivals"] = totals["rows"]
+        summary["undefined_count"] = _total(undefined, "Registros")
+        if "Personas que llegaron" in undefined.columns:
+            summary["undefined_people"] = _total(undefined, "Personas que llegaron")
+            summary["total_people"] = int(totals["sums"]["Personas que llegaron"])
+
+    if "min_year" in totals:
+        summary["min_year"] = totals["min_year"]
+        summary["max_year"] = totals["max_year"]
+
+    return summary
+
+
+def subject_sections(charts: dict, totals: dict):
+    """Secciones de víctimas a partir de resultados y totales ya calculados"""
+    return {
+        "demographic": demographic_summary(None, charts),
+        "minorities": minorities_summary(None, charts, totals),
+        "comparative": comparative_summary(None, charts),
+        "children": children_summary(None, charts, totals),
+    }
+
+
+def arrival_sections(charts: dict, totals: dict):
+    """Secciones de llegadas a partir de resultados y totales ya calculados"""
+    return {
+        "temporal": temporal_summary(None, charts),
+        "geographic": geographic_summary(None, charts),
+        "critical": critical_summary(None, charts, totals),
+    }
+
+
+@traced()
+def compute_subject_sections(df_subjects: pl.DataFrame):
+    """Agregados de todas las secciones que solo dependen de víctimas"""
+    charts = compute_specs({"subjects": df_subjects}, dataset_specs("subjects"))
+    return subject_sections(charts, dataset_totals(df_subjects))
+
+
+@traced()
+def compute_arrival_sections(df_arrivals: pl.DataFrame, years=None):
+    """Agregados de todas las secciones que solo dependen de llegadas (years: filtro de años aplicado)"""
+    charts = compute_specs({"arrivals": df_arrivals}, dataset_specs("arrivals"))
+    sections = arrival_sections(charts, dataset_totals(df_arrivals))
+    sections["trends"] = compute_trends(df_arrivals, years)
+    return sections
+
+
+@traced()
+def compute_sections(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, years=None):
+    """Calcula los agregados de todas las secciones para un par de DataFrames filtrados (years: filtro de años)"""
+    sections = {"kpis": kpi_totals(df_subjects, df_arrivals)}
+    sections.update(compute_subject_sections(df_subjects))
+    sections.update(compute_arrival_sections(df_arrivals, years))
+    sections["linked"] = compute_linked(df_subjects, df_arrivals)
+    return sections
+
+
+def partial_sections(subjects: tuple, arrivals: tuple, years=None):
+    """Secciones a partir de (resultados, totales, arreglos densos) ya calculados de cada dataset"""
+    sections = {"kpis": kpi_totals(None, None, subjects[1], arrivals[1])}
+    sections.update(subject_sections(*subjects[:2]))
+    sections.update(arrival_sections(*arrivals[:2]))
+    sections["linked"] = linked_summary(subjects[2], arrivals[2])
+    sections["trends"] = trends_summary(arrivals[2], years)
+    return sections
+
+
+# Criterios para partir los datos en porciones (reportes, snapshots)
+SLICE_PARAMS = {
+    "nacional": None,
+    "departamento": "selected_departments",
+    "año": "selected_years",
+    "hecho": "selected_fact",
+}
+
+
+# ============================================
+# AGREGADOS POR PORCIONES (LOTES)
+# ============================================
+def build_slices(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, by: str):
+    """Lista de porciones (etiqueta, filtros) para el criterio de partición indicado"""
+    param = SLICE_PARAMS[by]
+    if param is None:
+        return [("Nacional", {})]
+
+    col = FILTER_COLUMNS[param]
+    values = set()
+    for df in (df_subjects, df_arrivals):
+        if col in df.columns:
+            values.update(str(v) for v in df[col].unique().to_list() if v is not None)
+
+    return [(value, {param: [value]}) for value in sorted(values)]
+
+
+def _partition(df: pl.DataFrame, param: str | None):
+    """Parte un DataFrame una sola vez por la columna del filtro, si existe"""
+    if param is None or FILTER_COLUMNS[param] not in df.columns:
+        return None
+    col = FILTER_COLUMNS[param]
+    parts = df.with_columns(pl.col(col).cast(pl.Utf8).alias("__slice")).partition_by("__slice", as_dict=True)
+    return {key[0]: part.drop("__slice") for key, part in parts.items()}
+
+
+def iter_slice_sections(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, slices, by: str):
+    """Genera (etiqueta, filtros, secciones) reutilizando agregados compartidos entre porciones"""
+    param = SLICE_PARAMS[by]
+    subject_parts = _partition(df_subjects, param)
+    arrival_parts = _partition(df_arrivals, param)
+    subject_cache, arrival_cache = {}, {}
+
+    def slice_df(df, parts, filters):
+        if parts is not None and param in filters:
+            value = filters[param][0]
+            return parts.get(value, df.clear())
+        return apply_filters(df, **filters)
+
+    for label, filters in slices:
+        key = effective_filters(df_subjects, filters)
+        if key not in subject_cache:
+            sliced = slice_df(df_subjects, subject_parts, filters)
+            subject_cache[key] = (sliced, compute_subject_sections(sliced))
+        sliced_subjects, subject_sections = subject_cache[key]
+
+        key = effective_filters(df_arrivals, filters)
+        if key not in arrival_cache:
+            sliced = slice_df(df_arrivals, arrival_parts, filters)
+            arrival_cache[key] = (sliced, compute_arrival_sections(sliced, selected_years(filters)))
+        sliced_arrivals, arrival_sections = arrival_cache[key]
+
+        sections = {"kpis": kpi_totals(sliced_subjects, sliced_arrivals)}
+        sections.update(subject_sections)
+        sections.update(arrival_sections)
+        sections["linked"] = compute_linked(sliced_subjects, sliced_arrivals)
+        yield label, filters, sections
@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import hashlib
+import time
+
+import orjson
+import polars as pl
+import tornado.web
+
+import result_cache
+from data_loader import dataset_version, load_datasets, read_filter_options, write_filter_options
+from filters import FILTER_COLUMNS, filter_key, filter_options
+from ingest_watcher import start_watcher
+from memory_budget import MemoryPressure, start_governor
+from prefetch import state_sections
+from scheduler import scheduler_stats
+from shared_data import acquire, current_version
+from sql_console import SQLError, normalize_query, run_sql
+
+# ============================================
+# API JSON DE AGREGADOS
+# ============================================
+# Uso:  python api.py --port 8502
+#
+#   GET /api/version                     versión de los datos publicada
+#   GET /api/filters                     modelo de filtros: parámetros, columnas y opciones
+#   GET /api/sections                    todas las secciones del dashboard
+#   GET /api/sections/<sección>          una sección (kpis, temporal, geographic, ...)
+#   GET /api/sql?q=SELECT ...            consulta SQL sobre los datasets (sql_console.py)
+#   GET /api/stats                       caché de resultados y cola de consultas
+#
+# Los filtros van en la query con los mismos nombres que apply_filters y pueden
+# repetirse: /api/sections/kpis?selected_departments=Chocó&selected_years=2002
+# (en /api/sql los filtros restringen las tablas antes de la consulta).
+#
+# Cada respuesta lleva un ETag derivado de la versión de los datos y de la clave
+# de filtros, así que un If-None-Match vigente se responde con 304 sin calcular
+# nada. Los agregados y el JSON ya serializado (orjson) quedan en la caché de
+# resultados compartida (result_cache.py); los cálculos corren fuera del loop
+# de Tornado para no bloquear las demás peticiones. Si la memoria está al límite
+# (memory_budget.py) la respuesta es 503 con Retry-After.
+
+API_PORT = 8502
+SECTIONS = ["kpis", "temporal", "geographic", "demographic", "minorities", "comparative", "children", "critical",
+            "linked", "trends"]
+
+
+def _default(obj):
+    if isinstance(obj, pl.DataFrame):
+        return obj.to_dicts()
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def dumps(payload):
+    return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def make_etag(version: str, *parts):
+    digest = hashlib.sha1(orjson.dumps([version, *parts])).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def section_json(version: str, key: tuple, section: str | None):
+    """Respuesta JSON serializada de una sección (o de todas) con caché"""
+    def compute():
+        sections = state_sections(version, key)
+        payload = {
+            "version": version,
+            "filters": {param: list(values) for param, values in key},
+            "section": section,
+            "data": sections if section is None else sections[section],
+        }
+        return dumps(payload)
+
+    return result_cache.get_or_compute(("json", version, key, section), compute)
+
+
+def options_json(version: str):
+    """Modelo de filtros con sus opciones para la versión"""
+    def compute():
+        options = read_filter_options(version)
+        if options is None:
+            lease = acquire(version, load_datasets)
+            try:
+                options = filter_options(*lease.frames()[:2])
+            finally:
+                lease.release()
+            write_filter_options(version, options)
+        return dumps({
+            "version": version,
+            "filters": [{"param": param, "column": FILTER_COLUMNS[param], "options": options[param]}
+                        for param in FILTER_COLUMNS],
+        })
+
+    return result_cache.get_or_compute(("options", version), compute)
+
+
+def sql_json(version: str, query: str, key: tuple):
+    """Respuesta JSON de una consulta SQL (el resultado ya queda en caché en sql_console)"""
+    result = run_sql(version, query, key)
+    return dumps({
+        "version": version,
+        "filters": {param: list(values) for param, values in key},
+        "columns": result["data"].columns,
+        "rows": result["data"].rows(),
+        "truncated": result["truncated"],
+        "elapsed_ms": round(result["elapsed"] * 1000, 1),
+        "cached": result["cached"],
+    })
+
+
+# ============================================
+# HANDLERS
+# ============================================
+class JSONHandler(tornado.web.RequestHandler):
+    """Base: JSON, CORS y errores en JSON"""
+
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+        self.set_header("Access-Control-Allow-Origin", "*")
+        self.set_header("Cache-Control", "no-cache")
+
+    def compute_etag(self):
+        # El ETag se fija antes de calcular la respuesta (ver respond)
+        return None
+
+    def write_error(self, status_code, **kwargs):
+        if status_code == 503:
+            self.set_header("Retry-After", "5")
+        self.finish(dumps({"error": self._reason, "status": status_code}))
+
+    def version(self):
+        return current_version() or dataset_version()
+
+    def not_modified(self, etag: str):
+        """Fija el ETag y responde 304 si el cliente ya tiene esa versión"""
+        self.set_header("Etag", etag)
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+            return True
+        return False
+
+    async def respond(self, etag: str, build):
+        if self.not_modified(etag):
+            return
+        try:
+            body = await asyncio.get_running_loop().run_in_executor(None, build)
+        except MemoryPressure as e:
+            raise tornado.web.HTTPError(503, reason=str(e))
+        self.finish(body)
+
+
+class VersionHandler(JSONHandler):
+    def get(self):
+        self.finish(dumps({"version": self.version()}))
+
+
+class FiltersHandler(JSONHandler):
+    async def get(self):
+        version = self.version()
+        await self.respond(make_etag(version, "filters"), lambda: options_json(version))
+
+
+class SectionsHandler(JSONHandler):
+    async def get(self, section: str | None = None):
+        if section is not None and section not in SECTIONS:
+            raise tornado.web.HTTPError(404, reason=f"Sección desconocida: {section}")
+
+        unknown = set(self.request.query_arguments) - set(FILTER_COLUMNS)
+        if unknown:
+            raise tornado.web.HTTPError(400, reason=f"Filtros desconocidos: {', '.join(sorted(unknown))}")
+
+        version = self.version()
+        key = filter_key({param: self.get_arguments(param) or ["Todos"] for param in FILTER_COLUMNS})
+        await self.respond(make_etag(version, key, section), lambda: section_json(version, key, section))
+
+
+class SQLHandler(JSONHandler):
+    async def get(self):
+        query = self.get_argument("q", "")
+        unknown = set(self.request.query_arguments) - set(FILTER_COLUMNS) - {"q"}
+        if unknown:
+            raise tornado.web.HTTPError(400, reason=f"Filtros desconocidos: {', '.join(sorted(unknown))}")
+
+        version = self.version()
+        key = filter_key({param: self.get_arguments(param) or ["Todos"] for param in FILTER_COLUMNS})
+        try:
+            await self.respond(make_etag(version, key, "sql", normalize_query(query)), lambda: sql_json(version, query, key))
+        except SQLError as e:
+            raise tornado.web.HTTPError(400, reason=str(e))
+
+
+class StatsHandler(JSONHandler):
+    def get(self):
+        self.finish(dumps({"version": self.version(), "cache": result_cache.stats(), "queue": scheduler_stats()}))
+
+
+def make_app():
+    return tornado.web.Application([
+        (r"/api/version", VersionHandler),
+        (r"/api/filters", FiltersHandler),
+        (r"/api/sections", SectionsHandler),
+        (r"/api/sections/([a-z_]+)", SectionsHandler),
+        (r"/api/sql", SQLHandler),
+        (r"/api/stats", StatsHandler),
+    ])
+
+
+async def serve(port: int, address: str):
+    start_watcher()
+    start_governor()
+    start = time.perf_counter()
+    version = dataset_version()
+    acquire(version, load_datasets).release()
+    print(f"✅ Datos {version} cargados en {time.perf_counter() - start:.1f}s")
+
+    make_app().listen(port, address)
+    print(f"✅ API escuchando en http://{address}:{port}/api/sections")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API JSON con los agregados del dashboard")
+    parser.add_argument("--port", type=int, default=API_PORT, help="Puerto HTTP")
+    parser.add_argument("--address", default="127.0.0.1",
+                        help="Dirección de escucha (0.0.0.0 la expone a la red)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.address))
+
+
+if __name__ == "__main__":
+    main()
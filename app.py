@@ -1,19 +1,16 @@
 import streamlit as st
 import math
+import uuid
 from datetime import datetime
-from data_loader import load_and_prepare_csv
-from filters import apply_filters
-from visualizations import (
-    create_kpi_metrics,
-    create_temporal_analysis,
-    create_geographic_analysis,
-    create_demographic_analysis,
-    create_comparative_analysis,
-    create_detailed_tables,
-    create_critical_analysis,
-    create_children_analysis,
-    create_minorities_analysis
-)
+# Antes del sidebar solo se importan módulos sin Polars; los de cálculo se
+# importan después de dibujarlo, con Polars ya cargado por el hilo de calentamiento
+from data_versions import dataset_version, read_filter_options, read_profile, write_filter_options, write_profile
+from shared_data import acquire, current_version, frames_size_mb, memory_stats
+from startup import import_times, since_start_ms, wait_for_warm_up, warm_up
+from tracing import end_trace, mark, span, start_trace
+
+# Polars, Plotly, pandas y pyarrow se importan en segundo plano mientras se dibuja el sidebar
+warm_up()
 
 # ============================================
 # CONFIGURACIÓN DE PÁGINA
@@ -67,15 +64,73 @@ y políticas públicas.
 # ============================================
 # CARGA DE DATOS
 # ============================================
+# Los datasets se cargan una vez por proceso y se comparten entre sesiones (ver
+# shared_data.py); cada sesión guarda un lease que se libera al cerrarse
+def load_data(version):
+    from data_loader import load_datasets
+
+    lease = st.session_state.get("dataset_lease")
+    if lease is None or lease.version != version:
+        if lease is not None:
+            lease.release()
+        lease = acquire(version, load_datasets)
+        st.session_state["dataset_lease"] = lease
+    return lease.frames()
+
+
 @st.cache_data
-def load_data():
-    df_subjects = load_and_prepare_csv("datasets/hecho_victimizante.csv")
-    df_arrivals = load_and_prepare_csv("datasets/llegadas.csv")
-    return df_subjects, df_arrivals
+def get_snapshot(key, version):
+    return load_snapshot({param: list(values) for param, values in key}, version)
 
 
-with st.spinner('Cargando datos...'):
-    df_subjects, df_arrivals = load_data()
+@st.cache_data
+def get_profile(version, _df_subjects, _df_arrivals):
+    # La carga deja el perfil guardado; solo se calcula aquí si esa versión se cargó sin él
+    profile = read_profile(version)
+    if profile is None:
+        profile = profile_datasets({"subjects": _df_subjects, "arrivals": _df_arrivals})
+        write_profile(version, profile)
+    return profile
+
+
+def load_data_traced(version):
+    with st.spinner('Cargando datos...'), span("load_data", version=version) as node:
+        frames = load_data(version)
+        node["attrs"]["rows"] = sum(df.shape[0] for df in frames)
+    # Las secciones usan víctimas y llegadas; el resto de datasets registrados quedan en el lease
+    return frames[:2]
+
+
+def compute_live_sections(version, key, df_subjects, df_arrivals):
+    """Agregados de todas las secciones para los filtros actuales (se guardan en la caché compartida)"""
+    # Cerca del límite de memoria se pide reintentar en lugar de arriesgar un OOM
+    admit_heavy_query()
+    # Con SHARD_WORKERS los agregados se calculan por porciones en un pool de procesos
+    if sharding_enabled():
+        sections = sharded_sections(version, key)
+    else:
+        sections = compute_sections(df_subjects, df_arrivals, dict(key).get("selected_years"))
+    return cache_put(sections_key(version, key), sections)
+
+
+# Cada rerun abre una traza con los tiempos de carga, filtros y secciones
+trace = start_trace()
+
+# Cada rerun usa la última versión publicada (ver ingest_watcher.py) y la
+# conserva de principio a fin
+data_version = current_version() or dataset_version()
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
+# Las opciones del sidebar se guardan por versión de los datos, así el sidebar se
+# dibuja antes de cargar los CSV; solo el primer arranque de una versión espera
+options = read_filter_options(data_version)
+df_subjects = df_arrivals = None
+if options is None:
+    from filters import filter_options
+
+    df_subjects, df_arrivals = load_data_traced(data_version)
+    options = filter_options(df_subjects, df_arrivals)
+    write_filter_options(data_version, options)
 
 # ============================================
 # SIDEBAR - FILTROS Y CONTROLES
@@ -85,14 +140,6 @@ with st.sidebar:
     st.markdown("---")
 
 
-    # Función auxiliar para opciones
-    def make_options(df, col):
-        if col not in df.columns:
-            return ["Todos"]
-        unique_vals = sorted([str(v) for v in df[col].unique().to_list() if v is not None])
-        return ["Todos"] + unique_vals
-
-
     def normalize_selection(sel):
         if not sel or "Todos" in sel:
             return ["Todos"]
@@ -105,7 +152,7 @@ with st.sidebar:
     selected_fact = normalize_selection(
         st.multiselect(
             "Hecho Victimizante:",
-            make_options(df_subjects, "Tipo o Nombre de Hecho Victimizante"),
+            options["selected_fact"],
             default=["Todos"],
             help="Selecciona uno o más hechos victimizantes"
         )
@@ -114,7 +161,7 @@ with st.sidebar:
     selected_etnia = normalize_selection(
         st.multiselect(
             "Etnia:",
-            make_options(df_subjects, "Etnia"),
+            options["selected_etnia"],
             default=["Todos"],
             help="Filtra por grupo étnico"
         )
@@ -123,7 +170,7 @@ with st.sidebar:
     selected_ciclo_vital = normalize_selection(
         st.multiselect(
             "Ciclo Vital:",
-            make_options(df_subjects, "Ciclo vital"),
+            options["selected_ciclo_vital"],
             default=["Todos"],
             help="Filtra por rango de edad"
         )
@@ -135,7 +182,7 @@ with st.sidebar:
     selected_departments = normalize_selection(
         st.multiselect(
             "Departamentos:",
-            make_options(df_arrivals, "ESTADO_DEPTO"),
+            options["selected_departments"],
             default=["Todos"],
             help="Departamentos de llegada"
         )
@@ -144,7 +191,7 @@ with st.sidebar:
     selected_years = normalize_selection(
         st.multiselect(
             "Años:",
-            make_options(df_arrivals, "Vigencia"),
+            options["selected_years"],
             default=["Todos"],
             help="Período temporal"
         )
@@ -154,7 +201,33 @@ with st.sidebar:
     st.markdown("#### ⚙️ Opciones de Visualización")
 
     show_raw_data = st.checkbox("Mostrar tablas detalladas", value=False)
+    show_comparison = st.checkbox("Modo comparación", value=False,
+                                  help="Compara varias porciones de los datos (departamentos, años, hechos) "
+                                       "en un solo cálculo")
+    if show_comparison:
+        from comparison import MAX_SLICES
+
+        # Cada porción parte de los filtros del panel y reemplaza los que defina
+        slice_count = st.number_input("Número de porciones:", min_value=2, max_value=MAX_SLICES, value=2, step=1)
+        slice_params = [("selected_departments", "Departamentos"), ("selected_years", "Años"),
+                        ("selected_fact", "Hecho victimizante")]
+        comparison_slices = []
+        for i in range(slice_count):
+            with st.expander(f"Porción {i + 1}", expanded=i < 2):
+                label = st.text_input("Nombre:", value=f"Porción {i + 1}", key=f"slice_label_{i}").strip() \
+                    or f"Porción {i + 1}"
+                if label in [existing for existing, _ in comparison_slices]:
+                    label = f"{label} ({i + 1})"
+                overrides = {param: normalize_selection(st.multiselect(name, options[param], default=["Todos"],
+                                                                       key=f"slice_{param}_{i}"))
+                             for param, name in slice_params}
+                comparison_slices.append((label, overrides))
+
+    show_sql = st.checkbox("Mostrar consola SQL", value=False,
+                           help="Consultas SQL sobre los datasets registrados con los filtros activos")
     chart_theme = st.selectbox("Tema de gráficos:", ["plotly", "plotly_white", "plotly_dark", "ggplot2"])
+    show_debug = st.checkbox("Mostrar panel de depuración", value=False,
+                             help="Tiempos de carga, filtros y cálculo de cada sección")
 
     # Botón para limpiar filtros
     if st.button("🔄 Limpiar todos los filtros", width="stretch"):
@@ -179,9 +252,57 @@ if active_filters:
     filter_html = " ".join([f'<span class="filter-badge">{f}</span>' for f in active_filters])
     st.markdown(f'🔍 **Filtros activos:** {filter_html}', unsafe_allow_html=True)
 
+mark(trace, "sidebar")
+
+# ============================================
+# MÓDULOS DE CÁLCULO (DESPUÉS DEL SIDEBAR)
+# ============================================
+# Con el sidebar ya dibujado se importan los módulos de cálculo; Polars ya viene
+# del hilo de calentamiento y en los reruns siguientes están en sys.modules
+with span("imports"):
+    from aggregations import compute_sections, kpi_totals
+    from comparison import comparison_sections
+    from filters import apply_filters, filter_key
+    from ingest_watcher import start_watcher
+    from memory_budget import MemoryPressure, admit_heavy_query, start_governor, track_session, usage
+    from prefetch import schedule_prefetch, sections_key
+    from profiler import profile_datasets
+    from result_cache import get as cache_get, put as cache_put
+    from scheduler import PRIORITY_KPI, PRIORITY_SECTIONS, run_query, scheduler_stats
+    from sharded import sharded_sections, sharding_enabled
+    from snapshots import load_snapshot, snapshot_figures
+    from visualizations import (
+        create_kpi_metrics,
+        create_temporal_analysis,
+        create_trends_analysis,
+        create_geographic_analysis,
+        create_demographic_analysis,
+        create_comparative_analysis,
+        create_detailed_tables,
+        create_comparison,
+        create_revisions,
+        create_sql_console,
+        create_critical_analysis,
+        create_children_analysis,
+        create_minorities_analysis,
+        create_linked_analysis,
+        create_debug_panel,
+        create_admin_panel
+    )
+
+# Los cambios en datasets/ se re-ingestan en segundo plano
+start_watcher()
+start_governor()
+
 # ============================================
 # APLICAR FILTROS
 # ============================================
+if df_subjects is None:
+    df_subjects, df_arrivals = load_data_traced(data_version)
+
+with span("warm_up"):
+    wait_for_warm_up()
+
 filtered_subjects = apply_filters(
     df_subjects,
     selected_departments,
@@ -200,62 +321,162 @@ filtered_arrivals = apply_filters(
     selected_etnia
 )
 
+# Si la combinación de filtros tiene un snapshot pre-renderizado se usa tal cual;
+# si no, los agregados se calculan en vivo una sola vez para todas las secciones
+current_key = filter_key({
+    "selected_departments": selected_departments,
+    "selected_years": selected_years,
+    "selected_fact": selected_fact,
+    "selected_ciclo_vital": selected_ciclo_vital,
+    "selected_etnia": selected_etnia,
+})
+trace["attrs"]["filters"] = {param: list(values) for param, values in current_key}
+
+# Sin filtros la sesión comparte el dataset; con filtros paga su resultado filtrado
+session_mb = frames_size_mb(filtered_subjects, filtered_arrivals) if current_key else 0.0
+track_session(session_id, int(session_mb * 1e6))
+
+with span("snapshot") as node:
+    snapshot = get_snapshot(current_key, data_version)
+    node["attrs"]["hit"] = snapshot is not None
+
+if snapshot is not None:
+    sections, figures = snapshot[0], snapshot_figures(snapshot[1])
+else:
+    # La caché de resultados es compartida por todas las sesiones y la llena
+    # también el precálculo de los filtros probables siguientes (prefetch.py)
+    sections, figures = cache_get(sections_key(data_version, current_key)), None
+    trace["attrs"]["cache_hit"] = sections is not None
+
 # ============================================
 # SECCIÓN 1: KPIs PRINCIPALES
 # ============================================
 st.markdown('<div class="section-header">📈 Indicadores Clave de Impacto</div>', unsafe_allow_html=True)
-create_kpi_metrics(filtered_subjects, filtered_arrivals)
+if sections is None:
+    # Los KPIs son baratos y tienen prioridad en el planificador: se muestran antes
+    # de esperar turno para el cálculo completo, que comparte el resultado con
+    # cualquier otra sesión que esté pidiendo los mismos filtros
+    kpis = run_query(("kpis", data_version, current_key),
+                     lambda: kpi_totals(filtered_subjects, filtered_arrivals), PRIORITY_KPI)
+    create_kpi_metrics(filtered_subjects, filtered_arrivals, {"kpis": kpis})
+    try:
+        sections = run_query(sections_key(data_version, current_key),
+                             lambda: compute_live_sections(data_version, current_key,
+                                                           filtered_subjects, filtered_arrivals),
+                             PRIORITY_SECTIONS)
+    except MemoryPressure as e:
+        st.warning(f"⏳ El servidor está al límite de memoria ({e}). Intenta de nuevo en unos segundos.")
+        end_trace(trace)
+        st.stop()
+else:
+    create_kpi_metrics(filtered_subjects, filtered_arrivals, sections)
 
 # ============================================
 # SECCIÓN 2: ANÁLISIS TEMPORAL
 # ============================================
 st.markdown('<div class="section-header">⏱️ Análisis Temporal</div>', unsafe_allow_html=True)
-create_temporal_analysis(filtered_subjects, filtered_arrivals, chart_theme)
+create_temporal_analysis(filtered_subjects, filtered_arrivals, chart_theme, sections, figures)
+
+# ============================================
+# SECCIÓN 3: TENDENCIAS Y FOCOS EMERGENTES
+# ============================================
+st.markdown('<div class="section-header">📈 Tendencias y Focos Emergentes</div>', unsafe_allow_html=True)
+create_trends_analysis(filtered_arrivals, chart_theme, sections, figures)
 
 # ============================================
-# SECCIÓN 3: ANÁLISIS GEOGRÁFICO
+# SECCIÓN 4: ANÁLISIS GEOGRÁFICO
 # ============================================
 st.markdown('<div class="section-header">🗺️ Distribución Geográfica</div>', unsafe_allow_html=True)
-create_geographic_analysis(filtered_subjects, filtered_arrivals, chart_theme)
+create_geographic_analysis(filtered_subjects, filtered_arrivals, chart_theme, sections, figures)
 
 # ============================================
-# SECCIÓN 4: ANÁLISIS DEMOGRÁFICO
+# SECCIÓN 5: ANÁLISIS DEMOGRÁFICO
 # ============================================
 st.markdown('<div class="section-header">👥 Perfil Demográfico de las Víctimas</div>', unsafe_allow_html=True)
-create_demographic_analysis(filtered_subjects, filtered_arrivals, chart_theme)
+create_demographic_analysis(filtered_subjects, filtered_arrivals, chart_theme, sections, figures)
 
 # ============================================
-# SECCIÓN 5: ANÁLISIS COMPARATIVO
+# SECCIÓN 6: ANÁLISIS COMPARATIVO
 # ============================================
 st.markdown('<div class="section-header">🔄 Análisis Comparativo</div>', unsafe_allow_html=True)
-create_comparative_analysis(filtered_subjects, filtered_arrivals, chart_theme)
+create_comparative_analysis(filtered_subjects, filtered_arrivals, chart_theme, sections, figures)
 
 # ============================================
-# SECCIÓN 6: ANÁLISIS DE MINORÍAS ÉTNICAS
+# SECCIÓN 7: ANÁLISIS DE MINORÍAS ÉTNICAS
 # ============================================
 st.markdown('<div class="section-header">🌍 Análisis de Minorías Étnicas y Poblaciones Vulnerables</div>',
             unsafe_allow_html=True)
-create_minorities_analysis(filtered_subjects, filtered_arrivals, chart_theme)
+create_minorities_analysis(filtered_subjects, filtered_arrivals, chart_theme, sections, figures)
 
 # ============================================
-# SECCIÓN 7: ANÁLISIS DE MENORES DE EDAD
+# SECCIÓN 8: ANÁLISIS DE MENORES DE EDAD
 # ============================================
 st.markdown('<div class="section-header">👶 Análisis de Menores de Edad y Protección Infantil</div>',
             unsafe_allow_html=True)
-create_children_analysis(filtered_subjects, filtered_arrivals, chart_theme)
+create_children_analysis(filtered_subjects, filtered_arrivals, chart_theme, sections, figures)
 
 # ============================================
-# SECCIÓN 8: ANÁLISIS CRÍTICO Y CONCLUSIONES
+# SECCIÓN 9: MÉTRICAS CRUZADAS (VÍCTIMAS Y LLEGADAS)
+# ============================================
+st.markdown('<div class="section-header">🔗 Métricas Cruzadas: Víctimas y Llegadas</div>', unsafe_allow_html=True)
+create_linked_analysis(filtered_subjects, filtered_arrivals, chart_theme, sections, figures)
+
+# ============================================
+# SECCIÓN 10: ANÁLISIS CRÍTICO Y CONCLUSIONES
 # ============================================
 st.markdown('<div class="section-header">📝 Análisis Crítico de los Datos</div>', unsafe_allow_html=True)
-create_critical_analysis(filtered_subjects, filtered_arrivals)
+create_critical_analysis(filtered_subjects, filtered_arrivals, sections,
+                         get_profile(data_version, df_subjects, df_arrivals))
+
+# ============================================
+# SECCIÓN 11: REVISIONES ENTRE CORTES
+# ============================================
+st.markdown('<div class="section-header">🗓️ Revisiones entre Cortes del RUV</div>', unsafe_allow_html=True)
+create_revisions(chart_theme)
+
+# ============================================
+# SECCIÓN 12: COMPARACIÓN DE PORCIONES (OPCIONAL)
+# ============================================
+if show_comparison:
+    st.markdown('<div class="section-header">🆚 Comparación de Porciones</div>', unsafe_allow_html=True)
+    sidebar_filters = {param: list(values) for param, values in current_key}
+    slices = [(label, {**sidebar_filters, **{param: values for param, values in overrides.items()
+                                            if values != ["Todos"]}})
+              for label, overrides in comparison_slices]
+    try:
+        create_comparison(comparison_sections(data_version, slices), chart_theme)
+    except MemoryPressure as e:
+        st.warning(f"⏳ El servidor está al límite de memoria ({e}). Intenta de nuevo en unos segundos.")
 
 # ============================================
-# SECCIÓN 9: TABLAS DETALLADAS (OPCIONAL)
+# SECCIÓN 13: CONSOLA SQL (OPCIONAL)
+# ============================================
+if show_sql:
+    st.markdown('<div class="section-header">🧮 Consola SQL</div>', unsafe_allow_html=True)
+    create_sql_console(data_version, current_key)
+
+# ============================================
+# SECCIÓN 14: TABLAS DETALLADAS (OPCIONAL)
 # ============================================
 if show_raw_data:
     st.markdown('<div class="section-header">📊 Datos Detallados</div>', unsafe_allow_html=True)
-    create_detailed_tables(filtered_subjects, filtered_arrivals)
+    create_detailed_tables(data_version, current_key)
+
+# ============================================
+# PANEL DE DEPURACIÓN (TRAZA DEL RERUN)
+# ============================================
+mark(trace, "interactive")
+
+# Con la página ya dibujada, se precalculan en segundo plano los siguientes pasos probables
+schedule_prefetch(session_id, data_version, current_key, sections)
+trace["attrs"]["process_ms"] = since_start_ms()
+trace = end_trace(trace)
+if show_debug:
+    create_debug_panel(trace, import_times())
+
+# Vista de administración (?admin=1): datasets compartidos y memoria del proceso
+if st.query_params.get("admin") == "1":
+    create_admin_panel(memory_stats(), session_mb, usage(), scheduler_stats())
 
 # ============================================
 # PIE DE PÁGINA
@@ -0,0 +1,279 @@
+import argparse
+import itertools
+import os
+import platform
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+
+import orjson
+import polars as pl
+
+from aggregations import (
+    children_summary,
+    comparative_summary,
+    compute_sections,
+    critical_summary,
+    demographic_summary,
+    geographic_summary,
+    kpi_totals,
+    minorities_summary,
+    temporal_summary,
+)
+from cohorts import cohort
+from dimensions import add_dimension_keys, compute_linked
+from data_loader import load_and_prepare_csv
+from figures import build_figures
+from filters import apply_filters, selected_years
+from paging import frame_page
+from shared_data import current_rss
+from timeseries import compute_trends
+
+# ============================================
+# BENCHMARK DEL PIPELINE DEL DASHBOARD
+# ============================================
+# Uso:
+#   python synthetic_data.py --rows 10M --output datasets/synthetic/10m
+#   python benchmark.py --data datasets/synthetic/10m --output benchmarks/10m.json
+#   python benchmark.py --data datasets/synthetic/10m --baseline benchmarks/10m.json
+#
+# Mide la carga (load_and_prepare_csv), los filtros (apply_filters) y la ruta
+# de cálculo de cada create_* de visualizations.py (los agregados que calcula y
+# las figuras), sin Streamlit. Cada caso registra latencia (mín, mediana, p95),
+# filas por segundo y el pico de memoria residente sobre el nivel previo. El
+# resultado es un JSON que sirve de línea base para comparar corridas.
+
+BENCHMARK_DIR = "benchmarks"
+REGRESSION_THRESHOLD = 0.10
+RSS_SAMPLE_SECONDS = 0.005
+
+
+# ============================================
+# MEDICIÓN
+# ============================================
+@contextmanager
+def peak_rss():
+    """Muestrea la memoria residente en segundo plano; deja el pico (sobre el inicio) en result['peak']"""
+    result = {"start": current_rss(), "peak": 0}
+    stop = threading.Event()
+
+    def sample():
+        while not stop.is_set():
+            result["peak"] = max(result["peak"], current_rss() - result["start"])
+            stop.wait(RSS_SAMPLE_SECONDS)
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    try:
+        yield result
+    finally:
+        stop.set()
+        thread.join()
+        result["peak"] = max(result["peak"], current_rss() - result["start"])
+
+
+def measure(func, rows: int, repeat: int = 3, warmup: bool = True):
+    """Ejecuta func repeat veces y resume latencia, throughput y pico de memoria"""
+    if warmup:
+        func()
+
+    latencies = []
+    peak = 0
+    for _ in range(repeat):
+        with peak_rss() as memory:
+            start = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - start)
+        peak = max(peak, memory["peak"])
+
+    latencies.sort()
+    median = statistics.median(latencies)
+    return {
+        "rows": rows,
+        "repeat": repeat,
+        "latency_ms": {
+            "min": round(latencies[0] * 1000, 3),
+            "median": round(median * 1000, 3),
+            "p95": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000, 3),
+        },
+        "throughput_rows_s": round(rows / median) if median > 0 else None,
+        "peak_mem_mb": round(peak / 1e6, 2),
+    }
+
+
+# ============================================
+# CASOS
+# ============================================
+def filter_scenarios(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
+    """Combinaciones de filtros representativas, tomadas de los valores más frecuentes"""
+    def most_common(df, col, predicate=None):
+        if col not in df.columns:
+            return None
+        data = df.filter(predicate) if predicate is not None else df
+        return data[col].drop_nulls().mode().sort()[0] if data.height else None
+
+    top_dept = most_common(df_arrivals, "ESTADO_DEPTO")
+    top_year = most_common(df_arrivals, "Vigencia")
+    top_hecho = most_common(df_subjects, "Tipo o Nombre de Hecho Victimizante")
+    top_minority = most_common(df_subjects, "Etnia", cohort(df_subjects, "minoria_etnica")) \
+        if "Etnia" in df_subjects.columns else None
+
+    scenarios = {"sin_filtros": {}}
+    if top_dept is not None:
+        scenarios["un_departamento"] = {"selected_departments": [top_dept]}
+    if top_year is not None:
+        scenarios["un_año"] = {"selected_years": [top_year]}
+    if top_hecho is not None and top_minority is not None:
+        scenarios["hecho_y_etnia"] = {"selected_fact": [top_hecho], "selected_etnia": [top_minority]}
+    return scenarios
+
+
+# Vista de las tablas detalladas que se mide: búsqueda en los textos y orden descendente por año
+TABLE_SEARCH = "desplazamiento"
+TABLE_SORT = ("Vigencia", True)
+_table_versions = itertools.count()
+
+
+def detailed_pages(frames: dict, version: str, page: int):
+    """Una página de la vista de cada dataset, como la pide _detailed_table"""
+    return {dataset: frame_page(df, version, dataset, (), page, TABLE_SEARCH, TABLE_SORT)
+            for dataset, df in frames.items()}
+
+
+def compute_paths(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
+    """Ruta de cálculo de cada create_* de visualizations.py"""
+    frames = {"subjects": df_subjects, "arrivals": df_arrivals}
+    # Las tablas detalladas se miden en frío (cada corrida es una versión nueva: arma
+    # diccionarios, permutación y vista) y con la vista ya en caché, en la primera
+    # página y en una lejana: las dos deberían costar lo mismo
+    return {
+        "create_kpi_metrics": lambda: kpi_totals(df_subjects, df_arrivals),
+        "create_temporal_analysis": lambda: temporal_summary(df_arrivals),
+        "create_trends_analysis": lambda: compute_trends(df_arrivals),
+        "create_geographic_analysis": lambda: geographic_summary(df_arrivals),
+        "create_demographic_analysis": lambda: demographic_summary(df_subjects),
+        "create_comparative_analysis": lambda: comparative_summary(df_subjects),
+        "create_minorities_analysis": lambda: minorities_summary(df_subjects),
+        "create_children_analysis": lambda: children_summary(df_subjects),
+        "create_linked_analysis": lambda: compute_linked(df_subjects, df_arrivals),
+        "create_critical_analysis": lambda: critical_summary(df_arrivals),
+        "create_detailed_tables.cold": lambda: detailed_pages(frames, f"benchmark-{next(_table_versions)}", 1),
+        "create_detailed_tables.first_page": lambda: detailed_pages(frames, "benchmark", 1),
+        "create_detailed_tables.far_page": lambda: detailed_pages(frames, "benchmark", 10**9),
+    }
+
+
+def run_benchmark(data_dir: str, repeat: int = 3):
+    """Corre todos los casos sobre los CSV de data_dir y devuelve el resultado"""
+    subjects_path = os.path.join(data_dir, "hecho_victimizante.csv")
+    arrivals_path = os.path.join(data_dir, "llegadas.csv")
+    results = {}
+
+    # La primera carga hace de calentamiento (caché de disco); la carga es el caso
+    # más costoso, así que se repite una vez menos que el resto
+    df_subjects = load_and_prepare_csv(subjects_path)
+    df_arrivals = load_and_prepare_csv(arrivals_path)
+    for name, path, rows in (("load_subjects", subjects_path, df_subjects.height),
+                             ("load_arrivals", arrivals_path, df_arrivals.height)):
+        results[name] = measure(lambda p=path: load_and_prepare_csv(p), rows, max(repeat - 1, 1), warmup=False)
+        print(f"✅ {name}: {results[name]['latency_ms']['median']:,.0f} ms")
+
+    # Claves de dimensión compartidas, como en data_loader.load_datasets
+    df_subjects, df_arrivals = add_dimension_keys(df_subjects, df_arrivals)
+    total_rows = df_subjects.height + df_arrivals.height
+
+    for scenario, filters in filter_scenarios(df_subjects, df_arrivals).items():
+        results[f"apply_filters.{scenario}"] = measure(
+            lambda f=filters: (apply_filters(df_subjects, **f), apply_filters(df_arrivals, **f)), total_rows, repeat
+        )
+        filtered_subjects = apply_filters(df_subjects, **filters)
+        filtered_arrivals = apply_filters(df_arrivals, **filters)
+        filtered_rows = filtered_subjects.height + filtered_arrivals.height
+
+        results[f"compute_sections.{scenario}"] = measure(
+            lambda s=filtered_subjects, a=filtered_arrivals, y=selected_years(filters): compute_sections(s, a, y),
+            filtered_rows, repeat
+        )
+        sections = compute_sections(filtered_subjects, filtered_arrivals, selected_years(filters))
+        results[f"build_figures.{scenario}"] = measure(lambda s=sections: build_figures(s), filtered_rows, repeat)
+        print(f"✅ {scenario}: {filtered_rows:,} filas")
+
+    for name, func in compute_paths(df_subjects, df_arrivals).items():
+        results[name] = measure(func, total_rows, repeat)
+    print("✅ rutas de cálculo de las secciones")
+
+    return {
+        "meta": {
+            "created": time.time(),
+            "data_dir": data_dir,
+            "subjects_rows": df_subjects.height,
+            "arrivals_rows": df_arrivals.height,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "polars": pl.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+# ============================================
+# COMPARACIÓN CON LA LÍNEA BASE
+# ============================================
+def compare(current: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD):
+    """Tabla de cambios de latencia mediana y memoria respecto a la línea base"""
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        latency, base_latency = result["latency_ms"]["median"], base["latency_ms"]["median"]
+        change = (latency - base_latency) / base_latency if base_latency else 0.0
+        rows.append({
+            "Caso": name,
+            "Base (ms)": base_latency,
+            "Actual (ms)": latency,
+            "Cambio": round(change * 100, 1),
+            "Memoria base (MB)": base["peak_mem_mb"],
+            "Memoria actual (MB)": result["peak_mem_mb"],
+            "Regresión": change > threshold,
+        })
+    return pl.DataFrame(rows).sort("Cambio", descending=True) if rows else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga, filtros y secciones del dashboard")
+    parser.add_argument("--data", default="datasets/synthetic", help="Carpeta con hecho_victimizante.csv y llegadas.csv")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso")
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar el resultado")
+    parser.add_argument("--baseline", default=None, help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Aumento relativo de latencia que cuenta como regresión")
+    args = parser.parse_args()
+
+    current = run_benchmark(args.data, args.repeat)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "wb") as f:
+        f.write(orjson.dumps(current, option=orjson.OPT_INDENT_2))
+    print(f"✅ Resultado guardado en {output}")
+
+    if args.baseline:
+        with open(args.baseline, "rb") as f:
+            baseline = orjson.loads(f.read())
+        table = compare(current, baseline, args.threshold)
+        if table is None:
+            raise Exception(f"La línea base {args.baseline} no tiene casos en común")
+        with pl.Config(tbl_rows=-1, tbl_width_chars=200):
+            print(table)
+        regressions = table.filter(pl.col("Regresión")).height
+        if regressions:
+            raise SystemExit(f"⚠️ {regressions} casos más lentos que la línea base (> {args.threshold:.0%})")
+        print("✅ Sin regresiones respecto a la línea base")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import polars as pl
+
+from cohorts import COHORTS, cohort, has_cohort
+from sketches import ERROR_COLUMN, SKETCH_CAPACITY, HeavyHitters
+from tracing import span, traced
+
+# ============================================
+# REGISTRO DECLARATIVO DE GRÁFICAS
+# ============================================
+# Cada gráfica (o tabla) del dashboard se declara como una especificación:
+#
+#   dataset    "subjects" (víctimas) o "arrivals" (llegadas)
+#   dimension  columna por la que se agrupa
+#   measures   {alias: columna}; COUNT cuenta registros
+#   cohorts    cohortes (ver cohorts.py) que filtran las filas
+#   sort       "total" (primera medida, descendente) o "dimension"
+#   top        limita el resultado a las N primeras filas
+#   chart      tipo de gráfica que la consume (pie, bar, treemap, line, table)
+#
+# El motor normaliza las especificaciones: varias gráficas que agrupan el mismo
+# dataset por la misma dimensión comparten una sola agregación con la unión de
+# sus medidas, y las cohortes definidas sobre la propia dimensión (por ejemplo,
+# minorías al agrupar por Etnia) se aplican después, sobre el agregado. Cada
+# agregación distinta se calcula una sola vez por render y todas se ejecutan
+# juntas con pl.collect_all.
+#
+# Todas las medidas son sumas o conteos, así que las agregaciones base de
+# porciones disjuntas de los datos se combinan sumando por dimensión
+# (merge_aggregates); es lo que usa la agregación por procesos (sharded.py).
+# Las agregaciones base que solo alimentan un top N viajan entre procesos como
+# resúmenes HeavyHitters (sketches.py) en lugar del agregado completo; si el
+# resumen tuvo que descartar elementos, el resultado lleva su cota de error.
+#
+# El nombre "seccion.clave" indica dónde queda el resultado dentro del
+# diccionario de secciones (ver aggregations.py).
+
+COUNT = "*"
+
+PPO = "Personas por ocurrencia"
+HECHO = "Tipo o Nombre de Hecho Victimizante"
+
+CHART_SPECS = {
+    # Víctimas
+    "demographic.etnia": {"dataset": "subjects", "dimension": "Etnia", "measures": {"Total": PPO},
+                          "chart": "pie"},
+    "demographic.ciclo_vital": {"dataset": "subjects", "dimension": "Ciclo vital", "measures": {"Total": PPO},
+                                "chart": "bar"},
+    "demographic.sexo": {"dataset": "subjects", "dimension": "Sexo", "measures": {"Total": PPO},
+                         "chart": "pie"},
+    "comparative.hecho": {"dataset": "subjects", "dimension": HECHO, "measures": {"Total Víctimas": PPO},
+                          "top": 8, "chart": "treemap"},
+    "comparative.discapacidad": {"dataset": "subjects", "dimension": "Discapacidad", "measures": {"Total": PPO},
+                                 "sort": "dimension", "chart": "bar"},
+    "minorities.by_etnia": {"dataset": "subjects", "dimension": "Etnia", "cohorts": ["minoria_etnica"],
+                            "measures": {"Total Víctimas": PPO,
+                                         "Personas Requieren Atención": "Personas sujetas a atención",
+                                         "Número de Eventos": COUNT},
+                            "chart": "bar"},
+    "minorities.by_hecho": {"dataset": "subjects", "dimension": HECHO, "cohorts": ["minoria_etnica"],
+                            "measures": {"Total Víctimas": PPO}, "top": 10, "chart": "bar"},
+    "minorities.sin_etnia": {"dataset": "subjects", "dimension": "Etnia", "cohorts": ["sin_etnia"],
+                             "measures": {"Total": PPO}},
+    "children.by_age": {"dataset": "subjects", "dimension": "Ciclo vital", "cohorts": ["menor_edad"],
+                        "measures": {"Total Víctimas": PPO, "Registros": COUNT}, "sort": "dimension",
+                        "chart": "pie"},
+    "children.by_hecho": {"dataset": "subjects", "dimension": HECHO, "cohorts": ["menor_edad"],
+                          "measures": {"Total Víctimas": PPO}, "top": 10, "chart": "bar"},
+    "children.by_hecho_full": {"dataset": "subjects", "dimension": HECHO, "cohorts": ["menor_edad"],
+                               "measures": {"Total Menores Víctimas": PPO}, "chart": "table"},
+    "children.by_sexo": {"dataset": "subjects", "dimension": "Sexo", "cohorts": ["menor_edad"],
+                         "measures": {"Total": PPO}, "chart": "pie"},
+    "children.by_etnia": {"dataset": "subjects", "dimension": "Etnia", "cohorts": ["menor_edad", "minoria_etnica"],
+                          "measures": {"Total Menores": PPO}, "top": 8, "chart": "bar"},
+    "children.etnia_full": {"dataset": "subjects", "dimension": "Etnia", "cohorts": ["menor_edad", "minoria_etnica"],
+                            "measures": {"Total Menores": PPO}},
+    "children.yearly": {"dataset": "subjects", "dimension": "Vigencia", "cohorts": ["menor_edad"],
+                        "measures": {"Menores Afectados": PPO}, "sort": "dimension", "chart": "line"},
+
+    # Llegadas
+    "temporal": {"dataset": "arrivals", "dimension": "Vigencia",
+                 "measures": {"Personas Desplazadas": "Personas que llegaron", "Eventos": "Eventos"},
+                 "sort": "dimension", "chart": "line"},
+    "geographic": {"dataset": "arrivals", "dimension": "ESTADO_DEPTO",
+                   "measures": {"Personas Desplazadas": "Personas que llegaron", "Eventos": "Eventos",
+                                "Personas Afectadas": PPO},
+                   "top": 10, "chart": "bar"},
+    "critical.undefined": {"dataset": "arrivals", "dimension": "ESTADO_DEPTO", "cohorts": ["depto_sin_definir"],
+                           "measures": {"Registros": COUNT, "Personas que llegaron": "Personas que llegaron"}},
+}
+
+
+def dataset_specs(dataset: str, specs: dict = CHART_SPECS):
+    """Subconjunto de especificaciones que agregan un dataset"""
+    return {name: spec for name, spec in specs.items() if spec["dataset"] == dataset}
+
+
+def _measure_column(measure: str):
+    return "__count" if measure == COUNT else measure
+
+
+def normalize_specs(frames: dict, specs: dict):
+    """Agrupa las especificaciones por agregación base: {clave base: columnas}, {nombre: plan}"""
+    bases = {}
+    plans = {}
+
+    for name, spec in specs.items():
+        df = frames.get(spec["dataset"])
+        dim = spec["dimension"]
+        measures = {alias: col for alias, col in spec["measures"].items() if col == COUNT or
+                    (df is not None and col in df.columns)}
+        first_measure = next(iter(spec["measures"].values()))
+        cohorts = spec.get("cohorts", [])
+
+        # Sin la dimensión, la medida principal o alguna cohorte, la gráfica no aplica
+        if df is None or dim not in df.columns or first_measure not in measures.values() or \
+                not all(has_cohort(df, c) for c in cohorts):
+            plans[name] = None
+            continue
+
+        row_cohorts = tuple(sorted(c for c in cohorts if COHORTS[c][0] != dim))
+        post_cohorts = tuple(c for c in cohorts if COHORTS[c][0] == dim)
+        key = (spec["dataset"], dim, row_cohorts)
+
+        bases.setdefault(key, set()).update(measures.values())
+        plans[name] = {
+            "key": key,
+            "post_cohorts": post_cohorts,
+            "measures": measures,
+            "sort": spec.get("sort", "total"),
+            "top": spec.get("top"),
+        }
+
+    return bases, plans
+
+
+def base_aggregates(frames: dict, bases: dict, slice_column: str | None = None):
+    """Calcula cada agregación base (sumas y conteos por dimensión) con un solo collect_all"""
+    # slice_column: clave adicional del grupo (la máscara de porciones de comparison.py)
+    keys = list(bases)
+    queries = []
+    for dataset, dim, row_cohorts in keys:
+        df = frames[dataset]
+        lf = df.lazy()
+        for name in row_cohorts:
+            lf = lf.filter(cohort(df, name))
+        by = [dim] if slice_column is None else [slice_column, dim]
+        aggs = [
+            pl.len().alias(_measure_column(col)) if col == COUNT else pl.col(col).sum()
+            for col in sorted(bases[(dataset, dim, row_cohorts)])
+        ]
+        queries.append(lf.group_by(by).agg(aggs))
+
+    with span("collect_all", queries=len(queries)) as node:
+        results = dict(zip(keys, pl.collect_all(queries))) if queries else {}
+        if node is not None:
+            node["attrs"]["rows"] = sum(r.height for r in results.values())
+    return results
+
+
+def sketch_aggregates(results: dict, plans: dict, capacity: int = SKETCH_CAPACITY):
+    """Reemplaza las agregaciones base que solo alimentan un top N por resúmenes HeavyHitters"""
+    uses = {}
+    for plan in plans.values():
+        if plan is not None:
+            uses.setdefault(plan["key"], []).append(plan)
+
+    sketched = dict(results)
+    for key, key_plans in uses.items():
+        primary = {_measure_column(next(iter(plan["measures"].values()))) for plan in key_plans}
+        top_only = all(plan["top"] is not None and plan["top"] <= capacity and plan["sort"] == "total"
+                       and not plan["post_cohorts"] for plan in key_plans)
+        if not top_only or len(primary) != 1 or key not in results:
+            continue
+        dim, data, first = key[1], results[key], primary.pop()
+        measures = [first, *(col for col in data.columns if col not in (dim, first))]
+        sketched[key] = HeavyHitters(dim, measures, capacity).update(data)
+    return sketched
+
+
+def merge_aggregates(parts: list):
+    """Combina agregados base parciales (de porciones disjuntas de los datos) sumando por dimensión o resumen"""
+    merged = {}
+    for key in (parts[0] if parts else {}):
+        dim = key[1]
+        if isinstance(parts[0][key], HeavyHitters):
+            sketch = parts[0][key]
+            for part in parts[1:]:
+                sketch = sketch.merge(part[key])
+            merged[key] = sketch
+            continue
+        data = pl.concat([part[key] for part in parts], how="vertical_relaxed")
+        merged[key] = data.group_by(dim).agg(pl.exclude(dim).sum())
+    return merged
+
+
+def derive_specs(results: dict, plans: dict):
+    """Resultado de cada especificación a partir de las agregaciones base"""
+    charts = {}
+    for name, plan in plans.items():
+        if plan is None:
+            charts[name] = None
+            continue
+
+        dim = plan["key"][1]
+        data, error = results[plan["key"]], 0
+        if isinstance(data, HeavyHitters):
+            data, error = data.frame(), data.error
+        for name_cohort in plan["post_cohorts"]:
+            data = data.filter(cohort(data, name_cohort))
+
+        data = data.select(
+            pl.col(dim),
+            *[pl.col(_measure_column(col)).alias(alias) for alias, col in plan["measures"].items()]
+        )
+        first_alias = next(iter(plan["measures"]))
+        # Los empates se ordenan por la dimensión para que el top N sea estable
+        data = data.sort([first_alias, dim], descending=[True, False]) if plan["sort"] == "total" \
+            else data.sort(dim)
+        if plan["top"] is not None:
+            data = data.head(plan["top"])
+        if error:
+            # Top N de un resumen truncado: cada suma real está entre la mostrada y esa más la cota
+            data = data.with_columns(pl.lit(error).alias(ERROR_COLUMN))
+        charts[name] = data
+
+    return charts
+
+
+@traced()
+def compute_specs(frames: dict, specs: dict = CHART_SPECS):
+    """Calcula cada agregación distinta una sola vez y deriva el resultado de cada especificación"""
+    bases, plans = normalize_specs(frames, specs)
+    return derive_specs(base_aggregates(frames, bases), plans)
+
+
+def section_charts(charts: dict, section: str):
+    """Resultados de una sección ("seccion.clave" -> {clave: resultado})"""
+    prefix = section + "."
+    return {name[len(prefix):]: data for name, data in charts.items() if name.startswith(prefix)}
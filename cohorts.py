@@ -0,0 +1,62 @@
+import polars as pl
+
+# ============================================
+# REGISTRO DE COHORTES DE VULNERABILIDAD
+# ============================================
+# Cada cohorte se define una sola vez aquí y se guarda como columna booleana al
+# cargar los datos. Las secciones del dashboard filtran con la columna ya
+# calculada en lugar de repetir el predicado (is_in, etc.) en cada render, y la
+# definición no puede divergir entre secciones. Los textos ya llegan con su
+# etiqueta canónica (text_cleaning.py: sin variantes de mayúsculas, tildes ni
+# sinónimos de "No especificado"), así que los predicados comparan valores
+# exactos sin pasar cada fila a minúsculas.
+
+UNSPECIFIED = "No especificado"
+MINORITY_EXCLUDED = ["Ninguna", UNSPECIFIED]
+CHILD_CATEGORIES = ['entre 0 y 5', 'entre 6 y 11', 'entre 12 y 17']
+UNDEFINED_LOCATIONS = ["Sin Definir", UNSPECIFIED]
+
+FLAG_PREFIX = "flag_"
+
+# nombre -> (columna de origen, predicado sobre esa columna)
+COHORTS = {
+    "minoria_etnica": ("Etnia", lambda c: ~c.is_in(MINORITY_EXCLUDED)),
+    "sin_etnia": ("Etnia", lambda c: c == "Ninguna"),
+    "menor_edad": ("Ciclo vital", lambda c: c.is_in(CHILD_CATEGORIES)),
+    "mujer": ("Sexo", lambda c: c == "Mujer"),
+    "hombre": ("Sexo", lambda c: c == "Hombre"),
+    "depto_sin_definir": ("ESTADO_DEPTO", lambda c: c.is_in(UNDEFINED_LOCATIONS)),
+}
+
+
+def flag_column(name: str):
+    """Nombre de la columna booleana de una cohorte"""
+    return FLAG_PREFIX + name
+
+
+def add_cohort_flags(df: pl.DataFrame):
+    """Agrega una columna booleana por cada cohorte cuya columna de origen exista"""
+    flags = [
+        predicate(pl.col(column)).fill_null(False).alias(flag_column(name))
+        for name, (column, predicate) in COHORTS.items()
+        if column in df.columns
+    ]
+    return df.with_columns(flags) if flags else df
+
+
+def cohort(df: pl.DataFrame, name: str):
+    """Expresión de la cohorte: usa la columna precalculada si existe, si no, el predicado"""
+    if flag_column(name) in df.columns:
+        return pl.col(flag_column(name))
+    column, predicate = COHORTS[name]
+    return predicate(pl.col(column))
+
+
+def has_cohort(df: pl.DataFrame, name: str):
+    """Indica si la cohorte puede evaluarse sobre el DataFrame"""
+    return flag_column(name) in df.columns or COHORTS[name][0] in df.columns
+
+
+def drop_flags(df: pl.DataFrame):
+    """Quita las columnas de cohortes (para tablas y descargas)"""
+    return df.select(pl.exclude(f"^{FLAG_PREFIX}.*$"))
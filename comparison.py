@@ -0,0 +1,236 @@
+import os
+
+import numpy as np
+import polars as pl
+
+import result_cache
+from aggregations import TOTAL_COLUMNS, partial_sections
+from chart_specs import HECHO, base_aggregates, dataset_specs, derive_specs, normalize_specs
+from data_loader import load_datasets
+from dimensions import LINKED_MEASURES, dimension_categories, key_column
+from filters import filter_expression, filter_key, selected_years
+from memory_budget import admit_heavy_query
+from scheduler import PRIORITY_SECTIONS, run_query
+from shared_data import acquire
+from tracing import span, traced
+
+# ============================================
+# MODO COMPARACIÓN (VARIAS PORCIONES EN UNA PASADA)
+# ============================================
+# Comparar dos o más porciones de los datos (dos departamentos, dos periodos,
+# ...) no recalcula el dashboard una vez por porción. Cada porción es una
+# etiqueta con su estado de filtros y cada fila se marca con una máscara de
+# bits: el bit i indica que la fila pertenece a la porción i (una fila puede
+# estar en varias si los filtros se solapan). Cada agregación del motor de
+# especificaciones, los totales y los arreglos por clave de dimensión se
+# agrupan una sola vez por (máscara, dimensión) sobre todas las filas, y el
+# resultado de cada porción sale de volver a sumar los grupos cuya máscara
+# tiene su bit, sobre el agregado ya pequeño. Las filas no se duplican.
+#
+# El resultado de cada porción tiene la misma forma que el de compute_sections,
+# así que las secciones se arman igual que en la agregación por porciones
+# (partial_sections). COMPARE_CHARTS lista los agregados que se dibujan lado a
+# lado con sus diferencias frente a la primera porción.
+
+SLICE = "__slices"
+# La máscara es UInt32: hasta 32 porciones
+MAX_SLICES = min(int(os.environ.get("COMPARE_MAX_SLICES", 4)), 32)
+
+KPI_LABELS = {
+    "total_victims": "Personas afectadas",
+    "total_displaced": "Personas desplazadas",
+    "total_events": "Eventos",
+    "unique_depts": "Departamentos",
+}
+
+# (título, (sección, clave), dimensión, medida, gráfica)
+COMPARE_CHARTS = [
+    ("Evolución anual de personas desplazadas", ("temporal", None), "Vigencia", "Personas Desplazadas", "line"),
+    ("Departamentos de llegada (top 10)", ("geographic", None), "ESTADO_DEPTO", "Personas Desplazadas", "bar"),
+    ("Hechos victimizantes principales", ("comparative", "hecho"), HECHO, "Total Víctimas", "bar"),
+    ("Víctimas por ciclo vital", ("demographic", "ciclo_vital"), "Ciclo vital", "Total", "bar"),
+    ("Víctimas por sexo", ("demographic", "sexo"), "Sexo", "Total", "bar"),
+    ("Víctimas por etnia", ("demographic", "etnia"), "Etnia", "Total", "bar"),
+]
+
+
+# ============================================
+# MÁSCARA DE PORCIONES
+# ============================================
+def slice_mask(schema, slices: list):
+    """Máscara de bits con las porciones a las que pertenece cada fila"""
+    bits = []
+    for i, (_, filters) in enumerate(slices):
+        bit = pl.lit(1 << i, dtype=pl.UInt32)
+        predicate = filter_expression(schema, filters)
+        bits.append(bit if predicate is None else pl.when(predicate).then(bit).otherwise(0))
+    return pl.sum_horizontal(bits).cast(pl.UInt32).alias(SLICE)
+
+
+def in_slice(i: int):
+    """Grupos (o filas) cuya máscara incluye la porción i"""
+    return (pl.col(SLICE) & (1 << i)) != 0
+
+
+def _split(data: pl.DataFrame, dim: str, count: int):
+    """Agregado de cada porción a partir del agrupado por (máscara, dimensión)"""
+    return [data.filter(in_slice(i)).group_by(dim).agg(pl.exclude(SLICE, dim).sum()) for i in range(count)]
+
+
+# ============================================
+# TOTALES Y ARREGLOS POR PORCIÓN
+# ============================================
+def _totals_query(tagged: pl.DataFrame):
+    aggs = [pl.len().alias("rows"), *(pl.col(col).sum() for col in TOTAL_COLUMNS if col in tagged.columns)]
+    if "Vigencia" in tagged.columns:
+        aggs += [pl.col("Vigencia").min().alias("min_year"), pl.col("Vigencia").max().alias("max_year")]
+    if "ESTADO_DEPTO" in tagged.columns:
+        aggs.append(pl.col("ESTADO_DEPTO").unique().alias("depts"))
+    return tagged.lazy().group_by(SLICE).agg(aggs)
+
+
+def _slice_totals(grouped: pl.DataFrame, tagged: pl.DataFrame, count: int):
+    """Totales de cada porción con la misma forma que aggregations.dataset_totals"""
+    totals = []
+    for i in range(count):
+        part = grouped.filter(in_slice(i))
+        totals.append({"rows": int(part["rows"].sum()),
+                       "sums": {col: part[col].sum() for col in TOTAL_COLUMNS if col in tagged.columns}})
+        if "Vigencia" in tagged.columns:
+            totals[i]["min_year"], totals[i]["max_year"] = part["min_year"].min(), part["max_year"].max()
+        if "ESTADO_DEPTO" in tagged.columns:
+            totals[i]["depts"] = part["depts"].explode().n_unique()
+    return totals
+
+
+def _dense_queries(tagged: pl.DataFrame, dataset: str, categories: dict):
+    measure, combinations = LINKED_MEASURES[dataset]
+    if measure not in tagged.columns:
+        return {}
+    queries = {}
+    for dims in combinations:
+        if all(dim in categories for dim in dims):
+            keys = [key_column(dim) for dim in dims]
+            queries[dims] = tagged.lazy().group_by([SLICE, *keys]).agg(pl.col(measure).sum()).drop_nulls(keys)
+    return queries
+
+
+def _slice_dense(grouped: dict, dataset: str, categories: dict, count: int):
+    """Arreglos de cada porción con la misma forma que dimensions.dense_measures"""
+    measure = LINKED_MEASURES[dataset][0]
+    parts = [{"categories": categories, "arrays": {}} for _ in range(count)]
+    for dims, data in grouped.items():
+        for i in range(count):
+            part = data.filter(in_slice(i))
+            totals = np.zeros(tuple(len(categories[dim]) for dim in dims))
+            index = tuple(part[key_column(dim)].to_physical().to_numpy() for dim in dims)
+            # Varias máscaras caen en la misma celda: se acumulan
+            np.add.at(totals, index, part[measure].fill_null(0).to_numpy())
+            parts[i]["arrays"][dims] = totals
+    return parts
+
+
+@traced()
+def compare_dataset(df: pl.DataFrame, dataset: str, slices: list):
+    """(resultados, totales, arreglos) de cada porción, agrupando cada agregación una sola vez"""
+    count = len(slices)
+    tagged = df.with_columns(slice_mask(df.schema, slices))
+
+    bases, plans = normalize_specs({dataset: tagged}, dataset_specs(dataset))
+    results = base_aggregates({dataset: tagged}, bases, slice_column=SLICE)
+    parts = {key: _split(data, key[1], count) for key, data in results.items()}
+    charts = [derive_specs({key: split[i] for key, split in parts.items()}, plans) for i in range(count)]
+
+    categories = dimension_categories(df)
+    dense_queries = _dense_queries(tagged, dataset, categories)
+    with span("collect_all", queries=len(dense_queries) + 1):
+        grouped = pl.collect_all([_totals_query(tagged), *dense_queries.values()])
+    totals = _slice_totals(grouped[0], tagged, count)
+    dense = _slice_dense(dict(zip(dense_queries, grouped[1:])), dataset, categories, count)
+    return list(zip(charts, totals, dense))
+
+
+@traced()
+def compare_sections(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, slices: list):
+    """{etiqueta: secciones} de cada porción (etiqueta, filtros), en el orden dado"""
+    subjects = compare_dataset(df_subjects, "subjects", slices)
+    arrivals = compare_dataset(df_arrivals, "arrivals", slices)
+    return {label: partial_sections(s, a, selected_years(filters))
+            for (label, filters), s, a in zip(slices, subjects, arrivals)}
+
+
+def comparison_key(version: str, slices: list):
+    """Clave de la caché de resultados para un conjunto de porciones"""
+    return ("compare", version, tuple((label, filter_key(filters)) for label, filters in slices))
+
+
+def comparison_sections(version: str, slices: list):
+    """Secciones de cada porción sobre los datos compartidos, desde la caché o calculadas"""
+    def compute():
+        admit_heavy_query()
+        lease = acquire(version, load_datasets)
+        try:
+            df_subjects, df_arrivals = lease.frames()[:2]
+        finally:
+            lease.release()
+        return compare_sections(df_subjects, df_arrivals, slices)
+
+    cache_key = comparison_key(version, slices)
+    compared = result_cache.get(cache_key)
+    if compared is None:
+        compared = run_query(cache_key, lambda: result_cache.put(cache_key, compute()), PRIORITY_SECTIONS)
+    return compared
+
+
+# ============================================
+# DIFERENCIAS ENTRE PORCIONES
+# ============================================
+def _delta_columns(frame: pl.DataFrame, labels: list):
+    """Diferencia absoluta y porcentual de cada porción frente a la primera"""
+    base = pl.col(labels[0])
+    columns = []
+    for label in labels[1:]:
+        columns += [
+            (pl.col(label) - base).alias(f"Δ {label}"),
+            pl.when(base != 0).then((pl.col(label) - base) / base * 100).alias(f"Δ {label} (%)"),
+        ]
+    return frame.with_columns(columns)
+
+
+def kpi_deltas(compared: dict):
+    """Tabla de indicadores clave por porción con sus diferencias frente a la primera"""
+    labels = list(compared)
+    rows = [{"Indicador": name, **{label: compared[label]["kpis"].get(kpi) for label in labels}}
+            for kpi, name in KPI_LABELS.items()
+            if any(kpi in compared[label]["kpis"] for label in labels)]
+    frame = pl.DataFrame(rows, schema={"Indicador": pl.Utf8, **{label: pl.Float64 for label in labels}})
+    return _delta_columns(frame, labels)
+
+
+def _chart_data(sections: dict, path: tuple):
+    section, key = path
+    data = sections.get(section)
+    if key is not None and data is not None:
+        data = data.get(key)
+    return data
+
+
+def comparison_frame(compared: dict, path: tuple, dim: str, measure: str):
+    """Agregado largo (Porción, dimensión, medida) de un mismo resultado en todas las porciones"""
+    frames = []
+    for label, sections in compared.items():
+        data = _chart_data(sections, path)
+        if data is not None and dim in data.columns and measure in data.columns:
+            frames.append(data.select(pl.lit(label).alias("Porción"), pl.col(dim).cast(pl.Utf8),
+                                      pl.col(measure).cast(pl.Float64)))
+    return pl.concat(frames) if frames else None
+
+
+def dimension_deltas(long: pl.DataFrame, dim: str, measure: str, labels: list, by_dimension: bool = False):
+    """Una fila por valor de la dimensión, una columna por porción y las diferencias frente a la primera"""
+    wide = long.pivot(on="Porción", index=dim, values=measure)
+    wide = wide.with_columns(pl.lit(None, dtype=pl.Float64).alias(label) for label in labels
+                             if label not in wide.columns)
+    wide = wide.select(dim, *labels)
+    wide = _delta_columns(wide, labels)
+    return wide.sort(dim) if by_dimension else wide.sort(labels[0], descending=True, nulls_last=True)
@@ -0,0 +1,280 @@
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import time
+
+import orjson
+import polars as pl
+
+import result_cache
+from text_cleaning import rules_digest
+from tracing import traced
+
+# ============================================
+# HISTORIAL DE CORTES Y DIFERENCIAS ENTRE CORTES
+# ============================================
+# Uso:  python cuts.py --list
+#       python cuts.py --diff 2025-08-31 2025-09-30 --dataset arrivals
+#
+# Cada corte mensual del RUV corrige cifras de años anteriores. Al cargar un
+# corte (data_loader.load_datasets) se guarda un cubo compacto de cada dataset
+# en CUTS_DIR/<dataset>/<corte>/:
+#
+#   - Una fila por grupo de dimensiones (todas las columnas de texto y el año)
+#     con la suma de cada medida numérica, identificada por una clave hash
+#     (KEY) de las dimensiones: alinear dos cortes es un join por un entero.
+#   - Una partición por año (PARTITION_COLUMN) y un manifiesto con el resumen
+#     hash del contenido de cada partición y el de las reglas de limpieza de
+#     textos con que se cargó (text_cleaning.rules_digest).
+#
+# diff_cuts compara los manifiestos y solo lee las particiones cuyo resumen
+# cambió; de esas calcula la diferencia de cada medida por clave (lo nuevo
+# menos lo anterior) y la acumula por año, departamento y hecho. No se cargan
+# dos datasets completos: solo los cubos de los años revisados. Se conservan
+# los últimos CUTS_KEEP cortes de cada dataset y las diferencias quedan en la
+# caché de resultados compartida.
+#
+# Las claves salen de los textos ya normalizados: dos cortes cargados con
+# reglas de limpieza distintas no se comparan (CutMismatch), porque todas las
+# particiones parecerían revisadas. El corte anterior se vuelve a guardar al
+# cargarlo de nuevo con las reglas actuales.
+
+CUTS_DIR = os.environ.get("CUTS_DIR", os.path.join("cache", "cuts"))
+CUTS_KEEP = int(os.environ.get("CUTS_KEEP", 12))
+MANIFEST_NAME = "manifest.json"
+PARTITION_COLUMN = "Vigencia"
+KEY = "__key"
+HASH_SEED = 20240601
+
+# Revisiones que se acumulan en el resumen de cada diferencia: nombre -> dimensiones
+REVISION_VIEWS = {
+    "by_year": ["Vigencia"],
+    "by_department": ["ESTADO_DEPTO"],
+    "by_event": ["Tipo o Nombre de Hecho Victimizante"],
+    "by_year_department": ["Vigencia", "ESTADO_DEPTO"],
+}
+TOP_REVISIONS = 50
+
+
+class CutMismatch(Exception):
+    """Los dos cortes se guardaron con reglas de limpieza distintas y no se pueden comparar"""
+
+
+def parse_cut(value):
+    """Fecha ISO (AAAA-MM-DD) del valor de FECHA_CORTE ("30/09/2025 12:00:00 a. m."), o None"""
+    match = re.match(r"\s*(\d{1,2})/(\d{1,2})/(\d{4})", str(value or ""))
+    if match is None:
+        return None
+    day, month, year = match.groups()
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+
+def _cut_dir(dataset: str, cut: str):
+    return os.path.join(CUTS_DIR, dataset, cut)
+
+
+def _partition_file(value):
+    return f"part-{value}.arrow"
+
+
+# ============================================
+# CUBO DE UN CORTE
+# ============================================
+def cut_columns(df: pl.DataFrame):
+    """Dimensiones (texto y año) y medidas (números) que se guardan de un dataset"""
+    dims = [col for col, dtype in df.schema.items() if dtype == pl.Utf8 or col == PARTITION_COLUMN]
+    measures = [col for col, dtype in df.schema.items() if dtype.is_numeric() and col not in dims]
+    return dims, measures
+
+
+def cut_cube(df: pl.DataFrame):
+    """Sumas de las medidas por grupo de dimensiones, con la clave hash de cada grupo"""
+    dims, measures = cut_columns(df)
+    return df.group_by(dims).agg(pl.col(measures).sum()) \
+        .with_columns(pl.struct(dims).hash(seed=HASH_SEED).alias(KEY)) \
+        .sort(KEY)
+
+
+def _digest(part: pl.DataFrame):
+    """Resumen del contenido de una partición (no depende del orden de las filas)"""
+    return hashlib.sha1(part.hash_rows(seed=HASH_SEED).sort().to_numpy().tobytes()).hexdigest()[:16]
+
+
+def read_cut_manifest(dataset: str, cut: str):
+    """Manifiesto de un corte guardado, o None"""
+    path = os.path.join(_cut_dir(dataset, cut), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def list_cuts(dataset: str):
+    """Cortes guardados de un dataset, del más antiguo al más reciente"""
+    folder = os.path.join(CUTS_DIR, dataset)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(cut for cut in os.listdir(folder)
+                  if os.path.exists(os.path.join(folder, cut, MANIFEST_NAME)))
+
+
+@traced()
+def store_cut(dataset: str, cut: str, df: pl.DataFrame, version: str, cleaning: dict | None = None):
+    """Guarda el cubo de un corte (lo reemplaza si el corte se volvió a publicar con otros datos o reglas)"""
+    rules = rules_digest(cleaning)
+    manifest = read_cut_manifest(dataset, cut)
+    if manifest is not None and manifest["version"] == version and manifest.get("rules") == rules:
+        return manifest
+
+    cube = cut_cube(df)
+    dims, measures = cut_columns(df)
+    target = _cut_dir(dataset, cut)
+    tmp_dir = target + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {"dataset": dataset, "cut": cut, "version": version, "created": time.time(), "rules": rules,
+                "dimensions": dims, "measures": measures, "partitions": {}}
+    if PARTITION_COLUMN in cube.columns:
+        parts = cube.partition_by(PARTITION_COLUMN, as_dict=True)
+        parts = {str(key[0]): part for key, part in parts.items()}
+    else:
+        parts = {"all": cube}
+    for value, part in parts.items():
+        part.write_ipc(os.path.join(tmp_dir, _partition_file(value)))
+        manifest["partitions"][value] = {"rows": part.shape[0], "digest": _digest(part)}
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "wb") as f:
+        f.write(orjson.dumps(manifest))
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp_dir, target)
+    for old in list_cuts(dataset)[:-CUTS_KEEP]:
+        shutil.rmtree(_cut_dir(dataset, old), ignore_errors=True)
+    return manifest
+
+
+def store_cuts(frames: dict, cuts: dict, version: str, cleaning: dict | None = None):
+    """Guarda el corte de cada dataset {nombre: DataFrame} cuya fecha de corte se conoce"""
+    # cleaning: {nombre: reglas de limpieza de textos} con que se cargó cada dataset
+    for dataset, df in frames.items():
+        cut = cuts.get(dataset)
+        if cut is None:
+            print(f"⚠️ {dataset}: sin fecha de corte, no se guarda en el historial de cortes")
+            continue
+        store_cut(dataset, cut, df, version, (cleaning or {}).get(dataset))
+
+
+# ============================================
+# DIFERENCIAS ENTRE CORTES
+# ============================================
+def _read_partition(dataset: str, cut: str, manifest: dict, value: str):
+    """Cubo de una partición, o None si el corte no la tiene"""
+    if value not in manifest["partitions"]:
+        return None
+    return pl.read_ipc(os.path.join(_cut_dir(dataset, cut), _partition_file(value)), memory_map=False)
+
+
+def _partition_delta(old: pl.DataFrame | None, new: pl.DataFrame | None, dims: list, measures: list):
+    """Diferencia por clave de una partición: lo nuevo menos lo anterior, solo claves que cambiaron"""
+    template = new if new is not None else old
+    old = old if old is not None else template.clear()
+    new = new if new is not None else template.clear()
+    joined = old.join(new, on=KEY, how="full", coalesce=True, suffix="__new")
+    return joined.select(
+        KEY,
+        *(pl.coalesce(pl.col(f"{dim}__new"), pl.col(dim)).alias(dim) for dim in dims),
+        *(pl.col(f"{m}__new").fill_null(0).alias(f"{m} (nuevo)") for m in measures),
+        *((pl.col(f"{m}__new").fill_null(0) - pl.col(m).fill_null(0)).alias(f"Δ {m}") for m in measures),
+    ).filter(pl.any_horizontal(pl.col(f"Δ {m}") != 0 for m in measures))
+
+
+@traced()
+def diff_cuts(dataset: str, old: str, new: str):
+    """Revisiones de un dataset entre dos cortes guardados, leyendo solo las particiones que cambiaron"""
+    old_manifest, new_manifest = read_cut_manifest(dataset, old), read_cut_manifest(dataset, new)
+    if old_manifest is None or new_manifest is None:
+        raise Exception(f"No hay corte guardado de {dataset}: {old if old_manifest is None else new}")
+    if old_manifest.get("rules") != new_manifest.get("rules"):
+        raise CutMismatch(f"Los cortes {old} y {new} de {dataset} se guardaron con reglas de limpieza de textos "
+                          f"distintas; vuelva a cargar el corte {old} con las reglas actuales para compararlos")
+
+    dims = [dim for dim in new_manifest["dimensions"] if dim in old_manifest["dimensions"]]
+    measures = [m for m in new_manifest["measures"] if m in old_manifest["measures"]]
+    partitions = sorted(set(old_manifest["partitions"]) | set(new_manifest["partitions"]))
+    changed = [value for value in partitions
+               if old_manifest["partitions"].get(value, {}).get("digest")
+               != new_manifest["partitions"].get(value, {}).get("digest")]
+
+    deltas = []
+    for value in changed:
+        parts = [_read_partition(dataset, cut, manifest, value)
+                 for cut, manifest in ((old, old_manifest), (new, new_manifest))]
+        parts = [part.select(KEY, *dims, *measures) if part is not None else None for part in parts]
+        deltas.append(_partition_delta(*parts, dims, measures))
+    rows = pl.concat(deltas, how="vertical_relaxed") if deltas else None
+
+    summary = {
+        "dataset": dataset,
+        "old": old,
+        "new": new,
+        "measures": measures,
+        "partitions": len(partitions),
+        "changed_partitions": changed,
+        "revised_groups": rows.shape[0] if rows is not None else 0,
+        "totals": {m: int(rows[f"Δ {m}"].sum()) if rows is not None else 0 for m in measures},
+    }
+    for name, view in REVISION_VIEWS.items():
+        if rows is None or not all(dim in rows.columns for dim in view):
+            summary[name] = None
+            continue
+        summary[name] = rows.group_by(view).agg(pl.col(f"Δ {m}").sum() for m in measures) \
+            .sort(f"Δ {measures[0]}", descending=True)
+    if rows is not None and measures:
+        summary["top"] = rows.drop(KEY).sort(pl.col(f"Δ {measures[0]}").abs(), descending=True) \
+            .head(TOP_REVISIONS)
+    else:
+        summary["top"] = None
+    return summary
+
+
+def cut_revisions(dataset: str, old: str, new: str):
+    """Revisiones entre dos cortes desde la caché de resultados (la clave incluye la versión y reglas de cada corte)"""
+    manifests = [read_cut_manifest(dataset, cut) or {} for cut in (old, new)]
+    versions = [(manifest.get("version"), manifest.get("rules")) for manifest in manifests]
+    return result_cache.get_or_compute(("cuts", dataset, old, new, *versions), lambda: diff_cuts(dataset, old, new))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historial de cortes del RUV y diferencias entre cortes")
+    parser.add_argument("--list", action="store_true", help="Lista los cortes guardados de cada dataset")
+    parser.add_argument("--diff", nargs=2, metavar=("ANTERIOR", "NUEVO"), help="Cortes a comparar (AAAA-MM-DD)")
+    parser.add_argument("--dataset", default="arrivals", help="Dataset registrado (subjects, arrivals, ...)")
+    args = parser.parse_args()
+
+    if args.list or not args.diff:
+        datasets = sorted(os.listdir(CUTS_DIR)) if os.path.isdir(CUTS_DIR) else []
+        for dataset in datasets:
+            print(f"{dataset}: {', '.join(list_cuts(dataset)) or '(sin cortes)'}")
+        if not datasets:
+            print("⚠️ No hay cortes guardados; se guardan al cargar los datasets")
+        return
+
+    start = time.perf_counter()
+    try:
+        summary = diff_cuts(args.dataset, *args.diff)
+    except CutMismatch as e:
+        print(f"⚠️ {e}")
+        return
+    print(f"✅ {args.dataset} {summary['old']} → {summary['new']}: "
+          f"{len(summary['changed_partitions'])} de {summary['partitions']} particiones con cambios, "
+          f"{summary['revised_groups']:,} grupos revisados en {time.perf_counter() - start:.2f}s")
+    for measure, total in summary["totals"].items():
+        print(f"   Δ {measure}: {total:+,}")
+    if summary["by_year"] is not None:
+        print(summary["by_year"].head(10))
+
+
+if __name__ == "__main__":
+    main()
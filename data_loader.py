@@ -1,10 +1,28 @@
 import polars as pl
 import gzip
 import os
+from concurrent.futures import ThreadPoolExecutor
 
+from cohorts import add_cohort_flags
+from cuts import parse_cut, store_cuts
+# Versión y archivos por versión viven en un módulo sin Polars (se usan antes de dibujar el sidebar)
+from data_versions import (CACHE_DIR, dataset_version, read_filter_options, read_profile,
+                           write_filter_options, write_profile)
+from dimensions import add_dimension_keys
+from profiler import profile_datasets
+from registry import DATASETS, spec_for_path
+from text_cleaning import normalize_text_columns
+from tracing import traced
 
-def load_and_prepare_csv(path: str):
-    """Carga y prepara los datos CSV con manejo de errores y descompresión"""
+SUBJECTS_PATH = DATASETS["subjects"]["source"]
+ARRIVALS_PATH = DATASETS["arrivals"]["source"]
+
+
+@traced()
+def load_and_prepare_csv(path: str, stats: dict | None = None, spec: dict | None = None):
+    """Carga y prepara los datos CSV con manejo de errores y descompresión; stats recibe lo contado al cargar"""
+    # Sin especificación se usa la del dataset registrado con ese archivo (ver registry.py)
+    spec = spec if spec is not None else spec_for_path(path)
     try:
         # Si el archivo comprimido existe, descomprimir primero
         if path.endswith('.csv') and os.path.exists(path + '.gz') and not os.path.exists(path):
@@ -14,37 +32,62 @@ def load_and_prepare_csv(path: str):
                     f_out.write(f_in.read())
             print(f"✅ {path} descomprimido")
 
-        # Cargar el CSV
-        df = pl.read_csv(path, truncate_ragged_lines=True, ignore_errors=True)
-        df = df.rename({c: c.strip().upper() for c in df.columns})
-
-        # Columnas a eliminar
-        drop_list = ["FECHA_CORTE", "COD_ESTADO_DEPTO", "PARAM_HECHO"]
-        for col in drop_list:
-            if col in df.columns:
-                df = df.drop(col)
-
-        # Mapeo de nombres
-        column_rename_map = {
-            "HECHO": "Tipo o Nombre de Hecho Victimizante",
-            "SEXO": "Sexo",
-            "ETNIA": "Etnia",
-            "DISCAPACIDAD": "Discapacidad",
-            "CICLO_VITAL": "Ciclo vital",
-            "PER_OCU": "Personas por ocurrencia",
-            "PER_SA": "Personas sujetas a atención",
-            "EVENTOS": "Eventos",
-            "VIGENCIA": "Vigencia",
-            "PER_LLEGADA": "Personas que llegaron"
-        }
-        df = df.rename({k: v for k, v in column_rename_map.items() if k in df.columns})
-
-        # Limpieza de datos
-        for col in df.columns:
-            if df[col].dtype == pl.Utf8:
-                df = df.with_columns(pl.col(col).fill_null("No especificado"))
+        # Cargar el CSV como texto; los tipos se aplican después de renombrar
+        read = spec["read"]
+        inferred = pl.scan_csv(path, truncate_ragged_lines=True, ignore_errors=True, **read).collect_schema()
+        df = pl.read_csv(path, truncate_ragged_lines=True, infer_schema=False, **read)
+
+        # Nombres: mayúsculas, columnas descartadas y mapeo del registro
+        names = {c: c.strip().upper() for c in df.columns}
+        df = df.rename(names).drop([c for c in spec["drop"] if c in names.values()])
+
+        # La fecha de corte es la misma en todo el archivo: se guarda en stats y no en cada fila
+        cut = None
+        if spec["cut"] in df.columns:
+            dates = df[spec["cut"]].drop_nulls()
+            cut = parse_cut(dates[0]) if dates.len() else None
+            df = df.drop(spec["cut"])
+        rename = {k: v for k, v in spec["rename"].items() if k in df.columns}
+        df = df.rename(rename)
+
+        # Tipos: los inferidos con los del registro encima. Se cuentan los valores
+        # que no se pudieron convertir (quedan nulos, como con ignore_errors)
+        dtypes = {rename.get(names[c], names[c]): dtype for c, dtype in inferred.items() if c in names}
+        dtypes.update(spec["schema"])
+        casts = {c: dtype for c, dtype in dtypes.items() if c in df.columns and dtype != pl.Utf8}
+        raw = df
+        df = raw.with_columns([pl.col(c).cast(dtype, strict=False) for c, dtype in casts.items()])
+        coerced = {c: int((raw[c].is_not_null() & df[c].is_null()).sum()) for c in casts}
+        del raw
 
+        # Limpieza de textos: una vez por valor distinto de cada columna (ver text_cleaning.py)
+        df, filled, normalized = normalize_text_columns(df, spec["cleaning"])
+
+        # Columnas booleanas de cohortes (minorías, menores, etc.)
+        df = add_cohort_flags(df)
+
+        if stats is not None:
+            stats.update({"coerced": coerced, "filled": filled, "normalized": normalized, "cut": cut})
         return df
 
     except Exception as e:
         raise Exception(f"Error al cargar el archivo {path}: {str(e)}")
+
+
+@traced()
+def load_datasets():
+    """Carga en paralelo los datasets registrados (víctimas y llegadas primero) con sus claves compartidas"""
+    version = dataset_version()
+    stats = {name: {} for name in DATASETS}
+    # La lectura y conversión de Polars sueltan el GIL: un hilo por dataset
+    with ThreadPoolExecutor(max_workers=len(DATASETS), thread_name_prefix="ingest") as pool:
+        futures = {name: pool.submit(load_and_prepare_csv, spec["source"], stats[name], spec)
+                   for name, spec in DATASETS.items()}
+        frames = {name: future.result() for name, future in futures.items()}
+
+    # El perfil de calidad sale de la misma carga y queda guardado con la versión
+    write_profile(version, profile_datasets(frames, stats))
+    # Cubo del corte para comparar con los cortes anteriores (ver cuts.py)
+    store_cuts(frames, {name: stats[name].get("cut") for name in frames}, version,
+               {name: spec["cleaning"] for name, spec in DATASETS.items()})
+    return add_dimension_keys(*frames.values(), dimensions=[spec["dimensions"] for spec in DATASETS.values()])
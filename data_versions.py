@@ -0,0 +1,71 @@
+import hashlib
+import os
+
+import orjson
+
+from registry import source_paths
+
+# ============================================
+# VERSIÓN DE LOS DATOS Y ARCHIVOS POR VERSIÓN
+# ============================================
+# La versión de los archivos fuente y lo que se guarda por versión (opciones
+# del sidebar y perfil de calidad) se leen antes de dibujar el sidebar, así que
+# este módulo no importa Polars ni los módulos de cálculo (ver startup.py).
+
+CACHE_DIR = "cache"
+
+
+def dataset_version(paths=None):
+    """Identificador de la versión de los archivos fuente (tamaño y fecha de modificación)"""
+    paths = paths if paths is not None else source_paths()
+    digest = hashlib.sha1()
+    for path in paths:
+        for candidate in (path, path + '.gz'):
+            if os.path.exists(candidate):
+                stat = os.stat(candidate)
+                digest.update(f"{candidate}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+def _options_path(version: str):
+    return os.path.join(CACHE_DIR, f"filter_options_{version}.json")
+
+
+def read_filter_options(version: str):
+    """Opciones del sidebar guardadas para una versión de los datos, o None"""
+    path = _options_path(version)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def write_filter_options(version: str, options: dict):
+    """Guarda las opciones del sidebar para no tener que cargar los datos antes de dibujarlo"""
+    _write_json(_options_path(version), options)
+
+
+def _profile_path(version: str):
+    return os.path.join(CACHE_DIR, f"profile_{version}.json")
+
+
+def read_profile(version: str):
+    """Perfil de calidad guardado para una versión de los datos, o None"""
+    path = _profile_path(version)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def write_profile(version: str, profile: dict):
+    """Guarda el perfil de calidad de una versión de los datos (ver profiler.py)"""
+    _write_json(_profile_path(version), profile)
+
+
+def _write_json(path: str, data: dict):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(data))
+    os.replace(tmp_path, path)
@@ -0,0 +1,178 @@
+import numpy as np
+import polars as pl
+
+from registry import CONFORMED_DIMENSIONS
+from tracing import traced
+
+# ============================================
+# DIMENSIONES CONFORMADAS ENTRE DATASETS
+# ============================================
+# Víctimas y llegadas se cargan por separado, pero comparten dimensiones (año,
+# hecho victimizante y, si existe, departamento). Al cargar, cada dimensión
+# recibe un solo diccionario con los valores de todos los datasets registrados
+# (registry.py) y se agrega a cada uno una columna de clave entera con el mismo
+# tipo Enum: el código de un año o de un hecho es el mismo en todos los
+# datasets, y las categorías del Enum son el índice para decodificarlo. La dimensión de años es densa (todos los
+# años entre el mínimo y el máximo, aunque alguno no tenga registros). Las
+# dimensiones y su columna de origen se declaran en registry.py
+# (CONFORMED_DIMENSIONS).
+#
+# Las métricas cruzadas (llegadas por víctima registrada, por año, por hecho y
+# por región) se calculan agrupando por las claves enteras y volcando las sumas
+# en arreglos de numpy alineados por código: el "join" entre datasets es la
+# misma posición en el arreglo, sin cruzar columnas de texto en cada rerun. Los
+# arreglos de porciones disjuntas se combinan sumándolos (ver sharded.py).
+
+KEY_PREFIX = "key_"
+
+# Combinación de las series de tiempo por departamento y hecho (timeseries.py)
+TREND_DIMENSIONS = ("department", "event", "year")
+
+# dataset -> (medida, combinaciones de dimensiones que se acumulan)
+LINKED_MEASURES = {
+    "subjects": ("Personas por ocurrencia", [("year",), ("event",), ("department",)]),
+    "arrivals": ("Personas que llegaron",
+                 [("year",), ("event",), ("department",), ("event", "department"), TREND_DIMENSIONS]),
+}
+
+TOP_REGIONS = 10
+
+
+def key_column(dim: str):
+    """Nombre de la columna de clave entera de una dimensión"""
+    return KEY_PREFIX + dim
+
+
+def _dimension_values(frames, column: str, dense_years: bool):
+    values = set()
+    for df in frames:
+        if column in df.columns:
+            values.update(df[column].drop_nulls().unique().to_list())
+    if dense_years and values and all(isinstance(v, int) for v in values):
+        return [str(y) for y in range(min(values), max(values) + 1)]
+    return sorted(str(v) for v in values)
+
+
+def add_dimension_keys(*frames: pl.DataFrame, dimensions: list | None = None):
+    """Agrega a los datasets las columnas de clave de las dimensiones, con un Enum compartido"""
+    # dimensions: dimensiones que usa cada dataset (por defecto, todas las que tenga)
+    dimensions = dimensions or [list(CONFORMED_DIMENSIONS)] * len(frames)
+    frames = list(frames)
+    for dim, column in CONFORMED_DIMENSIONS.items():
+        users = [i for i, df in enumerate(frames) if dim in dimensions[i] and column in df.columns]
+        values = _dimension_values([frames[i] for i in users], column, dense_years=dim == "year")
+        if not values:
+            continue
+        dtype = pl.Enum(values)
+        for i in users:
+            frames[i] = frames[i].with_columns(pl.col(column).cast(pl.Utf8).cast(dtype).alias(key_column(dim)))
+    return tuple(frames)
+
+
+def dimension_categories(df: pl.DataFrame):
+    """Índice de cada dimensión presente en el DataFrame: {dimensión: [valores por código]}"""
+    return {dim: df.schema[key_column(dim)].categories.to_list()
+            for dim in CONFORMED_DIMENSIONS if key_column(dim) in df.columns}
+
+
+def drop_keys(df: pl.DataFrame):
+    """Quita las columnas de clave (para tablas y descargas)"""
+    return df.select(pl.exclude(f"^{KEY_PREFIX}.*$"))
+
+
+# ============================================
+# ARREGLOS ALINEADOS POR CLAVE
+# ============================================
+def dense_totals(df: pl.DataFrame, dims: tuple, measure: str, categories: dict):
+    """Suma de la medida en un arreglo denso indexado por los códigos de las dimensiones"""
+    keys = [key_column(dim) for dim in dims]
+    grouped = df.group_by(keys).agg(pl.col(measure).sum()).drop_nulls(keys)
+    totals = np.zeros(tuple(len(categories[dim]) for dim in dims))
+    index = tuple(grouped[key].to_physical().to_numpy() for key in keys)
+    totals[index] = grouped[measure].fill_null(0).to_numpy()
+    return totals
+
+
+def dense_measures(df: pl.DataFrame, dataset: str):
+    """Arreglos de la medida del dataset para cada combinación de dimensiones disponible"""
+    measure, combinations = LINKED_MEASURES[dataset]
+    categories = dimension_categories(df)
+    if measure not in df.columns:
+        return {"categories": categories, "arrays": {}}
+    arrays = {dims: dense_totals(df, dims, measure, categories)
+              for dims in combinations if all(dim in categories for dim in dims)}
+    return {"categories": categories, "arrays": arrays}
+
+
+def merge_dense(parts: list):
+    """Combina los arreglos de porciones disjuntas de un mismo dataset"""
+    merged = {"categories": parts[0]["categories"], "arrays": {}}
+    for part in parts:
+        for dims, array in part["arrays"].items():
+            merged["arrays"][dims] = merged["arrays"].get(dims, 0) + array
+    return merged
+
+
+# ============================================
+# MÉTRICAS CRUZADAS
+# ============================================
+def _ratio(numerator: np.ndarray, denominator: np.ndarray):
+    """Cociente elemento a elemento; None donde el denominador es cero"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(denominator > 0, numerator / denominator, np.nan)
+    return pl.Series(ratio).fill_nan(None)
+
+
+def _labels(dim: str, values: list):
+    labels = pl.Series(CONFORMED_DIMENSIONS[dim], values)
+    return labels.cast(pl.Int64, strict=False) if dim == "year" else labels
+
+
+def _linked_frame(dim: str, victims: np.ndarray, arrivals: np.ndarray, categories: dict):
+    frame = pl.DataFrame([
+        _labels(dim, categories[dim]),
+        pl.Series("Víctimas registradas", victims.astype(np.int64)),
+        pl.Series("Personas que llegaron", arrivals.astype(np.int64)),
+        _ratio(arrivals, victims).alias("Llegadas por víctima"),
+    ])
+    return frame.filter((pl.col("Víctimas registradas") > 0) | (pl.col("Personas que llegaron") > 0))
+
+
+def linked_summary(subjects: dict, arrivals: dict):
+    """Métricas cruzadas a partir de los arreglos de víctimas y de llegadas"""
+    categories = {**subjects["categories"], **arrivals["categories"]}
+    victim_arrays, arrival_arrays = subjects["arrays"], arrivals["arrays"]
+    summary = {"arrivals_per_victim": None}
+
+    for dim in ("year", "event", "department"):
+        both = (dim,) in victim_arrays and (dim,) in arrival_arrays
+        summary[f"by_{dim}"] = _linked_frame(dim, victim_arrays[(dim,)], arrival_arrays[(dim,)], categories) \
+            if both else None
+
+    if ("year",) in victim_arrays and ("year",) in arrival_arrays:
+        victims = victim_arrays[("year",)].sum()
+        summary["arrivals_per_victim"] = float(arrival_arrays[("year",)].sum() / victims) if victims else None
+
+    # Hecho por región de llegada, frente a las víctimas registradas de cada hecho
+    matrix = arrival_arrays.get(("event", "department"))
+    if matrix is not None and ("event",) in victim_arrays:
+        regions = np.argsort(-matrix.sum(axis=0), kind="stable")[:TOP_REGIONS]
+        regions = regions[matrix[:, regions].sum(axis=0) > 0]
+        events, depts = np.nonzero(matrix[:, regions])
+        arrived = matrix[events, regions[depts]]
+        summary["event_by_region"] = pl.DataFrame([
+            pl.Series(CONFORMED_DIMENSIONS["department"],
+                      [categories["department"][i] for i in regions[depts]], dtype=pl.Utf8),
+            pl.Series(CONFORMED_DIMENSIONS["event"], [categories["event"][i] for i in events], dtype=pl.Utf8),
+            pl.Series("Personas que llegaron", arrived.astype(np.int64)),
+            _ratio(arrived, victim_arrays[("event",)][events]).alias("Llegadas por víctima del hecho"),
+        ])
+    else:
+        summary["event_by_region"] = None
+    return summary
+
+
+@traced()
+def compute_linked(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
+    """Métricas cruzadas entre víctimas y llegadas para un par de DataFrames filtrados"""
+    return linked_summary(dense_measures(df_subjects, "subjects"), dense_measures(df_arrivals, "arrivals"))
@@ -0,0 +1,137 @@
+import os
+
+import numpy as np
+import polars as pl
+
+# ============================================
+# REDUCCIÓN DE PUNTOS PARA SERIES DENSAS
+# ============================================
+# Las series de línea se reducen en el servidor antes de enviarlas al navegador.
+# Más de un punto por píxel no aporta nada visible y solo aumenta el tamaño del
+# payload y el tiempo de render, así que el límite sale del ancho del gráfico:
+# CHART_WIDTH_PX es el ancho del contenido (layout="wide") y cada figura pide
+# max_points con la fracción de ese ancho que ocupa (media pantalla: 0.5).
+#
+#   - Una serie: LTTB (Largest-Triangle-Three-Buckets), que además conserva
+#     siempre los extremos y el mínimo y el máximo globales.
+#   - Varias series superpuestas: se dejan las MAX_SERIES de mayor total (el
+#     resto se suma en "Otros") y cada una se reduce con mínimo/máximo por
+#     bucket, que no pierde los picos donde se marcan las anomalías.
+
+CHART_WIDTH_PX = int(os.environ.get("CHART_WIDTH_PX", 1200))
+POINTS_PER_PIXEL = 1
+MAX_SERIES = 10
+OTHERS_LABEL = "Otros"
+
+
+def max_points(width_fraction: float = 1.0):
+    """Puntos que se envían para un gráfico que ocupa esa fracción del ancho (uno por píxel)"""
+    return max(int(CHART_WIDTH_PX * width_fraction * POINTS_PER_PIXEL), 3)
+
+
+def _as_float(x):
+    """Convierte el eje x a flotantes para poder calcular áreas"""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    if np.issubdtype(x.dtype, np.number):
+        return x.astype(np.float64)
+    return np.arange(len(x), dtype=np.float64)
+
+
+def _lttb(xf, yf, threshold: int):
+    n = len(yf)
+    # Los extremos siempre se conservan; el resto se reparte en threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = xf[next_start:next_end].mean()
+        avg_y = yf[next_start:next_end].mean()
+
+        # Área del triángulo (a, candidato, promedio del siguiente bucket)
+        area = np.abs(
+            (xf[a] - avg_x) * (yf[start:end] - yf[a])
+            - (xf[a] - xf[start:end]) * (avg_y - yf[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def lttb_indices(x, y, threshold: int):
+    """Índices (ordenados, a lo sumo threshold) de LTTB más el mínimo y el máximo globales"""
+    n = len(y)
+    if threshold >= n or threshold < 5:
+        return np.arange(n)
+
+    xf = _as_float(x)
+    yf = np.asarray(y, dtype=np.float64)
+    # LTTB puede saltarse el pico de un bucket: se reservan dos puntos para los extremos de y
+    selected = _lttb(xf, yf, threshold - 2)
+    return np.unique(np.concatenate([selected, [int(np.nanargmin(yf)), int(np.nanargmax(yf))]]))
+
+
+def minmax_indices(y, buckets: int):
+    """Índices del mínimo y máximo de cada bucket (conserva picos en series muy ruidosas)"""
+    n = len(y)
+    if buckets * 2 >= n:
+        return np.arange(n)
+
+    yf = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    indices = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        chunk = yf[start:end]
+        lo, hi = start + int(np.argmin(chunk)), start + int(np.argmax(chunk))
+        indices.extend(sorted({lo, hi}))
+    return np.asarray(indices, dtype=np.int64)
+
+
+def downsample_frame(df: pl.DataFrame, x: str, y: str, points: int | None = None, method: str = "lttb"):
+    """Reduce una serie (ordenada por x) a lo sumo points filas (por defecto, un punto por píxel)"""
+    points = points if points is not None else max_points()
+    if df is None or df.shape[0] <= points:
+        return df
+
+    if method == "minmax":
+        indices = minmax_indices(df[y].to_numpy(), max(points // 2, 1))
+    else:
+        indices = lttb_indices(df[x].to_numpy(), df[y].to_numpy(), points)
+    return df[indices.tolist()]
+
+
+def downsample_series(df: pl.DataFrame, series: str, x: str, y: str, points: int | None = None,
+                      method: str = "minmax"):
+    """Reduce cada serie de un gráfico superpuesto a lo sumo points filas"""
+    if df is None or df.shape[0] == 0:
+        return df
+    parts = [downsample_frame(part.sort(x), x, y, points, method)
+             for part in df.partition_by(series, maintain_order=True)]
+    return pl.concat(parts)
+
+
+def limit_series(df: pl.DataFrame, series: str, x: str, y: str, max_series: int = MAX_SERIES):
+    """Conserva las max_series series con mayor total y agrega el resto en 'Otros'"""
+    if df is None or df[series].n_unique() <= max_series:
+        return df
+
+    top = (
+        df.group_by(series).agg(pl.col(y).sum())
+        .sort(y, descending=True)
+        .head(max_series - 1)[series]
+    )
+    labeled = df.with_columns(
+        pl.when(pl.col(series).is_in(top.to_list()))
+        .then(pl.col(series).cast(pl.Utf8))
+        .otherwise(pl.lit(OTHERS_LABEL))
+        .alias(series)
+    )
+    return labeled.group_by([series, x]).agg(pl.col(y).sum()).sort([series, x])
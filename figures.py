@@ -0,0 +1,639 @@
+import polars as pl
+
+from downsampling import downsample_frame, downsample_series, limit_series, max_points
+from startup import lazy_import
+from tracing import span
+
+# Plotly se importa al construir la primera figura (ver startup.py)
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
+
+# ============================================
+# CONSTRUCCIÓN DE FIGURAS (SIN STREAMLIT)
+# ============================================
+# Cada función recibe un agregado ya calculado (ver aggregations.py) y devuelve
+# una figura de Plotly. Las secciones del dashboard y el generador de snapshots
+# usan las mismas funciones, así que una figura pre-renderizada es idéntica a la
+# que se construiría en vivo.
+
+AGE_LABELS = {
+    'entre 0 y 5': 'Primera Infancia (0-5 años)',
+    'entre 6 y 11': 'Infancia (6-11 años)',
+    'entre 12 y 17': 'Adolescencia (12-17 años)'
+}
+
+
+def temporal_line(yearly_data, theme: str):
+    # Ocupa media pantalla (columna izquierda del análisis temporal)
+    yearly_data = downsample_frame(yearly_data, "Vigencia", "Personas Desplazadas", max_points(0.5))
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=yearly_data["Vigencia"].to_list(),
+        y=yearly_data["Personas Desplazadas"].to_list(),
+        mode='lines+markers',
+        name='Personas Desplazadas',
+        line=dict(color='#e74c3c', width=3),
+        marker=dict(size=8)
+    ))
+
+    fig.update_layout(
+        title="Evolución Temporal del Desplazamiento Forzado",
+        xaxis_title="Año",
+        yaxis_title="Número de Personas",
+        template=theme,
+        height=400,
+        hovermode='x unified'
+    )
+    return fig
+
+
+def temporal_events_bar(yearly_data, theme: str):
+    yearly_events = yearly_data.select("Vigencia", yearly_data["Eventos"].alias("Total Eventos"))
+
+    fig = px.bar(
+        yearly_events.to_pandas(),
+        x="Vigencia",
+        y="Total Eventos",
+        title="Eventos de Desplazamiento por Año",
+        labels={"Total Eventos": "Número de Eventos", "Vigencia": "Año"},
+        color="Total Eventos",
+        color_continuous_scale="Reds",
+        template=theme
+    )
+
+    fig.update_layout(height=400)
+    return fig
+
+
+def geographic_bar(dept_summary, theme: str):
+    fig = px.bar(
+        dept_summary.to_pandas(),
+        y="ESTADO_DEPTO",
+        x="Personas Desplazadas",
+        orientation='h',
+        title="Top 10 Departamentos con Mayor Recepción de Desplazados",
+        labels={"ESTADO_DEPTO": "Departamento", "Personas Desplazadas": "Número de Personas"},
+        color="Personas Desplazadas",
+        color_continuous_scale="RdYlBu_r",
+        template=theme
+    )
+
+    fig.update_layout(height=500, showlegend=False)
+    return fig
+
+
+def etnia_pie(etnia_summary, theme: str):
+    fig = px.pie(
+        etnia_summary.to_pandas(),
+        values="Total",
+        names="Etnia",
+        title="Distribución por Etnia (Todas las Categorías)",
+        hole=0.4,
+        template=theme,
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(height=400)
+    return fig
+
+
+def ciclo_vital_bar(ciclo_summary, theme: str):
+    fig = px.bar(
+        ciclo_summary.to_pandas(),
+        x="Ciclo vital",
+        y="Total",
+        title="Distribución por Ciclo Vital",
+        labels={"Total": "Número de Personas", "Ciclo vital": "Grupo de Edad"},
+        color="Total",
+        color_continuous_scale="Blues",
+        template=theme
+    )
+
+    fig.update_layout(height=400, showlegend=False)
+    fig.update_xaxes(tickangle=-45)
+    return fig
+
+
+def sexo_pie(sexo_summary, theme: str):
+    fig = go.Figure(data=[go.Pie(
+        labels=sexo_summary["Sexo"].to_list(),
+        values=sexo_summary["Total"].to_list(),
+        hole=0.5,
+        marker_colors=['#3498db', '#e74c3c', '#95a5a6']
+    )])
+
+    fig.update_layout(
+        title="Distribución por Sexo",
+        template=theme,
+        height=400
+    )
+    return fig
+
+
+def hecho_treemap(hecho_summary, theme: str):
+    fig = px.treemap(
+        hecho_summary.to_pandas(),
+        path=["Tipo o Nombre de Hecho Victimizante"],
+        values="Total Víctimas",
+        title="Distribución de Hechos Victimizantes (Treemap)",
+        color="Total Víctimas",
+        color_continuous_scale="RdYlGn_r",
+        template=theme
+    )
+
+    fig.update_layout(height=500)
+    return fig
+
+
+def discapacidad_bar(discap_summary, theme: str):
+    fig = px.bar(
+        discap_summary.to_pandas(),
+        x="Discapacidad",
+        y="Total",
+        title="Víctimas con y sin Discapacidad",
+        labels={"Total": "Número de Personas", "Discapacidad": "Estado"},
+        color="Discapacidad",
+        template=theme,
+        color_discrete_map={"NO": "#2ecc71", "SI": "#e67e22"}
+    )
+
+    fig.update_layout(height=500, showlegend=True)
+    return fig
+
+
+def minorities_bar(etnia_detailed, theme: str):
+    fig = px.bar(
+        etnia_detailed.to_pandas(),
+        x="Etnia",
+        y="Total Víctimas",
+        title="Impacto del Desplazamiento en Minorías Étnicas (Excluye 'Ninguna')",
+        labels={"Total Víctimas": "Número de Víctimas", "Etnia": "Grupo Étnico"},
+        color="Total Víctimas",
+        color_continuous_scale="Reds",
+        template=theme,
+        text="Total Víctimas"
+    )
+
+    fig.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
+    fig.update_layout(height=500, showlegend=False)
+    fig.update_xaxes(tickangle=-45)
+    return fig
+
+
+def minorities_hecho_bar(hecho_minorities, theme: str):
+    fig = px.bar(
+        hecho_minorities.to_pandas(),
+        y="Tipo o Nombre de Hecho Victimizante",
+        x="Total Víctimas",
+        orientation='h',
+        title="Top 10 Hechos Victimizantes en Minorías Étnicas (Excluye 'Ninguna')",
+        labels={"Total Víctimas": "Número de Víctimas"},
+        color="Total Víctimas",
+        color_continuous_scale="YlOrRd",
+        template=theme
+    )
+
+    fig.update_layout(height=400, showlegend=False)
+    return fig
+
+
+def children_age_pie(age_distribution, theme: str):
+    age_dist_df = age_distribution.to_pandas()
+    age_dist_df['Etiqueta'] = age_dist_df['Ciclo vital'].map(AGE_LABELS)
+
+    fig = px.pie(
+        age_dist_df,
+        values="Total Víctimas",
+        names="Etiqueta",
+        title="Distribución de Menores Víctimas por Grupo de Edad",
+        hole=0.4,
+        template=theme,
+        color_discrete_sequence=px.colors.sequential.Reds_r
+    )
+
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(height=400)
+    return fig
+
+
+def children_hecho_bar(hecho_children, theme: str):
+    fig = px.bar(
+        hecho_children.to_pandas(),
+        y="Tipo o Nombre de Hecho Victimizante",
+        x="Total Víctimas",
+        orientation='h',
+        title="Top 10 Crímenes contra Menores de Edad",
+        labels={"Total Víctimas": "Número de Menores Afectados"},
+        color="Total Víctimas",
+        color_continuous_scale="Reds",
+        template=theme,
+        text="Total Víctimas"
+    )
+
+    fig.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
+    fig.update_layout(height=500, showlegend=False)
+    return fig
+
+
+def children_gender_pie(gender_children, theme: str):
+    fig = px.pie(
+        gender_children.to_pandas(),
+        values="Total",
+        names="Sexo",
+        title="Distribución por Sexo en Menores Víctimas",
+        hole=0.5,
+        template=theme,
+        color_discrete_map={"Mujer": "#e74c3c", "Hombre": "#3498db", "No especificado": "#95a5a6"}
+    )
+
+    fig.update_layout(height=350)
+    return fig
+
+
+def children_etnia_bar(etnia_children, theme: str):
+    fig = px.bar(
+        etnia_children.to_pandas(),
+        x="Etnia",
+        y="Total Menores",
+        title="Menores de Minorías Étnicas Víctimas (Top 8, Excluye 'Ninguna')",
+        labels={"Total Menores": "Número de Menores", "Etnia": "Grupo Étnico"},
+        color="Total Menores",
+        color_continuous_scale="OrRd",
+        template=theme,
+        text="Total Menores"
+    )
+
+    fig.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
+    fig.update_layout(height=400, showlegend=False)
+    fig.update_xaxes(tickangle=-45)
+    return fig
+
+
+def children_trend(temporal_children, theme: str):
+    temporal_children = downsample_frame(temporal_children, "Vigencia", "Menores Afectados", max_points())
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=temporal_children["Vigencia"].to_list(),
+        y=temporal_children["Menores Afectados"].to_list(),
+        mode='lines+markers',
+        name='Menores Afectados',
+        line=dict(color='#e74c3c', width=3),
+        marker=dict(size=8),
+        fill='tozeroy',
+        fillcolor='rgba(231, 76, 60, 0.1)'
+    ))
+
+    fig.update_layout(
+        title="Tendencia de Menores Afectados por Año",
+        xaxis_title="Año",
+        yaxis_title="Número de Menores",
+        template=theme,
+        height=400,
+        hovermode='x unified'
+    )
+    return fig
+
+
+def linked_year_ratio(linked_years, theme: str):
+    linked_years = linked_years.filter(pl.col("Llegadas por víctima").is_not_null())
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(
+        x=linked_years["Vigencia"].to_list(),
+        y=linked_years["Llegadas por víctima"].to_list(),
+        mode='lines+markers',
+        name='Llegadas por víctima',
+        line=dict(color='#1f77b4', width=3),
+        marker=dict(size=7)
+    ))
+
+    fig.update_layout(
+        title="Personas que Llegaron por Víctima Registrada, por Año",
+        xaxis_title="Año",
+        yaxis_title="Llegadas por víctima",
+        template=theme,
+        height=400,
+        hovermode='x unified'
+    )
+    return fig
+
+
+def linked_event_bar(linked_events, theme: str):
+    linked_events = linked_events.filter(pl.col("Llegadas por víctima").is_not_null()) \
+        .sort("Llegadas por víctima", descending=True)
+
+    fig = px.bar(
+        linked_events.to_pandas(),
+        y="Tipo o Nombre de Hecho Victimizante",
+        x="Llegadas por víctima",
+        orientation='h',
+        title="Llegadas por Víctima Registrada, por Hecho Victimizante",
+        labels={"Tipo o Nombre de Hecho Victimizante": "Hecho Victimizante"},
+        color="Llegadas por víctima",
+        color_continuous_scale="Tealgrn",
+        template=theme
+    )
+
+    fig.update_layout(height=450, showlegend=False, yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def linked_region_heatmap(event_by_region, theme: str):
+    matrix = event_by_region.pivot(
+        on="ESTADO_DEPTO", index="Tipo o Nombre de Hecho Victimizante", values="Personas que llegaron"
+    ).fill_null(0)
+    regions = [c for c in matrix.columns if c != "Tipo o Nombre de Hecho Victimizante"]
+
+    fig = go.Figure(data=go.Heatmap(
+        z=matrix.select(regions).to_numpy(),
+        x=regions,
+        y=matrix["Tipo o Nombre de Hecho Victimizante"].to_list(),
+        colorscale="YlOrRd",
+        colorbar=dict(title="Personas")
+    ))
+
+    fig.update_layout(
+        title="Hecho Victimizante por Región de Llegada (Top 10 Departamentos)",
+        template=theme,
+        height=500
+    )
+    fig.update_xaxes(tickangle=-45)
+    return fig
+
+
+def _series_label(frame):
+    return frame.with_columns(
+        pl.concat_str([pl.col("ESTADO_DEPTO"), pl.col("Tipo o Nombre de Hecho Victimizante")], separator=" · ")
+        .alias("Serie")
+    )
+
+
+def trends_zscore_heatmap(latest, theme: str):
+    matrix = latest.pivot(
+        on="ESTADO_DEPTO", index="Tipo o Nombre de Hecho Victimizante", values="Puntaje z"
+    )
+    regions = sorted(c for c in matrix.columns if c != "Tipo o Nombre de Hecho Victimizante")
+    year = latest["Vigencia"][0]
+
+    fig = go.Figure(data=go.Heatmap(
+        z=matrix.select(regions).to_numpy(),
+        x=regions,
+        y=matrix["Tipo o Nombre de Hecho Victimizante"].to_list(),
+        colorscale="RdBu_r",
+        zmid=0,
+        colorbar=dict(title="Puntaje z")
+    ))
+
+    fig.update_layout(
+        title=f"Puntaje z de {year} frente a la Historia de Cada Serie (Departamento × Hecho)",
+        template=theme,
+        height=550
+    )
+    fig.update_xaxes(tickangle=-45)
+    return fig
+
+
+def trends_hotspots_bar(hotspots, theme: str):
+    hotspots = _series_label(hotspots)
+
+    fig = px.bar(
+        hotspots.to_pandas(),
+        y="Serie",
+        x="Puntaje z",
+        orientation='h',
+        title="Focos Emergentes: Mayor Puntaje z con Crecimiento Anual",
+        hover_data=["Personas que llegaron", "Cambio anual", "Media móvil"],
+        color="Cambio anual",
+        color_continuous_scale="OrRd",
+        template=theme
+    )
+
+    fig.update_layout(height=550, yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def trends_series_lines(series, theme: str):
+    series = _series_label(series)
+    # Pocas series en el navegador y cada una con a lo sumo un punto por píxel de media pantalla
+    lines = limit_series(series.select("Serie", "Vigencia", "Personas que llegaron"),
+                         "Serie", "Vigencia", "Personas que llegaron")
+    lines = downsample_series(lines, "Serie", "Vigencia", "Personas que llegaron", max_points(0.5))
+
+    fig = px.line(
+        lines.to_pandas(),
+        x="Vigencia",
+        y="Personas que llegaron",
+        color="Serie",
+        title="Evolución de los Principales Focos Emergentes",
+        labels={"Vigencia": "Año"},
+        markers=True,
+        template=theme
+    )
+
+    anomalies = series.filter(pl.col("Anomalía") & pl.col("Serie").is_in(lines["Serie"].unique().to_list()))
+    fig.add_trace(go.Scatter(
+        x=anomalies["Vigencia"].to_list(),
+        y=anomalies["Personas que llegaron"].to_list(),
+        mode='markers',
+        name='Anomalía',
+        marker=dict(size=12, color='rgba(0,0,0,0)', line=dict(color='#d62728', width=2))
+    ))
+
+    fig.update_layout(height=450, hovermode='x unified')
+    return fig
+
+
+def trend_detail(series, theme: str):
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        x=series["Vigencia"].to_list(),
+        y=series["Personas que llegaron"].to_list(),
+        name='Personas que llegaron',
+        marker_color='#1f77b4'
+    ))
+
+    fig.add_trace(go.Scatter(
+        x=series["Vigencia"].to_list(),
+        y=series["Media móvil"].to_list(),
+        mode='lines',
+        name='Media móvil',
+        line=dict(color='#ff7f0e', width=3)
+    ))
+
+    anomalies = series.filter(pl.col("Anomalía"))
+    fig.add_trace(go.Scatter(
+        x=anomalies["Vigencia"].to_list(),
+        y=anomalies["Personas que llegaron"].to_list(),
+        mode='markers',
+        name='Anomalía',
+        marker=dict(size=12, color='#d62728', symbol='x')
+    ))
+
+    fig.update_layout(
+        xaxis_title="Año",
+        yaxis_title="Personas",
+        template=theme,
+        height=400,
+        hovermode='x unified'
+    )
+    return fig
+
+
+# ============================================
+# REVISIONES ENTRE CORTES
+# ============================================
+def revisions_heatmap(by_year_department, measure: str, theme: str):
+    matrix = by_year_department.pivot(on="Vigencia", index="ESTADO_DEPTO", values=f"Δ {measure}",
+                                      sort_columns=True).fill_null(0)
+    years = [col for col in matrix.columns if col != "ESTADO_DEPTO"]
+    # Departamentos con más revisión (en valor absoluto) arriba
+    matrix = matrix.with_columns(pl.sum_horizontal(pl.col(years).abs()).alias("__total")) \
+        .sort("__total").drop("__total")
+    limit = max(abs(v) for row in matrix.select(years).rows() for v in row) or 1
+
+    fig = go.Figure(data=go.Heatmap(
+        z=matrix.select(years).rows(),
+        x=years,
+        y=matrix["ESTADO_DEPTO"].to_list(),
+        colorscale="RdBu",
+        zmid=0,
+        zmin=-limit,
+        zmax=limit,
+        colorbar=dict(title="Δ")
+    ))
+
+    fig.update_layout(
+        title=f"Revisiones de {measure.lower()} por año y departamento",
+        xaxis_title="Año",
+        template=theme,
+        height=max(400, 22 * matrix.shape[0] + 120)
+    )
+    return fig
+
+
+def revisions_year_bar(by_year, measure: str, theme: str):
+    data = by_year.sort("Vigencia")
+    values = data[f"Δ {measure}"].to_list()
+
+    fig = go.Figure(go.Bar(
+        x=data["Vigencia"].to_list(),
+        y=values,
+        marker_color=['#2ecc71' if v >= 0 else '#e74c3c' for v in values]
+    ))
+
+    fig.update_layout(
+        title=f"Revisiones de {measure.lower()} por año",
+        xaxis_title="Año",
+        yaxis_title="Diferencia (nuevo − anterior)",
+        template=theme,
+        height=400
+    )
+    return fig
+
+
+# ============================================
+# MODO COMPARACIÓN
+# ============================================
+# Reciben el agregado largo (Porción, dimensión, medida) de comparison.py
+def comparison_bars(long, dim: str, measure: str, title: str, theme: str):
+    fig = px.bar(
+        long.to_pandas(),
+        x=dim,
+        y=measure,
+        color="Porción",
+        barmode="group",
+        title=title,
+        labels={dim: "", measure: "Personas"}
+    )
+    fig.update_layout(template=theme, height=400, xaxis_tickangle=-30, legend_title_text="")
+    return fig
+
+
+def comparison_lines(long, dim: str, measure: str, title: str, theme: str):
+    # Las porciones no se suman en "Otros" (pueden solaparse): solo se reduce cada serie
+    long = downsample_series(long, "Porción", dim, measure, max_points(0.6))
+    fig = px.line(
+        long.sort(dim).to_pandas(),
+        x=dim,
+        y=measure,
+        color="Porción",
+        markers=True,
+        title=title,
+        labels={dim: "Año", measure: "Personas"}
+    )
+    fig.update_layout(template=theme, height=400, hovermode='x unified', legend_title_text="")
+    return fig
+
+
+# ============================================
+# REGISTRO DE FIGURAS
+# ============================================
+# nombre de figura -> (función, sección, clave dentro de la sección)
+FIGURES = {
+    "temporal_line": (temporal_line, "temporal", None),
+    "temporal_events_bar": (temporal_events_bar, "temporal", None),
+    "geographic_bar": (geographic_bar, "geographic", None),
+    "etnia_pie": (etnia_pie, "demographic", "etnia"),
+    "ciclo_vital_bar": (ciclo_vital_bar, "demographic", "ciclo_vital"),
+    "sexo_pie": (sexo_pie, "demographic", "sexo"),
+    "hecho_treemap": (hecho_treemap, "comparative", "hecho"),
+    "discapacidad_bar": (discapacidad_bar, "comparative", "discapacidad"),
+    "minorities_bar": (minorities_bar, "minorities", "by_etnia"),
+    "minorities_hecho_bar": (minorities_hecho_bar, "minorities", "by_hecho"),
+    "children_age_pie": (children_age_pie, "children", "by_age"),
+    "children_hecho_bar": (children_hecho_bar, "children", "by_hecho"),
+    "children_gender_pie": (children_gender_pie, "children", "by_sexo"),
+    "children_etnia_bar": (children_etnia_bar, "children", "by_etnia"),
+    "children_trend": (children_trend, "children", "yearly"),
+    "linked_year_ratio": (linked_year_ratio, "linked", "by_year"),
+    "linked_event_bar": (linked_event_bar, "linked", "by_event"),
+    "linked_region_heatmap": (linked_region_heatmap, "linked", "event_by_region"),
+    "trends_zscore_heatmap": (trends_zscore_heatmap, "trends", "latest"),
+    "trends_hotspots_bar": (trends_hotspots_bar, "trends", "hotspots"),
+    "trends_series_lines": (trends_series_lines, "trends", "hotspot_series"),
+}
+
+
+def figure_data(sections: dict, name: str):
+    """Agregado que alimenta una figura, o None si no hay datos"""
+    _, section, key = FIGURES[name]
+    data = sections.get(section)
+    if data is not None and key is not None:
+        data = data.get(key)
+    if data is None or data.shape[0] == 0:
+        return None
+    if name == "temporal_events_bar" and "Eventos" not in data.columns:
+        return None
+    return data
+
+
+def get_figure(name: str, sections: dict, theme: str, figures: dict | None = None):
+    """Devuelve la figura pre-renderizada si existe; si no, la construye en vivo"""
+    if figures is not None and name in figures:
+        fig = figures[name]
+        if theme != "plotly":
+            fig.update_layout(template=theme)
+        return fig
+
+    data = figure_data(sections, name)
+    if data is None:
+        return None
+    with span(f"figure.{name}", rows=data.shape[0]):
+        return FIGURES[name][0](data, theme)
+
+
+def build_figures(sections: dict, theme: str = "plotly"):
+    """Construye todas las figuras disponibles para un conjunto de agregados"""
+    figures = {}
+    for name, (builder, _, _) in FIGURES.items():
+        data = figure_data(sections, name)
+        if data is not None:
+            figures[name] = builder(data, theme)
+    return figures
@@ -1,6 +1,9 @@
 import polars as pl
 
+from tracing import traced
 
+
+@traced()
 def apply_filters(
         df,
         selected_departments=["Todos"],
@@ -19,7 +22,9 @@ def apply_filters(
     # Filtro de años
     if "Todos" not in selected_years and "Vigencia" in df.columns:
         if selected_years:  # Verificar que no esté vacío
-            df = df.filter(pl.col("Vigencia").is_in(selected_years))
+            # Las opciones llegan como texto; se convierten al tipo de la columna
+            years = pl.Series([str(y) for y in selected_years]).cast(df.schema["Vigencia"], strict=False).drop_nulls()
+            df = df.filter(pl.col("Vigencia").is_in(years.to_list()))
 
     # Filtro de hechos victimizantes
     if "Todos" not in selected_fact and "Tipo o Nombre de Hecho Victimizante" in df.columns:
@@ -37,3 +42,66 @@ def apply_filters(
             df = df.filter(pl.col("Ciclo vital").is_in(selected_ciclo_vital))
 
     return df
+
+
+# Columna sobre la que actúa cada parámetro de apply_filters
+FILTER_COLUMNS = {
+    "selected_departments": "ESTADO_DEPTO",
+    "selected_years": "Vigencia",
+    "selected_fact": "Tipo o Nombre de Hecho Victimizante",
+    "selected_ciclo_vital": "Ciclo vital",
+    "selected_etnia": "Etnia",
+}
+
+
+def filter_key(filters: dict):
+    """Clave canónica y hashable de un estado de filtros ("Todos" equivale a no filtrar)"""
+    key = []
+    for param in FILTER_COLUMNS:
+        values = filters.get(param, ["Todos"])
+        if not values or "Todos" in values:
+            continue
+        key.append((param, tuple(sorted(str(v) for v in values))))
+    return tuple(key)
+
+
+def selected_years(filters: dict):
+    """Años que deja pasar el filtro de años, o None si no se filtra por año"""
+    return dict(filter_key(filters)).get("selected_years")
+
+
+def effective_filters(df, filters: dict):
+    """Devuelve solo los filtros que realmente cambian el DataFrame, en forma canónica y hashable"""
+    return tuple((param, values) for param, values in filter_key(filters) if FILTER_COLUMNS[param] in df.columns)
+
+
+def filter_expression(schema, filters: dict):
+    """Predicado de los filtros sobre las columnas presentes en el esquema (None si ninguno aplica)"""
+    # Se compara como texto, igual que llegan las opciones del sidebar
+    predicates = [pl.col(FILTER_COLUMNS[param]).cast(pl.Utf8).is_in([str(v) for v in values])
+                  for param, values in filter_key(filters) if FILTER_COLUMNS[param] in schema]
+    return pl.all_horizontal(predicates) if predicates else None
+
+
+# Dataset del que sale la lista de opciones de cada filtro del sidebar
+OPTION_SOURCES = {
+    "selected_fact": "subjects",
+    "selected_etnia": "subjects",
+    "selected_ciclo_vital": "subjects",
+    "selected_departments": "arrivals",
+    "selected_years": "arrivals",
+}
+
+
+def make_options(df, col):
+    """Opciones de un filtro: "Todos" más los valores únicos ordenados"""
+    if col not in df.columns:
+        return ["Todos"]
+    unique_vals = sorted([str(v) for v in df[col].unique().to_list() if v is not None])
+    return ["Todos"] + unique_vals
+
+
+def filter_options(df_subjects, df_arrivals):
+    """Opciones de todos los filtros del sidebar"""
+    frames = {"subjects": df_subjects, "arrivals": df_arrivals}
+    return {param: make_options(frames[source], FILTER_COLUMNS[param]) for param, source in OPTION_SOURCES.items()}
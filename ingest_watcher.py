@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from data_loader import dataset_version, load_datasets, write_filter_options
+from filters import filter_options
+from registry import source_paths
+from shared_data import current_version, preload, publish
+
+# ============================================
+# RE-INGESTA EN SEGUNDO PLANO
+# ============================================
+# Un observador de watchdog vigila las carpetas de los datasets registrados
+# (registry.py). Cuando llega o cambia un archivo fuente, un hilo de fondo
+# espera a que el archivo deje de cambiar (copias largas), carga la nueva
+# versión, reconstruye cachés e índices (pasos registrados con register_rebuild)
+# y solo entonces la publica de forma atómica (shared_data.publish). Las
+# sesiones en curso terminan su rerun con la versión anterior y toman la nueva
+# en el siguiente; nadie espera una carga en frío.
+#
+# Si la carga falla (archivo incompleto o corrupto) se conserva la versión
+# publicada y se vuelve a intentar con el siguiente cambio.
+
+SOURCE_FILES = {os.path.abspath(p) for path in source_paths() for p in (path, path + ".gz")}
+WATCH_DIRS = sorted({os.path.dirname(path) for path in SOURCE_FILES})
+SETTLE_SECONDS = 2.0
+
+_rebuild_steps = {}
+_pending = threading.Event()
+_start_lock = threading.Lock()
+_observer = None
+
+
+def register_rebuild(name: str, func):
+    """Registra un paso de reconstrucción: func(version, df_subjects, df_arrivals)"""
+    _rebuild_steps[name] = func
+
+
+register_rebuild("filter_options", lambda version, df_s, df_a: write_filter_options(version, filter_options(df_s, df_a)))
+
+
+class SourceChangeHandler(FileSystemEventHandler):
+    """Marca una re-ingesta pendiente cuando cambia algún archivo fuente"""
+
+    def on_any_event(self, event):
+        paths = [event.src_path, getattr(event, "dest_path", "")]
+        if any(path and os.path.abspath(path) in SOURCE_FILES for path in paths):
+            _pending.set()
+
+
+def wait_until_stable(settle: float = SETTLE_SECONDS):
+    """Espera a que los archivos fuente no cambien durante settle segundos"""
+    version = dataset_version()
+    while True:
+        time.sleep(settle)
+        latest = dataset_version()
+        if latest == version:
+            return version
+        version = latest
+
+
+def reingest(version: str | None = None):
+    """Carga, reconstruye y publica la versión actual de los archivos si es nueva"""
+    version = version or dataset_version()
+    if version == current_version():
+        return False
+
+    start = time.perf_counter()
+    df_subjects, df_arrivals = preload(version, load_datasets)[:2]
+    for name, step in _rebuild_steps.items():
+        try:
+            step(version, df_subjects, df_arrivals)
+        except Exception as e:
+            print(f"⚠️ Falló la reconstrucción de {name}: {e}")
+
+    publish(version)
+    print(f"✅ Versión {version} publicada en {time.perf_counter() - start:.1f}s")
+    return True
+
+
+def _worker():
+    while True:
+        _pending.wait()
+        _pending.clear()
+        try:
+            reingest(wait_until_stable())
+        except Exception as e:
+            print(f"⚠️ No se pudo re-ingestar los datos: {e}")
+
+
+def start_watcher():
+    """Arranca el observador y el hilo de re-ingesta (una sola vez por proceso)"""
+    global _observer
+    with _start_lock:
+        watch_dirs = [path for path in WATCH_DIRS if os.path.isdir(path)]
+        if _observer is not None or not watch_dirs:
+            return _observer
+
+        threading.Thread(target=_worker, name="reingest", daemon=True).start()
+        _observer = Observer()
+        _observer.daemon = True
+        for path in watch_dirs:
+            _observer.schedule(SourceChangeHandler(), path, recursive=False)
+        _observer.start()
+        return _observer
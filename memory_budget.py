@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+import result_cache
+from shared_data import memory_stats
+
+# ============================================
+# PRESUPUESTO DE MEMORIA
+# ============================================
+# Suma el tamaño estimado (estimated_size) de los datasets compartidos, de la
+# caché de resultados y de los datos filtrados de cada sesión, y lo compara con
+# un presupuesto configurable (MEMORY_BUDGET_MB; por defecto la mitad de la RAM):
+#
+#   < SOFT_LIMIT   normal
+#   >= SOFT_LIMIT  se vuelcan a disco (Arrow IPC) las entradas frías de la caché
+#   >= HARD_LIMIT  además se descartan entradas y se rechazan consultas pesadas
+#                  nuevas (MemoryPressure) en lugar de arriesgar un OOM
+#
+# Un hilo de fondo revisa el presupuesto cada GOVERNOR_SECONDS, y las consultas
+# pesadas lo revisan antes de empezar (admit_heavy_query).
+
+SOFT_LIMIT = 0.80
+HARD_LIMIT = 0.95
+GOVERNOR_SECONDS = 2.0
+SESSION_TTL_SECONDS = 15 * 60
+
+
+def _default_budget_mb():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 2 / 1e6
+    except (ValueError, OSError, AttributeError):
+        return 4096
+
+
+MEMORY_BUDGET_MB = float(os.environ.get("MEMORY_BUDGET_MB", _default_budget_mb()))
+
+_lock = threading.Lock()
+_sessions = {}
+_stats = {"spills": 0, "evictions": 0, "rejected": 0}
+_governor = None
+
+
+class MemoryPressure(Exception):
+    """La memoria estimada está sobre el límite; la consulta debe reintentarse más tarde"""
+
+
+def track_session(session_id: str, size_bytes: int):
+    """Registra el tamaño de los datos propios (filtrados) de una sesión"""
+    with _lock:
+        _sessions[session_id] = (size_bytes, time.time())
+
+
+def _session_bytes():
+    """Bytes de las sesiones vistas recientemente; las inactivas se olvidan"""
+    cutoff = time.time() - SESSION_TTL_SECONDS
+    with _lock:
+        for session_id in [s for s, (_, seen) in _sessions.items() if seen < cutoff]:
+            del _sessions[session_id]
+        return sum(size for size, _ in _sessions.values()), len(_sessions)
+
+
+def usage():
+    """Memoria estimada por componente frente al presupuesto"""
+    datasets_mb = memory_stats()["shared_mb"]
+    cache = result_cache.stats()
+    session_bytes, sessions = _session_bytes()
+    used_mb = datasets_mb + cache["mb"] + session_bytes / 1e6
+    return {
+        "budget_mb": MEMORY_BUDGET_MB,
+        "used_mb": used_mb,
+        "ratio": used_mb / MEMORY_BUDGET_MB if MEMORY_BUDGET_MB else 0.0,
+        "datasets_mb": datasets_mb,
+        "cache_mb": cache["mb"],
+        "spill_mb": cache["spill_mb"],
+        "sessions_mb": session_bytes / 1e6,
+        "sessions": sessions,
+        **_stats,
+    }
+
+
+def enforce():
+    """Aplica el presupuesto: vuelca y, si hace falta, descarta entradas de la caché"""
+    state = usage()
+    if state["ratio"] < SOFT_LIMIT:
+        return state
+
+    # Se libera hasta quedar por debajo del límite suave, con algo de margen
+    target = (state["used_mb"] - MEMORY_BUDGET_MB * (SOFT_LIMIT - 0.05)) * 1e6
+    freed = result_cache.spill_cold(target)
+    with _lock:
+        _stats["spills"] += freed > 0
+
+    if freed < target and state["ratio"] >= HARD_LIMIT:
+        result_cache.evict_cold(target - freed)
+        with _lock:
+            _stats["evictions"] += 1
+    return usage()
+
+
+def admit_heavy_query():
+    """Revisa el presupuesto antes de una consulta pesada; lanza MemoryPressure si no hay memoria"""
+    state = enforce()
+    if state["ratio"] >= HARD_LIMIT:
+        with _lock:
+            _stats["rejected"] += 1
+        raise MemoryPressure(
+            f"Memoria estimada {state['used_mb']:,.0f} MB de {state['budget_mb']:,.0f} MB disponibles"
+        )
+    return state
+
+
+def under_pressure():
+    """Indica si ya se pasó el límite suave (para trabajo opcional, como el precálculo)"""
+    return usage()["ratio"] >= SOFT_LIMIT
+
+
+def start_governor():
+    """Revisa el presupuesto periódicamente en un hilo de fondo (una sola vez por proceso)"""
+    global _governor
+    with _lock:
+        if _governor is not None:
+            return _governor
+
+        def run():
+            while True:
+                try:
+                    enforce()
+                except Exception as e:
+                    print(f"⚠️ Falló la revisión del presupuesto de memoria: {e}")
+                time.sleep(GOVERNOR_SECONDS)
+
+        _governor = threading.Thread(target=run, name="memory-governor", daemon=True)
+        _governor.start()
+        return _governor
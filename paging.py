@@ -0,0 +1,170 @@
+import time
+
+import numpy as np
+import polars as pl
+
+import result_cache
+from cohorts import drop_flags
+from data_loader import load_datasets
+from dimensions import drop_keys
+from filters import filter_expression
+from registry import dataset_frames
+from shared_data import acquire
+from text_cleaning import text_key
+from tracing import traced
+
+# ============================================
+# PAGINACIÓN EN EL SERVIDOR DE LAS TABLAS DETALLADAS
+# ============================================
+# Las tablas detalladas no convierten ni formatean el dataset filtrado en cada
+# rerun: cada página es un gather de PAGE_ROWS filas sobre el DataFrame
+# compartido, con índices que se calculan una vez y quedan en la caché de
+# resultados (por versión de los datos):
+#
+#   - Filas que cumplen los filtros: números de fila del DataFrame compartido.
+#   - Orden por columna: permutación de todas las filas (arg_sort) por columna
+#     y sentido. Ordenar la vista es recorrer la permutación quedándose con las
+#     filas de la vista, sin volver a ordenar.
+#   - Búsqueda: códigos de cada columna de texto en su diccionario de valores.
+#     El texto buscado se compara solo contra los valores distintos (sin
+#     mayúsculas ni tildes) y las filas salen de una tabla de consulta por
+#     código, sin recorrer texto por fila.
+#
+# Las filas de cada vista (filtros, búsqueda, orden) también quedan en la
+# caché, así que pasar de página no repite nada de lo anterior.
+
+PAGE_ROWS = 50
+ROW = "row"
+# Comparación de la búsqueda: sin espacios de más, mayúsculas ni tildes
+SEARCH_FOLD = {"trim": True, "fold_case": True, "fold_accents": True}
+
+
+def display_columns(df: pl.DataFrame):
+    """Columnas que se muestran (sin claves ni cohortes)"""
+    return drop_keys(drop_flags(df.head(0))).columns
+
+
+# ============================================
+# ÍNDICES POR VERSIÓN DE LOS DATOS
+# ============================================
+def _index(series: pl.Series):
+    return series.cast(pl.UInt32).alias(ROW).to_frame()
+
+
+def filtered_rows(df: pl.DataFrame, version: str, dataset: str, key: tuple):
+    """Números de fila que cumplen los filtros (None: todas las filas)"""
+    predicate = filter_expression(df.schema, {param: list(values) for param, values in key})
+    if predicate is None:
+        return None
+    return result_cache.get_or_compute(
+        ("rows", version, dataset, key),
+        lambda: _index(df.select(pl.arg_where(predicate))[:, 0]))[ROW]
+
+
+def sort_permutation(df: pl.DataFrame, version: str, dataset: str, column: str, descending: bool):
+    """Permutación de todas las filas ordenadas por la columna (nulos al final)"""
+    return result_cache.get_or_compute(
+        ("sort", version, dataset, column, descending),
+        lambda: _index(df[column].arg_sort(descending=descending, nulls_last=True)))[ROW]
+
+
+def dictionary_codes(df: pl.DataFrame, version: str, dataset: str, column: str):
+    """(valores distintos, código de cada fila) de una columna de texto"""
+    def compute():
+        values = df[column].drop_nulls().unique(maintain_order=True)
+        return {"values": values.to_frame(), "codes": df[column].cast(pl.Enum(values)).to_physical().to_frame()}
+
+    index = result_cache.get_or_compute(("dictionary", version, dataset, column), compute)
+    return index["values"][:, 0], index["codes"][:, 0]
+
+
+def search_rows(df: pl.DataFrame, version: str, dataset: str, text: str):
+    """Máscara de las filas con alguna columna de texto que contiene el texto buscado"""
+    needle = text_key(text, SEARCH_FOLD)
+    found = np.zeros(df.shape[0], dtype=bool)
+    for column in display_columns(df):
+        if df.schema[column] != pl.Utf8:
+            continue
+        values, codes = dictionary_codes(df, version, dataset, column)
+        # Una comparación por valor distinto; el código nulo apunta a la última posición (sin coincidencia)
+        matched = np.array([needle in text_key(value, SEARCH_FOLD) for value in values.to_list()] + [False])
+        if matched.any():
+            found |= matched[codes.cast(pl.UInt32).fill_null(len(values)).to_numpy()]
+    return found
+
+
+@traced()
+def view_rows(df: pl.DataFrame, version: str, dataset: str, key: tuple, search: str = "",
+              sort: tuple | None = None):
+    """Números de fila de la vista (filtros, búsqueda y orden (columna, descendente)), en orden"""
+    search = text_key(search, SEARCH_FOLD)
+
+    def compute():
+        rows = filtered_rows(df, version, dataset, key)
+        member = None
+        if rows is not None:
+            member = np.zeros(df.shape[0], dtype=bool)
+            member[rows.to_numpy()] = True
+        if search:
+            found = search_rows(df, version, dataset, search)
+            member = found if member is None else member & found
+        if sort is None:
+            index = np.arange(df.shape[0], dtype=np.uint32) if member is None else np.flatnonzero(member)
+        else:
+            permutation = sort_permutation(df, version, dataset, *sort).to_numpy()
+            index = permutation if member is None else permutation[member[permutation]]
+        return _index(pl.Series(index))
+
+    return result_cache.get_or_compute(("view", version, dataset, key, search, sort), compute)[ROW]
+
+
+# ============================================
+# PÁGINAS
+# ============================================
+def page_count(rows: int, page_rows: int = PAGE_ROWS):
+    return max((rows + page_rows - 1) // page_rows, 1)
+
+
+def _dataset(version: str, dataset: str):
+    """DataFrame compartido de un dataset y el lease a liberar"""
+    lease = acquire(version, load_datasets)
+    return dataset_frames(lease.frames())[dataset], lease
+
+
+def detail_columns(version: str, dataset: str):
+    """{columna: es numérica} de la tabla detallada de un dataset"""
+    df, lease = _dataset(version, dataset)
+    try:
+        return {col: df.schema[col].is_numeric() for col in display_columns(df)}
+    finally:
+        lease.release()
+
+
+def frame_page(df: pl.DataFrame, version: str, dataset: str, key: tuple, page: int, search: str = "",
+               sort: tuple | None = None, page_rows: int = PAGE_ROWS):
+    """Página de la vista: filas, página usada (la última si la pedida ya no existe), total y tiempo"""
+    start = time.perf_counter()
+    rows = view_rows(df, version, dataset, key, search, sort)
+    page = min(max(page, 1), page_count(rows.len(), page_rows))
+    first = (page - 1) * page_rows
+    data = df.select(display_columns(df))[rows.slice(first, page_rows).to_numpy()]
+    return {"data": data, "page": page, "rows": rows.len(), "first": first, "elapsed": time.perf_counter() - start}
+
+
+def table_page(version: str, dataset: str, key: tuple, page: int, search: str = "",
+               sort: tuple | None = None, page_rows: int = PAGE_ROWS):
+    """Página de la tabla detallada de un dataset sobre los datos compartidos (ver frame_page)"""
+    df, lease = _dataset(version, dataset)
+    try:
+        return frame_page(df, version, dataset, key, page, search, sort, page_rows)
+    finally:
+        lease.release()
+
+
+def view_frame(version: str, dataset: str, key: tuple, search: str = "", sort: tuple | None = None):
+    """Todas las filas de la vista, en su orden (para descargar)"""
+    df, lease = _dataset(version, dataset)
+    try:
+        return df.select(display_columns(df))[view_rows(df, version, dataset, key, search, sort).to_numpy()]
+    finally:
+        lease.release()
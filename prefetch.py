@@ -0,0 +1,167 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import result_cache
+from aggregations import compute_sections
+from data_loader import load_datasets
+from filters import apply_filters, filter_key, selected_years
+from memory_budget import admit_heavy_query, under_pressure
+from scheduler import PRIORITY_PREFETCH, PRIORITY_SECTIONS, run_query
+from shared_data import acquire
+from sharded import sharded_sections, sharding_enabled
+
+# ============================================
+# PRECÁLCULO ESPECULATIVO DE FILTROS
+# ============================================
+# Los analistas suelen profundizar un paso a la vez: primero un departamento,
+# luego un año, luego un hecho victimizante. Después de cada rerun se calculan
+# en segundo plano los agregados de los siguientes pasos más probables (los
+# departamentos, años y hechos con más personas dentro de la selección actual,
+# y los años vecinos si ya hay uno elegido) y se guardan en la caché de
+# resultados compartida, así el siguiente clic suele ser un acierto. Los
+# cálculos pasan por el planificador (scheduler.py) con la prioridad más baja, y
+# un clic sobre un estado que se está precalculando espera ese mismo cálculo.
+#
+# Solo se usan núcleos libres: pocos hilos, nada si la carga del sistema o la
+# memoria (memory_budget.py) ya están altas, y las tareas pendientes de una
+# sesión se descartan cuando esa sesión vuelve a cambiar de filtros.
+
+PREFETCH_WORKERS = max(1, (os.cpu_count() or 2) // 4)
+PREFETCH_STATES = 8
+CANDIDATES_PER_STEP = 4
+
+# Orden típico de profundización: (parámetro, sección, clave, dimensión)
+DRILL_STEPS = [
+    ("selected_departments", "geographic", None, "ESTADO_DEPTO"),
+    ("selected_years", "temporal", None, "Vigencia"),
+    ("selected_fact", "comparative", "hecho", "Tipo o Nombre de Hecho Victimizante"),
+]
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_lock = threading.Lock()
+_generations = {}
+_in_flight = {}
+_stats = {"scheduled": 0, "computed": 0, "skipped": 0}
+
+
+def sections_key(version: str, key: tuple):
+    """Clave de la caché de resultados para los agregados de un estado de filtros"""
+    return ("sections", version, key)
+
+
+def state_sections(version: str, key: tuple, priority: int = PRIORITY_SECTIONS):
+    """Agregados de un estado de filtros, desde la caché o calculados sobre los datos compartidos"""
+    def compute():
+        admit_heavy_query()
+        if sharding_enabled():
+            return sharded_sections(version, key)
+        lease = acquire(version, load_datasets)
+        try:
+            df_subjects, df_arrivals = lease.frames()[:2]
+        finally:
+            lease.release()
+        filters = {param: list(values) for param, values in key}
+        return compute_sections(apply_filters(df_subjects, **filters), apply_filters(df_arrivals, **filters),
+                                selected_years(filters))
+
+    cache_key = sections_key(version, key)
+    sections = result_cache.get(cache_key)
+    if sections is None:
+        # Pasa por el planificador: si una sesión ya pidió este estado, se espera su resultado
+        sections = run_query(cache_key, lambda: result_cache.put(cache_key, compute()), priority)
+    return sections
+
+
+def _ranked_values(sections: dict, section: str, name: str | None, dim: str):
+    data = sections.get(section)
+    if isinstance(data, dict):
+        data = data.get(name)
+    if data is None or dim not in data.columns or data.shape[0] == 0:
+        return []
+    measure = data.columns[1]
+    return data.sort(measure, descending=True)[dim].cast(str).to_list()
+
+
+def candidate_states(key: tuple, sections: dict, limit: int = PREFETCH_STATES):
+    """Estados de filtros más probables después del actual, en orden de prioridad"""
+    current = {param: list(values) for param, values in key}
+    candidates = []
+
+    # Años vecinos del año elegido (avanzar o retroceder uno)
+    years = current.get("selected_years", [])
+    if len(years) == 1 and years[0].lstrip("-").isdigit():
+        year = int(years[0])
+        for neighbour in (year + 1, year - 1):
+            candidates.append({**current, "selected_years": [str(neighbour)]})
+
+    # El siguiente paso de profundización sin filtro va primero
+    steps = sorted(DRILL_STEPS, key=lambda step: step[0] in current)
+    for param, section, name, dim in steps:
+        values = [v for v in _ranked_values(sections, section, name, dim) if v not in current.get(param, [])]
+        for value in values[:CANDIDATES_PER_STEP]:
+            candidates.append({**current, param: [value]})
+
+    states = []
+    for filters in candidates:
+        state = filter_key(filters)
+        if state != key and state not in states:
+            states.append(state)
+    return states[:limit]
+
+
+def _system_busy():
+    """Indica si la carga del sistema ya ocupa todos los núcleos"""
+    try:
+        return os.getloadavg()[0] >= (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return False
+
+
+def _run(version: str, state: tuple):
+    cache_key = sections_key(version, state)
+    try:
+        # La tarea pertenece a la última sesión que la pidió; si esa sesión ya
+        # cambió de filtros, la tarea quedó obsoleta
+        with _lock:
+            session_id, generation = _in_flight[cache_key]
+            stale = _generations.get(session_id) != generation
+        if stale or result_cache.contains(cache_key) or _system_busy() or under_pressure():
+            with _lock:
+                _stats["skipped"] += 1
+            return
+        state_sections(version, state, PRIORITY_PREFETCH)
+        with _lock:
+            _stats["computed"] += 1
+    except Exception as e:
+        print(f"⚠️ Falló el precálculo de {state}: {e}")
+    finally:
+        with _lock:
+            _in_flight.pop(cache_key, None)
+
+
+def schedule_prefetch(session_id: str, version: str, key: tuple, sections: dict):
+    """Encola el cálculo de los estados probables siguientes para una sesión"""
+    states = candidate_states(key, sections)
+    with _lock:
+        generation = _generations.get(session_id, 0) + 1
+        _generations[session_id] = generation
+        pending = []
+        for state in states:
+            cache_key = sections_key(version, state)
+            if result_cache.contains(cache_key):
+                continue
+            if cache_key not in _in_flight:
+                pending.append(state)
+            _in_flight[cache_key] = (session_id, generation)
+        _stats["scheduled"] += len(pending)
+
+    for state in pending:
+        _executor.submit(_run, version, state)
+    return pending
+
+
+def prefetch_stats():
+    """Estados encolados, calculados y descartados desde el arranque"""
+    with _lock:
+        return {**_stats, "in_flight": len(_in_flight)}
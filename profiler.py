@@ -0,0 +1,113 @@
+import polars as pl
+
+from cohorts import UNSPECIFIED, drop_flags
+from dimensions import drop_keys
+from tracing import traced
+
+# ============================================
+# PERFIL DE CALIDAD DE LOS DATOS
+# ============================================
+# Al cargar cada versión de los datos se perfila cada columna de los
+# datasets registrados con un solo select (una pasada vectorizada por dataset):
+#
+#   nulos            valores nulos (las columnas de texto ya vienen rellenas)
+#   no_especificado  valores "No especificado", propios o rellenados al cargar
+#   rellenados       nulos de texto que la carga reemplazó por "No especificado"
+#   normalizados     textos que la carga llevó a su etiqueta canónica (variantes
+#                    de mayúsculas, tildes, espacios o sinónimos; text_cleaning.py)
+#   descartados      valores que no se pudieron convertir al tipo de la columna
+#                    al leer el CSV y quedaron nulos
+#   distintos        número de valores distintos
+#   top              valores más frecuentes (texto) o cuantiles (números)
+#   atipicos         valores numéricos fuera de Q1 - 1.5·IQR .. Q3 + 1.5·IQR
+#
+# El perfil se guarda por versión de los datos (data_loader.write_profile), así
+# que la sección de análisis crítico lo lee sin recalcular nada en cada rerun.
+
+TOP_VALUES = 5
+OUTLIER_IQR = 1.5
+
+
+def _column_profile(name: str, dtype):
+    """Estadísticas de una columna como un struct de una fila"""
+    col = pl.col(name)
+    fields = {"nulos": col.null_count(), "distintos": col.n_unique()}
+    if dtype == pl.Utf8:
+        fields["no_especificado"] = (col == UNSPECIFIED).sum()
+        fields["top"] = col.value_counts(sort=True, name="n").head(TOP_VALUES).implode()
+    elif dtype.is_numeric():
+        q1, q3 = col.quantile(0.25), col.quantile(0.75)
+        fence = (q3 - q1) * OUTLIER_IQR
+        fields.update({
+            "min": col.min(), "q1": q1, "mediana": col.median(), "q3": q3,
+            "p99": col.quantile(0.99), "max": col.max(),
+            "atipicos": ((col < q1 - fence) | (col > q3 + fence)).sum(),
+        })
+    return pl.struct(**fields).alias(name)
+
+
+@traced()
+def profile_frame(df: pl.DataFrame, load_stats: dict | None = None):
+    """Perfil de calidad de todas las columnas de un dataset en una sola pasada"""
+    df = drop_keys(drop_flags(df))
+    load_stats = load_stats or {}
+    rows = df.shape[0]
+    stats = df.select([_column_profile(name, dtype) for name, dtype in df.schema.items()]).row(0, named=True) \
+        if df.width else {}
+
+    columns = {}
+    for name, dtype in df.schema.items():
+        column = dict(stats[name])
+        if "top" in column:
+            column["top"] = [[item[name], item["n"]] for item in column["top"]]
+        column["tipo"] = str(dtype)
+        column["rellenados"] = load_stats.get("filled", {}).get(name, 0)
+        column["descartados"] = load_stats.get("coerced", {}).get(name, 0)
+        column["normalizados"] = load_stats.get("normalized", {}).get(name, 0)
+        for key in ("nulos", "no_especificado", "descartados", "atipicos"):
+            if key in column:
+                column[f"{key}_pct"] = column[key] / rows * 100 if rows else 0.0
+        columns[name] = column
+    return {"rows": rows, "columns": columns}
+
+
+def profile_datasets(frames: dict, load_stats: dict | None = None):
+    """Perfil de cada dataset {nombre: DataFrame}; load_stats trae lo contado al leer los CSV"""
+    load_stats = load_stats or {}
+    return {name: profile_frame(df, load_stats.get(name)) for name, df in frames.items()}
+
+
+def quality_table(profile: dict):
+    """Tabla de una fila por columna para mostrar el perfil de un dataset"""
+    rows = []
+    for name, column in profile["columns"].items():
+        if "top" in column:
+            distribution = ", ".join(f"{value} ({count:,})" for value, count in column["top"])
+        elif "mediana" in column and column["mediana"] is not None:
+            distribution = f"mín {column['min']:.0f} · mediana {column['mediana']:.0f} · p99 {column['p99']:.0f} " \
+                           f"· máx {column['max']:.0f}"
+        else:
+            distribution = ""
+        rows.append({
+            "Columna": name,
+            "Tipo": column["tipo"],
+            "Nulos (%)": round(column["nulos_pct"], 2),
+            "No especificado (%)": round(column.get("no_especificado_pct", 0.0), 2),
+            "Rellenados al cargar": column["rellenados"],
+            "Descartados al cargar": column["descartados"],
+            "Normalizados al cargar": column.get("normalizados", 0),
+            "Distintos": column["distintos"],
+            "Atípicos (IQR)": column.get("atipicos"),
+            "Distribución": distribution,
+        })
+    return pl.DataFrame(rows)
+
+
+def quality_issues(profile: dict, limit: int = 3):
+    """Columnas con más valores sin especificar o nulos, de mayor a menor"""
+    issues = []
+    for name, column in profile["columns"].items():
+        rate = column.get("no_especificado_pct", 0.0) + column["nulos_pct"]
+        if rate > 0:
+            issues.append((name, rate))
+    return sorted(issues, key=lambda item: -item[1])[:limit]
@@ -0,0 +1,123 @@
+import os
+
+import orjson
+
+from startup import lazy_import
+
+# Polars solo hace falta si el registro impone tipos de columna: el registro se
+# lee antes de dibujar el sidebar (ver startup.py)
+pl = lazy_import("polars")
+
+# ============================================
+# REGISTRO DE DATASETS
+# ============================================
+# Los datasets que se cargan se declaran en registry.json (o en el archivo que
+# indique DATASET_REGISTRY), no en el código. Cada entrada de "datasets" lista:
+#
+#   label       nombre para mostrar
+#   source      ruta del CSV (se acepta también la versión .gz)
+#   read        opciones de lectura de pl.read_csv (separator, skip_rows, ...)
+#   drop        columnas que se descartan
+#   rename      {columna del CSV: nombre en el dashboard}
+#   schema      {columna: tipo de Polars} que se impone sobre el inferido
+#   cleaning    reglas de limpieza de textos: nulos, espacios, mayúsculas, tildes,
+#               etiquetas canónicas y sinónimos (ver text_cleaning.py)
+#   cut         columna con la fecha de corte del RUV; se lee al cargar para el
+#               historial de cortes (cuts.py) y no queda en el DataFrame
+#   dimensions  dimensiones conformadas (ver dimensions.py) que se filtran y se
+#               codifican con el diccionario compartido entre datasets
+#
+# Lo que una entrada no declara sale de "defaults"; rename y cleaning se
+# combinan con los de "defaults" y drop se suma. "subjects" y "arrivals" son
+# obligatorios (alimentan las secciones del dashboard) y van primero; los demás
+# reportes del RUV que se registren se cargan, se perfilan y se comparten igual.
+
+REGISTRY_PATH = os.environ.get("DATASET_REGISTRY", "registry.json")
+
+# Dimensiones conformadas entre datasets (ver dimensions.py): dimensión -> columna de origen
+CONFORMED_DIMENSIONS = {
+    "year": "Vigencia",
+    "department": "ESTADO_DEPTO",
+    "event": "Tipo o Nombre de Hecho Victimizante",
+}
+CORE_DATASETS = ("subjects", "arrivals")
+SPEC_KEYS = {"label", "source", "read", "drop", "rename", "schema", "cleaning", "cut", "dimensions"}
+
+
+def _dtype(name: str):
+    dtype = getattr(pl, name, None)
+    if not (isinstance(dtype, type) and issubclass(dtype, pl.DataType)):
+        raise Exception(f"Tipo de columna desconocido en el registro de datasets: {name}")
+    return dtype
+
+
+def _spec(defaults: dict, entry: dict):
+    """Especificación de un dataset con los valores por defecto aplicados"""
+    spec = {"read": {}, "drop": [], "rename": {}, "schema": {}, "cleaning": {}, "cut": None,
+            "dimensions": list(CONFORMED_DIMENSIONS), **defaults, **entry}
+    spec["drop"] = list(dict.fromkeys([*defaults.get("drop", []), *entry.get("drop", [])]))
+    for key in ("rename", "cleaning", "schema"):
+        spec[key] = {**defaults.get(key, {}), **entry.get(key, {})}
+    spec["schema"] = {col: _dtype(name) for col, name in spec["schema"].items()}
+    return spec
+
+
+def read_registry(path: str = REGISTRY_PATH):
+    """Contenido del archivo de registro"""
+    try:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError) as e:
+        raise Exception(f"No se pudo leer el registro de datasets {path}: {e}")
+
+
+def load_registry(config: dict):
+    """Especificaciones de los datasets registrados, en orden y con los obligatorios primero"""
+    entries = config.get("datasets", {})
+    missing = [name for name in CORE_DATASETS if name not in entries]
+    if missing:
+        raise Exception(f"El registro de datasets no declara: {', '.join(missing)}")
+
+    defaults = config.get("defaults", {})
+    registry = {}
+    for name in [*CORE_DATASETS, *(name for name in entries if name not in CORE_DATASETS)]:
+        entry = entries[name]
+        unknown = set(entry) - SPEC_KEYS
+        if "source" not in entry or unknown:
+            raise Exception(f"Entrada inválida en el registro de datasets: {name} "
+                            f"({'falta source' if 'source' not in entry else 'claves ' + ', '.join(sorted(unknown))})")
+        spec = _spec(defaults, entry)
+        spec["label"] = entry.get("label", name)
+        unknown = set(spec["dimensions"]) - set(CONFORMED_DIMENSIONS)
+        if unknown:
+            raise Exception(f"Dimensiones desconocidas en {name}: {', '.join(sorted(unknown))}")
+        registry[name] = spec
+    return registry
+
+
+_config = read_registry()
+DATASETS = load_registry(_config)
+DEFAULT_SPEC = _spec(_config.get("defaults", {}), {})
+
+
+def dataset_label(name: str):
+    """Nombre para mostrar de un dataset registrado"""
+    return DATASETS[name]["label"] if name in DATASETS else name
+
+
+def source_paths():
+    """Rutas de los archivos fuente de todos los datasets registrados"""
+    return [spec["source"] for spec in DATASETS.values()]
+
+
+def spec_for_path(path: str):
+    """Especificación del dataset registrado con ese archivo (por nombre), o la de "defaults\""""
+    for spec in DATASETS.values():
+        if os.path.basename(spec["source"]) == os.path.basename(path):
+            return spec
+    return DEFAULT_SPEC
+
+
+def dataset_frames(frames: tuple):
+    """{nombre: DataFrame} para la tupla de frames de data_loader.load_datasets"""
+    return dict(zip(DATASETS, frames))
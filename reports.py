@@ -0,0 +1,261 @@
+import argparse
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import polars as pl
+from reportlab.graphics.charts.barcharts import HorizontalBarChart, VerticalBarChart
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from aggregations import SLICE_PARAMS, build_slices, iter_slice_sections
+from data_loader import dataset_version, load_datasets
+from sharded import iter_sharded_sections
+
+# ============================================
+# REPORTES PDF POR LOTES (SIN INTERFAZ)
+# ============================================
+# Uso:  python reports.py --by departamento --output reportes/ --workers 8
+#
+# El proceso principal calcula los agregados de cada porción (slice) y los envía
+# a un pool de procesos que dibuja las gráficas y arma el PDF. Mientras los
+# trabajadores arman un PDF, el proceso principal ya está calculando la siguiente
+# porción. Los agregados de un dataset que no cambia entre porciones (por ejemplo,
+# víctimas cuando se parte por departamento y el archivo no tiene ESTADO_DEPTO)
+# se calculan una sola vez y se comparten.
+#
+# Con --sharded los agregados salen de la agregación por porciones en varios
+# procesos (sharded.py) y este proceso no carga los datasets.
+
+CHART_WIDTH = 17 * cm
+CHART_HEIGHT = 7 * cm
+PALETTE = [colors.HexColor(c) for c in
+           ["#e74c3c", "#3498db", "#2ecc71", "#e67e22", "#9b59b6", "#1abc9c", "#f1c40f", "#95a5a6"]]
+
+
+# ============================================
+# GRÁFICAS (REPORTLAB)
+# ============================================
+def _short(label, size: int = 28):
+    label = str(label)
+    return label if len(label) <= size else label[:size - 1] + "…"
+
+
+def bar_chart(df: pl.DataFrame, dim: str, measure: str, horizontal: bool = False):
+    """Gráfica de barras a partir de un agregado (dimensión, medida)"""
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    chart = HorizontalBarChart() if horizontal else VerticalBarChart()
+    chart.x, chart.y = (6 * cm, 0.8 * cm) if horizontal else (1.5 * cm, 2.5 * cm)
+    chart.width = CHART_WIDTH - chart.x - 0.5 * cm
+    chart.height = CHART_HEIGHT - chart.y - 0.5 * cm
+
+    labels = [_short(v) for v in df[dim].to_list()]
+    values = [float(v or 0) for v in df[measure].to_list()]
+    if horizontal:
+        labels, values = labels[::-1], values[::-1]
+
+    chart.data = [values]
+    chart.categoryAxis.categoryNames = labels
+    chart.categoryAxis.labels.fontSize = 6
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 6
+    chart.bars[0].fillColor = PALETTE[0]
+    if not horizontal:
+        chart.categoryAxis.labels.angle = 45
+        chart.categoryAxis.labels.boxAnchor = "ne"
+    drawing.add(chart)
+    return drawing
+
+
+def line_chart(df: pl.DataFrame, dim: str, measure: str):
+    """Serie temporal simple"""
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    chart = HorizontalLineChart()
+    chart.x, chart.y = 1.5 * cm, 1.2 * cm
+    chart.width = CHART_WIDTH - 2 * cm
+    chart.height = CHART_HEIGHT - 1.7 * cm
+    chart.data = [[float(v or 0) for v in df[measure].to_list()]]
+    chart.categoryAxis.categoryNames = [str(v) for v in df[dim].to_list()]
+    chart.categoryAxis.labels.fontSize = 6
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 6
+    chart.lines[0].strokeColor = PALETTE[0]
+    chart.lines[0].strokeWidth = 2
+    drawing.add(chart)
+    return drawing
+
+
+def pie_chart(df: pl.DataFrame, dim: str, measure: str):
+    """Gráfica circular"""
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    chart = Pie()
+    chart.x, chart.y = CHART_WIDTH / 2 - 2.75 * cm, 0.5 * cm
+    chart.width = chart.height = 5.5 * cm
+    chart.data = [float(v or 0) for v in df[measure].to_list()]
+    chart.labels = [_short(v, 20) for v in df[dim].to_list()]
+    chart.slices.fontSize = 6
+    for i in range(len(chart.data)):
+        chart.slices[i].fillColor = PALETTE[i % len(PALETTE)]
+    drawing.add(chart)
+    return drawing
+
+
+def data_table(df: pl.DataFrame, max_rows: int = 15):
+    """Tabla con formato de miles"""
+    rows = [list(df.columns)]
+    for row in df.head(max_rows).iter_rows():
+        rows.append([f"{v:,.0f}" if isinstance(v, (int, float)) else _short(v, 40) for v in row])
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1f77b4")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTSIZE", (0, 0), (-1, -1), 7),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+    ]))
+    return table
+
+
+# ============================================
+# ARMADO DEL PDF (SE EJECUTA EN EL POOL)
+# ============================================
+def slice_filename(label: str):
+    """Nombre de archivo seguro para una porción"""
+    name = re.sub(r"[^\w\-]+", "_", label, flags=re.UNICODE).strip("_")
+    return f"reporte_{name or 'nacional'}.pdf"
+
+
+def render_pdf(label: str, sections: dict, output_dir: str):
+    """Arma el PDF de una porción a partir de sus agregados ya calculados"""
+    styles = getSampleStyleSheet()
+    story = [
+        Paragraph(f"Análisis de Desplazamiento Forzado — {label}", styles["Title"]),
+        Spacer(1, 0.3 * cm),
+    ]
+
+    # Indicadores clave
+    kpis = sections["kpis"]
+    story.append(Paragraph("Indicadores Clave de Impacto", styles["Heading2"]))
+    kpi_rows = [
+        ["Total Personas Afectadas", f"{kpis.get('total_victims', 0):,}"],
+        ["Personas Desplazadas", f"{kpis.get('total_displaced', 0):,}"],
+        ["Eventos Registrados", f"{kpis.get('total_events', 0):,}"],
+        ["Departamentos Afectados", f"{kpis.get('unique_depts', 0):,}"],
+    ]
+    story.append(Table(kpi_rows, hAlign="LEFT"))
+
+    # Análisis temporal
+    temporal = sections.get("temporal")
+    if temporal is not None and temporal.shape[0] > 0:
+        story.append(Paragraph("Evolución Temporal del Desplazamiento Forzado", styles["Heading2"]))
+        story.append(line_chart(temporal, "Vigencia", "Personas Desplazadas"))
+
+    # Perfil demográfico
+    story.append(PageBreak())
+    story.append(Paragraph("Perfil Demográfico de las Víctimas", styles["Heading2"]))
+    demographic = sections.get("demographic") or {}
+    if demographic.get("etnia") is not None:
+        story.append(Paragraph("Distribución por Etnia", styles["Heading4"]))
+        story.append(bar_chart(demographic["etnia"], "Etnia", "Total", horizontal=True))
+    if demographic.get("ciclo_vital") is not None:
+        story.append(Paragraph("Distribución por Ciclo Vital", styles["Heading4"]))
+        story.append(bar_chart(demographic["ciclo_vital"], "Ciclo vital", "Total"))
+    if demographic.get("sexo") is not None:
+        story.append(Paragraph("Distribución por Sexo", styles["Heading4"]))
+        story.append(pie_chart(demographic["sexo"], "Sexo", "Total"))
+
+    # Minorías étnicas
+    minorities = sections.get("minorities")
+    if minorities is not None and minorities["by_etnia"].shape[0] > 0:
+        story.append(PageBreak())
+        story.append(Paragraph("Minorías Étnicas (Excluye 'Ninguna')", styles["Heading2"]))
+        pct = minorities["total_minorities"] / minorities["total_all_victims"] * 100 \
+            if minorities["total_all_victims"] else 0
+        story.append(Paragraph(
+            f"{minorities['total_minorities']:,} víctimas de minorías étnicas ({pct:.1f}% del total).",
+            styles["Normal"]))
+        story.append(bar_chart(minorities["by_etnia"], "Etnia", "Total Víctimas", horizontal=True))
+        story.append(data_table(minorities["by_etnia"]))
+        if minorities["by_hecho"] is not None:
+            story.append(Paragraph("Top 10 Hechos Victimizantes en Minorías Étnicas", styles["Heading4"]))
+            story.append(bar_chart(minorities["by_hecho"], "Tipo o Nombre de Hecho Victimizante",
+                                   "Total Víctimas", horizontal=True))
+
+    # Menores de edad
+    children = sections.get("children")
+    if children is not None and children["children_events"] > 0:
+        story.append(PageBreak())
+        story.append(Paragraph("Menores de Edad y Protección Infantil", styles["Heading2"]))
+        pct = children["total_children"] / children["total_victims"] * 100 if children["total_victims"] else 0
+        story.append(Paragraph(
+            f"{children['total_children']:,} menores afectados ({pct:.1f}% del total), "
+            f"{children.get('girls', 0):,} niñas y {children.get('boys', 0):,} niños.",
+            styles["Normal"]))
+        story.append(pie_chart(children["by_age"], "Ciclo vital", "Total Víctimas"))
+        if children["by_hecho"] is not None:
+            story.append(Paragraph("Top 10 Crímenes contra Menores de Edad", styles["Heading4"]))
+            story.append(bar_chart(children["by_hecho"], "Tipo o Nombre de Hecho Victimizante",
+                                   "Total Víctimas", horizontal=True))
+        if children["yearly"] is not None and children["yearly"].shape[0] > 0:
+            story.append(Paragraph("Tendencia de Menores Afectados por Año", styles["Heading4"]))
+            story.append(line_chart(children["yearly"], "Vigencia", "Menores Afectados"))
+
+    path = os.path.join(output_dir, slice_filename(label))
+    SimpleDocTemplate(path, pagesize=A4, title=f"Reporte {label}").build(story)
+    return path
+
+
+# ============================================
+# EJECUCIÓN POR LOTES
+# ============================================
+def run_batch(df_subjects: pl.DataFrame | None, df_arrivals: pl.DataFrame | None, by: str, output_dir: str,
+              workers: int | None = None, sharded_version: str | None = None):
+    """Genera un PDF por porción usando un pool de procesos"""
+    os.makedirs(output_dir, exist_ok=True)
+    if sharded_version is not None:
+        slice_sections = iter_sharded_sections(sharded_version, by)
+    else:
+        slices = build_slices(df_subjects, df_arrivals, by)
+        slice_sections = iter_slice_sections(df_subjects, df_arrivals, slices, by)
+    paths = []
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            pool.submit(render_pdf, label, sections, output_dir): label
+            for label, _, sections in slice_sections
+        }
+        for future in as_completed(futures):
+            path = future.result()
+            paths.append(path)
+            print(f"✅ {futures[future]}: {path}")
+
+    return sorted(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera reportes PDF del dashboard por lotes")
+    parser.add_argument("--by", choices=list(SLICE_PARAMS), default="departamento",
+                        help="Criterio para partir los reportes")
+    parser.add_argument("--output", default="reportes", help="Carpeta de salida")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (por defecto, todos los núcleos)")
+    parser.add_argument("--sharded", action="store_true", help="Calcular los agregados por porciones en varios procesos")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.sharded:
+        paths = run_batch(None, None, args.by, args.output, args.workers, sharded_version=dataset_version())
+    else:
+        df_subjects, df_arrivals = load_datasets()[:2]
+        paths = run_batch(df_subjects, df_arrivals, args.by, args.output, args.workers)
+    print(f"📄 {len(paths)} reportes generados en {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import orjson
+import polars as pl
+
+# ============================================
+# CACHÉ DE RESULTADOS COMPARTIDA
+# ============================================
+# Resultados ya calculados (agregados por sección, respuestas JSON) compartidos
+# por todo el proceso. Las claves incluyen la versión de los datos y la clave
+# canónica de filtros (filters.filter_key), así que una versión nueva nunca
+# sirve resultados viejos: las entradas antiguas simplemente envejecen y salen
+# por LRU. El tamaño se limita en entradas y en bytes estimados.
+#
+# Bajo presión de memoria (ver memory_budget.py) las entradas menos usadas se
+# vuelcan a disco: los DataFrames en Arrow IPC y el resto de la estructura en
+# JSON. La entrada sigue en el índice y se relee (con memory-map) al pedirla.
+
+RESULT_CACHE_ENTRIES = 2048
+RESULT_CACHE_MB = 256
+SPILL_DIR = os.environ.get("SPILL_DIR", os.path.join("cache", "spill"))
+SPILL_MB = 2048
+
+_SPILLED = object()
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0, "spilled": 0, "spill_bytes": 0, "reloads": 0}
+
+
+def estimate_size(value):
+    """Bytes aproximados de un resultado (DataFrames, bytes, diccionarios y listas)"""
+    if isinstance(value, pl.DataFrame):
+        return value.estimated_size()
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values()) + 64 * len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value) + 8 * len(value)
+    return 32
+
+
+def _drop(key, entry):
+    """Quita una entrada del índice y libera su memoria o su volcado (con _lock tomado)"""
+    value, size = entry
+    if value is _SPILLED:
+        _stats["spill_bytes"] -= size
+        shutil.rmtree(_spill_path(key), ignore_errors=True)
+    else:
+        _stats["bytes"] -= size
+
+
+def _evict():
+    """Descarta las entradas menos usadas hasta volver a los límites (con _lock tomado)"""
+    max_bytes = RESULT_CACHE_MB * 1024 * 1024
+    while _entries and (len(_entries) > RESULT_CACHE_ENTRIES or _stats["bytes"] > max_bytes):
+        key, entry = _entries.popitem(last=False)
+        _drop(key, entry)
+        _stats["evictions"] += 1
+
+
+# ============================================
+# VOLCADO A DISCO (ARROW IPC)
+# ============================================
+def _spill_path(key):
+    return os.path.join(SPILL_DIR, hashlib.sha1(repr(key).encode()).hexdigest()[:20])
+
+
+def _write_spill(path: str, value):
+    """Escribe el valor en path: DataFrames en IPC, bytes en crudo, el resto en JSON"""
+    os.makedirs(path, exist_ok=True)
+    files = []
+
+    def encode(obj):
+        if isinstance(obj, pl.DataFrame):
+            name = f"{len(files)}.arrow"
+            obj.write_ipc(os.path.join(path, name))
+            files.append(name)
+            return {"__ipc__": name}
+        if isinstance(obj, bytes):
+            name = f"{len(files)}.bin"
+            with open(os.path.join(path, name), "wb") as f:
+                f.write(obj)
+            files.append(name)
+            return {"__bytes__": name}
+        if isinstance(obj, dict):
+            return {"__dict__": [[k, encode(v)] for k, v in obj.items()]}
+        if isinstance(obj, (list, tuple)):
+            return [encode(v) for v in obj]
+        return obj
+
+    with open(os.path.join(path, "value.json"), "wb") as f:
+        f.write(orjson.dumps(encode(value), option=orjson.OPT_SERIALIZE_NUMPY))
+    return sum(os.path.getsize(os.path.join(path, name)) for name in files + ["value.json"])
+
+
+def _read_spill(path: str):
+    def decode(obj):
+        if isinstance(obj, dict):
+            if "__ipc__" in obj:
+                return pl.read_ipc(os.path.join(path, obj["__ipc__"]), memory_map=True)
+            if "__bytes__" in obj:
+                with open(os.path.join(path, obj["__bytes__"]), "rb") as f:
+                    return f.read()
+            return {k: decode(v) for k, v in obj["__dict__"]}
+        if isinstance(obj, list):
+            return [decode(v) for v in obj]
+        return obj
+
+    with open(os.path.join(path, "value.json"), "rb") as f:
+        return decode(orjson.loads(f.read()))
+
+
+def spill_cold(target_bytes: int):
+    """Vuelca a disco las entradas menos usadas hasta liberar target_bytes de memoria"""
+    freed = 0
+    with _lock:
+        cold = [(key, entry) for key, entry in _entries.items() if entry[0] is not _SPILLED]
+
+    for key, (value, size) in cold:
+        if freed >= target_bytes:
+            break
+        path = _spill_path(key)
+        try:
+            disk_size = _write_spill(path, value)
+        except (OSError, TypeError) as e:
+            print(f"⚠️ No se pudo volcar a disco una entrada de la caché: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            continue
+
+        with _lock:
+            # La entrada pudo cambiar o desaparecer mientras se escribía
+            current = _entries.get(key)
+            if current is None or current[0] is not value:
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            _entries[key] = (_SPILLED, disk_size)
+            _stats["bytes"] -= size
+            _stats["spill_bytes"] += disk_size
+            _stats["spilled"] += 1
+            freed += size
+
+            # El volcado también tiene límite: se descartan los más antiguos
+            for old_key in [k for k, e in _entries.items() if e[0] is _SPILLED]:
+                if _stats["spill_bytes"] <= SPILL_MB * 1024 * 1024:
+                    break
+                _drop(old_key, _entries.pop(old_key))
+                _stats["evictions"] += 1
+    return freed
+
+
+def evict_cold(target_bytes: int):
+    """Descarta de memoria (sin volcar) las entradas menos usadas hasta liberar target_bytes"""
+    freed = 0
+    with _lock:
+        for key in list(_entries):
+            if freed >= target_bytes:
+                break
+            value, size = _entries[key]
+            if value is _SPILLED:
+                continue
+            _drop(key, _entries.pop(key))
+            _stats["evictions"] += 1
+            freed += size
+    return freed
+
+
+def get(key):
+    """Resultado guardado para la clave (releído de disco si estaba volcado), o None"""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        if entry[0] is not _SPILLED:
+            return entry[0]
+
+    try:
+        value = _read_spill(_spill_path(key))
+    except (OSError, ValueError) as e:
+        print(f"⚠️ No se pudo releer una entrada volcada: {e}")
+        with _lock:
+            if _entries.get(key) is entry:
+                _drop(key, _entries.pop(key))
+        return None
+
+    with _lock:
+        if _entries.get(key) is entry:
+            _drop(key, entry)
+            _entries[key] = (value, estimate_size(value))
+            _stats["bytes"] += _entries[key][1]
+            _stats["reloads"] += 1
+            _evict()
+    return value
+
+
+def put(key, value, size: int | None = None):
+    """Guarda un resultado (los resultados se tratan como inmutables)"""
+    size = estimate_size(value) if size is None else size
+    with _lock:
+        previous = _entries.pop(key, None)
+        if previous is not None:
+            _drop(key, previous)
+        _entries[key] = (value, size)
+        _stats["bytes"] += size
+        _evict()
+    return value
+
+
+def get_or_compute(key, compute):
+    """Devuelve el resultado guardado o lo calcula con compute() y lo guarda"""
+    value = get(key)
+    if value is None:
+        value = put(key, compute())
+    return value
+
+
+def contains(key):
+    with _lock:
+        return key in _entries
+
+
+def stats():
+    """Aciertos, fallos, desalojos, entradas y tamaño de la caché"""
+    with _lock:
+        return {**_stats, "entries": len(_entries), "mb": _stats["bytes"] / 1e6,
+                "spill_mb": _stats["spill_bytes"] / 1e6}
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _stats["bytes"] = 0
+        _stats["spill_bytes"] = 0
+    shutil.rmtree(SPILL_DIR, ignore_errors=True)
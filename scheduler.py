@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from collections import deque
+
+from tracing import span
+
+# ============================================
+# PLANIFICADOR DE CONSULTAS
+# ============================================
+# Los cálculos de varias sesiones comparten el mismo pool de hilos de Polars;
+# si todos corren a la vez, todos se vuelven lentos. Antes de calcular, cada
+# consulta pasa por aquí:
+#
+#   - Como mucho MAX_HEAVY_QUERIES consultas pesadas (secciones completas,
+#     precálculo) corren a la vez; las demás esperan en cola.
+#   - Las consultas baratas (KPIs) tienen un cupo reservado y van primero en la
+#     cola, así que no esperan detrás de un render completo.
+#   - Dos consultas idénticas (misma clave) no se calculan dos veces: la segunda
+#     espera el resultado de la primera. Si la primera sigue en cola con menor
+#     prioridad (p. ej. un precálculo) sube a la cola de la que llega, así un
+#     clic no hereda el lugar del precálculo detrás de todas las secciones.
+#
+# Dentro de la misma prioridad el orden es de llegada. scheduler_stats expone la
+# profundidad de la cola y los tiempos de espera.
+
+PRIORITY_KPI = 0
+PRIORITY_SECTIONS = 1
+PRIORITY_PREFETCH = 2
+PRIORITY_NAMES = {PRIORITY_KPI: "kpi", PRIORITY_SECTIONS: "sections", PRIORITY_PREFETCH: "prefetch"}
+
+MAX_HEAVY_QUERIES = int(os.environ.get("MAX_HEAVY_QUERIES", max(1, (os.cpu_count() or 2) // 4)))
+RESERVED_KPI_SLOTS = 1
+WAIT_SAMPLES = 1000
+
+_lock = threading.Condition()
+_queues = {priority: deque() for priority in PRIORITY_NAMES}
+_running = {priority: 0 for priority in PRIORITY_NAMES}
+_in_flight = {}
+_waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_NAMES}
+_stats = {"completed": 0, "merged": 0, "promoted": 0, "failed": 0}
+
+
+class _Call:
+    """Cálculo en curso compartido por todas las consultas con la misma clave"""
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.queued = False
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _heavy_running():
+    return sum(count for priority, count in _running.items() if priority != PRIORITY_KPI)
+
+
+def _can_start(priority: int, ticket):
+    """Indica si la consulta en la cabeza de su cola puede empezar (con _lock tomado)"""
+    if _queues[priority][0] is not ticket:
+        return False
+    if sum(_running.values()) >= MAX_HEAVY_QUERIES + RESERVED_KPI_SLOTS:
+        return False
+    if priority == PRIORITY_KPI:
+        return True
+    # Una consulta pesada cede el paso a cualquiera de mayor prioridad que espere
+    if any(_queues[p] for p in PRIORITY_NAMES if p < priority):
+        return False
+    return _heavy_running() < MAX_HEAVY_QUERIES
+
+
+def _acquire(call: _Call):
+    """Espera un cupo para la prioridad de la consulta (puede subir mientras espera); devuelve los segundos"""
+    start = time.perf_counter()
+    with _lock:
+        _queues[call.priority].append(call)
+        call.queued = True
+        while not _can_start(call.priority, call):
+            _lock.wait()
+        _queues[call.priority].popleft()
+        call.queued = False
+        _running[call.priority] += 1
+        waited = time.perf_counter() - start
+        _waits[call.priority].append(waited)
+        # La cabeza de otra cola puede haber quedado habilitada
+        _lock.notify_all()
+    return waited
+
+
+def _promote(call: _Call, priority: int):
+    """Sube a la prioridad dada una consulta que sigue en cola (con _lock tomado)"""
+    if not call.queued or priority >= call.priority:
+        return
+    _queues[call.priority].remove(call)
+    call.priority = priority
+    _queues[priority].append(call)
+    _stats["promoted"] += 1
+    _lock.notify_all()
+
+
+def _release(priority: int):
+    with _lock:
+        _running[priority] -= 1
+        _lock.notify_all()
+
+
+def run_query(key, compute, priority: int = PRIORITY_SECTIONS):
+    """Calcula compute() con control de admisión; las consultas idénticas en curso comparten el resultado"""
+    with _lock:
+        call = _in_flight.get(key)
+        owner = call is None
+        if owner:
+            call = _in_flight[key] = _Call(priority)
+        else:
+            _stats["merged"] += 1
+            _promote(call, priority)
+
+    if not owner:
+        with span("query.merged", priority=PRIORITY_NAMES[priority]):
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        with span("query.queue", priority=PRIORITY_NAMES[priority]) as node:
+            waited = _acquire(call)
+            if node is not None:
+                node["attrs"]["wait_ms"] = round(waited * 1000, 1)
+        try:
+            call.result = compute()
+        finally:
+            _release(call.priority)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _in_flight.pop(key, None)
+            _stats["failed" if call.error is not None else "completed"] += 1
+        call.done.set()
+
+
+def _percentile(values: list, q: float):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def scheduler_stats():
+    """Profundidad de la cola, consultas en curso y tiempos de espera por prioridad"""
+    with _lock:
+        classes = {}
+        for priority, name in PRIORITY_NAMES.items():
+            waits = list(_waits[priority])
+            classes[name] = {
+                "waiting": len(_queues[priority]),
+                "running": _running[priority],
+                "wait_p50_ms": _percentile(waits, 0.50) * 1000,
+                "wait_p95_ms": _percentile(waits, 0.95) * 1000,
+                "wait_max_ms": max(waits, default=0.0) * 1000,
+            }
+        return {
+            "max_heavy": MAX_HEAVY_QUERIES,
+            "queue_depth": sum(len(queue) for queue in _queues.values()),
+            "running": sum(_running.values()),
+            "in_flight": len(_in_flight),
+            **_stats,
+            "classes": classes,
+        }
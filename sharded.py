@@ -0,0 +1,351 @@
+import argparse
+import io
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import popen_spawn_posix, reduction, resource_tracker, spawn
+from multiprocessing import util as mp_util
+from multiprocessing.context import SpawnContext, SpawnProcess, set_spawning_popen
+
+import orjson
+import polars as pl
+
+from aggregations import SLICE_PARAMS, dataset_totals, merge_totals, partial_sections
+from chart_specs import (base_aggregates, dataset_specs, derive_specs, merge_aggregates, normalize_specs,
+                         sketch_aggregates)
+from data_loader import CACHE_DIR, dataset_version, load_datasets
+from dimensions import dense_measures, merge_dense
+from filters import FILTER_COLUMNS, apply_filters, selected_years
+from ingest_watcher import register_rebuild
+from shared_data import acquire
+from tracing import span, traced
+
+# ============================================
+# AGREGACIÓN POR PORCIONES EN VARIOS PROCESOS
+# ============================================
+# Uso:  python sharded.py --by departamento --shards 8
+#
+# Los datasets ya preparados se parten (por departamento o por año) en archivos
+# Arrow IPC, uno por porción (shard). Cada proceso del pool abre su porción con
+# memory-map, aplica los filtros y calcula las agregaciones base del motor de
+# especificaciones (sumas y conteos por dimensión), los totales escalares y los
+# arreglos por clave de dimensión; el coordinador solo suma esos parciales
+# (chart_specs.merge_aggregates, aggregations.merge_totals,
+# dimensions.merge_dense) y arma las secciones. Los top N y los conteos de
+# distintos viajan como resúmenes combinables de tamaño acotado (sketches.py). Ningún proceso necesita
+# tener el dataset completo en memoria, y la orquestación en Python se reparte
+# entre procesos en lugar de competir por un solo GIL.
+#
+# Los valores de la columna de partición se reparten entre porciones según su
+# número de filas (los departamentos grandes no caen todos en la misma), y un
+# dataset sin esa columna se parte por rangos de filas. Cada porción guarda en
+# el manifiesto los valores de las columnas de filtro que contiene, así que las
+# porciones que no pueden coincidir con los filtros ni se abren.
+#
+# Se activa con SHARD_WORKERS > 0; las porciones de cada versión nueva se
+# escriben como paso de la re-ingesta (ingest_watcher.py).
+
+SHARD_DIR = os.path.join(CACHE_DIR, "shards")
+SHARD_WORKERS = int(os.environ.get("SHARD_WORKERS", "0"))
+SHARD_COUNT = int(os.environ.get("SHARD_COUNT", "0")) or max(SHARD_WORKERS, 1) * 2
+SHARD_BY = os.environ.get("SHARD_BY", "departamento")
+MANIFEST_NAME = "manifest.json"
+
+# Criterio de partición -> columna
+SHARD_COLUMNS = {"departamento": "ESTADO_DEPTO", "año": "Vigencia"}
+
+_pool = None
+_pool_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+def sharding_enabled():
+    return SHARD_WORKERS > 0
+
+
+# ============================================
+# ESCRITURA DE PORCIONES
+# ============================================
+def _shard_dir(version: str, by: str):
+    return os.path.join(SHARD_DIR, version, by)
+
+
+def range_shard(index, rows, shards: int):
+    """Porción de la fila index cuando rows filas se reparten en shards rangos contiguos"""
+    # En UInt64: index * shards pasa de 2^32 con, p. ej., 100M filas y 64 porciones
+    return (index.cast(pl.UInt64) * shards // rows).cast(pl.UInt32)
+
+
+def assign_shards(df: pl.DataFrame, column: str | None, shards: int):
+    """Número de porción de cada fila: por valor de la columna (balanceado por filas) o por rangos"""
+    if column is None or column not in df.columns:
+        return range_shard(pl.int_range(0, pl.len(), dtype=pl.UInt32), pl.len(), shards)
+
+    # Los valores más grandes primero, cada uno a la porción con menos filas
+    counts = df.group_by(column).len().sort("len", descending=True)
+    loads = [0] * shards
+    assignment = {}
+    for value, rows in counts.iter_rows():
+        target = loads.index(min(loads))
+        assignment[value] = target
+        loads[target] += rows
+    return pl.col(column).replace_strict(assignment, default=0, return_dtype=pl.UInt32)
+
+
+def _shard_values(df: pl.DataFrame):
+    """Valores presentes de cada columna de filtro (para descartar porciones sin coincidencias)"""
+    return {col: [str(v) for v in df[col].unique().to_list() if v is not None]
+            for col in FILTER_COLUMNS.values() if col in df.columns}
+
+
+def write_shards(version: str, df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame,
+                 by: str = SHARD_BY, shards: int = SHARD_COUNT):
+    """Escribe las porciones de ambos datasets y su manifiesto (reemplaza las de versiones anteriores)"""
+    column = SHARD_COLUMNS[by]
+    target = _shard_dir(version, by)
+    tmp_dir = target + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {"version": version, "by": by, "created": time.time(), "datasets": {}}
+    for dataset, df in (("subjects", df_subjects), ("arrivals", df_arrivals)):
+        parts = df.with_columns(assign_shards(df, column, shards).alias("__shard")) \
+            .partition_by("__shard", as_dict=True, include_key=False) or {(0,): df.clear()}
+        entries = []
+        for (shard,), part in sorted(parts.items()):
+            name = f"{dataset}-{shard:03d}.arrow"
+            part.write_ipc(os.path.join(tmp_dir, name))
+            entries.append({"file": name, "rows": part.shape[0], "values": _shard_values(part)})
+        manifest["datasets"][dataset] = entries
+
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "wb") as f:
+        f.write(orjson.dumps(manifest))
+
+    with _write_lock:
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp_dir, target)
+        # Solo se conservan las porciones de la versión nueva
+        for old in os.listdir(SHARD_DIR):
+            if old != version:
+                shutil.rmtree(os.path.join(SHARD_DIR, old), ignore_errors=True)
+    return manifest
+
+
+def read_manifest(version: str, by: str = SHARD_BY):
+    """Manifiesto de las porciones de una versión, o None si no se han escrito"""
+    path = os.path.join(_shard_dir(version, by), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def ensure_shards(version: str, by: str = SHARD_BY):
+    """Manifiesto de la versión, escribiendo las porciones desde los datos compartidos si faltan"""
+    manifest = read_manifest(version, by)
+    if manifest is not None:
+        return manifest
+    lease = acquire(version, load_datasets)
+    try:
+        return write_shards(version, *lease.frames()[:2], by=by)
+    finally:
+        lease.release()
+
+
+# ============================================
+# PARCIALES (SE EJECUTA EN EL POOL)
+# ============================================
+def frame_partials(df: pl.DataFrame, dataset: str):
+    """Agregaciones base, totales y arreglos por clave de dimensión de un DataFrame"""
+    bases, plans = normalize_specs({dataset: df}, dataset_specs(dataset))
+    aggregates = sketch_aggregates(base_aggregates({dataset: df}, bases), plans)
+    return aggregates, dataset_totals(df, mergeable=True), dense_measures(df, dataset)
+
+
+def shard_partials(path: str, dataset: str, filters: dict):
+    """Parciales de una porción, abierta con memory-map y filtrada"""
+    return frame_partials(apply_filters(pl.read_ipc(path, memory_map=True), **filters), dataset)
+
+
+# ============================================
+# COORDINADOR
+# ============================================
+class _WorkerPopen(popen_spawn_posix.Popen):
+    """Arranque spawn que no le pide al trabajador re-ejecutar el __main__ del padre"""
+
+    def _launch(self, process_obj):
+        # Igual que popen_spawn_posix.Popen._launch, pero sin las claves init_main_*:
+        # Streamlit ejecuta app.py como __main__ y spawn lo re-ejecutaría en cada
+        # trabajador, que solo necesita este módulo. No se toca sys.modules, que
+        # comparten los hilos de las demás sesiones.
+        tracker_fd = resource_tracker.getfd()
+        self._fds.append(tracker_fd)
+        prep_data = {key: value for key, value in spawn.get_preparation_data(process_obj._name).items()
+                     if not key.startswith("init_main_")}
+        fp = io.BytesIO()
+        set_spawning_popen(self)
+        try:
+            reduction.dump(prep_data, fp)
+            reduction.dump(process_obj, fp)
+        finally:
+            set_spawning_popen(None)
+
+        parent_r = child_w = child_r = parent_w = None
+        try:
+            parent_r, child_w = os.pipe()
+            child_r, parent_w = os.pipe()
+            cmd = spawn.get_command_line(tracker_fd=tracker_fd, pipe_handle=child_r)
+            self._fds.extend([child_r, child_w])
+            self.pid = mp_util.spawnv_passfds(spawn.get_executable(), cmd, self._fds)
+            self.sentinel = parent_r
+            with open(parent_w, "wb", closefd=False) as f:
+                f.write(fp.getbuffer())
+        finally:
+            self.finalizer = mp_util.Finalize(self, mp_util.close_fds,
+                                              [fd for fd in (parent_r, parent_w) if fd is not None])
+            for fd in (child_r, child_w):
+                if fd is not None:
+                    os.close(fd)
+
+
+class _WorkerProcess(SpawnProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        return _WorkerPopen(process_obj)
+
+
+class _WorkerContext(SpawnContext):
+    Process = _WorkerProcess
+
+
+def _get_pool():
+    """Pool de procesos compartido (spawn sin el __main__ del padre); se crea en el primer uso"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = SHARD_WORKERS or os.cpu_count() or 1
+            # Cada trabajador usa su parte de los núcleos para que Polars no los sobresuscriba
+            os.environ.setdefault("POLARS_MAX_THREADS", str(max(1, (os.cpu_count() or 1) // workers)))
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_WorkerContext())
+        return _pool
+
+
+def _matches(entry: dict, filters: dict):
+    """Indica si la porción puede tener filas que cumplan los filtros"""
+    for param, values in filters.items():
+        present = entry["values"].get(FILTER_COLUMNS[param])
+        if present is not None and not set(present) & set(values):
+            return False
+    return True
+
+
+def _schema_frame(version: str, manifest: dict, dataset: str):
+    """DataFrame vacío con el esquema del dataset (para planear sin abrir los datos)"""
+    entry = manifest["datasets"][dataset][0]
+    return pl.DataFrame(schema=pl.read_ipc_schema(os.path.join(_shard_dir(version, manifest["by"]), entry["file"])))
+
+
+def shard_paths(version: str, manifest: dict, dataset: str, filters: dict):
+    """Rutas de las porciones del dataset que pueden tener filas que cumplan los filtros"""
+    entries = manifest["datasets"][dataset]
+    matching = [entry for entry in entries if _matches(entry, filters)] or entries[:1]
+    folder = _shard_dir(version, manifest["by"])
+    return [os.path.join(folder, entry["file"]) for entry in matching]
+
+
+def submit_dataset(version: str, manifest: dict, dataset: str, filters: dict):
+    """Encola los parciales de las porciones que pueden coincidir con los filtros"""
+    pool = _get_pool()
+    return [pool.submit(shard_partials, path, dataset, filters)
+            for path in shard_paths(version, manifest, dataset, filters)]
+
+
+def merge_dataset(version: str, manifest: dict, dataset: str, futures: list):
+    """Combina los parciales de un dataset: (resultados de las especificaciones, totales, arreglos)"""
+    with span(f"merge.{dataset}", shards=len(futures)):
+        parts = [future.result() for future in futures]
+        _, plans = normalize_specs({dataset: _schema_frame(version, manifest, dataset)}, dataset_specs(dataset))
+        charts = derive_specs(merge_aggregates([aggregates for aggregates, _, _ in parts]), plans)
+        return charts, merge_totals([totals for _, totals, _ in parts]), merge_dense([dense for _, _, dense in parts])
+
+
+@traced()
+def sharded_sections(version: str, key: tuple, by: str = SHARD_BY):
+    """Agregados de todas las secciones para una clave de filtros, calculados por porciones"""
+    manifest = ensure_shards(version, by)
+    filters = {param: list(values) for param, values in key}
+    futures = {dataset: submit_dataset(version, manifest, dataset, filters) for dataset in ("subjects", "arrivals")}
+    return partial_sections(*(merge_dataset(version, manifest, dataset, futures[dataset])
+                              for dataset in ("subjects", "arrivals")), selected_years(filters))
+
+
+# ============================================
+# LOTES (REPORTES, SNAPSHOTS)
+# ============================================
+def shard_slices(manifest: dict, by: str):
+    """Lista de porciones (etiqueta, filtros) como aggregations.build_slices, leída del manifiesto"""
+    param = SLICE_PARAMS[by]
+    if param is None:
+        return [("Nacional", {})]
+
+    col = FILTER_COLUMNS[param]
+    values = set()
+    for entries in manifest["datasets"].values():
+        for entry in entries:
+            values.update(entry["values"].get(col, []))
+    return [(value, {param: [value]}) for value in sorted(values)]
+
+
+def iter_sharded_sections(version: str, by: str):
+    """Genera (etiqueta, filtros, secciones) por porción sin cargar los datasets en este proceso"""
+    manifest = ensure_shards(version)
+    slices = shard_slices(manifest, by)
+
+    # Todo se encola de una vez; cada dataset se calcula una sola vez por filtros efectivos
+    columns = {dataset: _schema_frame(version, manifest, dataset).columns for dataset in ("subjects", "arrivals")}
+    pending = {}
+    keys = []
+    for label, filters in slices:
+        slice_keys = {}
+        for dataset in ("subjects", "arrivals"):
+            effective = {param: values for param, values in filters.items() if FILTER_COLUMNS[param] in columns[dataset]}
+            key = (dataset, tuple((param, tuple(values)) for param, values in effective.items()))
+            if key not in pending:
+                pending[key] = submit_dataset(version, manifest, dataset, effective)
+            slice_keys[dataset] = key
+        keys.append((label, filters, slice_keys))
+
+    merged = {}
+    for label, filters, slice_keys in keys:
+        for dataset, key in slice_keys.items():
+            if key not in merged:
+                merged[key] = merge_dataset(version, manifest, dataset, pending.pop(key))
+        yield label, filters, partial_sections(merged[slice_keys["subjects"]], merged[slice_keys["arrivals"]],
+                                               selected_years(filters))
+
+
+# Las porciones de cada versión nueva se escriben antes de publicarla
+if sharding_enabled():
+    register_rebuild("shards", write_shards)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parte los datasets en porciones para la agregación por procesos")
+    parser.add_argument("--by", choices=list(SHARD_COLUMNS), default=SHARD_BY, help="Columna de partición")
+    parser.add_argument("--shards", type=int, default=SHARD_COUNT, help="Número de porciones")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    version = dataset_version()
+    df_subjects, df_arrivals = load_datasets()[:2]
+    manifest = write_shards(version, df_subjects, df_arrivals, args.by, args.shards)
+    for dataset, entries in manifest["datasets"].items():
+        rows = [entry["rows"] for entry in entries]
+        print(f"✅ {dataset}: {len(entries)} porciones, {min(rows):,}–{max(rows):,} filas")
+    print(f"✅ Porciones de {version} escritas en {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
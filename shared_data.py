@@ -0,0 +1,164 @@
+import os
+import platform
+import threading
+import time
+import weakref
+
+# ============================================
+# DATASETS COMPARTIDOS POR PROCESO
+# ============================================
+# Los DataFrames cargados se guardan una sola vez por proceso y versión de los
+# datos. Cada sesión recibe una copia superficial (DataFrame.clone), que
+# comparte los buffers de Arrow con el original: la sesión no paga memoria por
+# el dataset, solo por lo que derive de él (filtros, agregados). Los buffers de
+# Arrow son inmutables, así que una sesión no puede alterar los de otra.
+#
+# Cada sesión toma un "lease" sobre la versión que usa. Al terminar la sesión
+# (o al cambiar de versión) el lease se libera; una versión antigua sin leases
+# se descarta, la más reciente se conserva para las sesiones nuevas.
+#
+# Una versión nueva puede cargarse en segundo plano (preload) y publicarse
+# después (publish) de forma atómica: hasta entonces las sesiones siguen con la
+# anterior, y cada rerun trabaja de principio a fin con una sola versión.
+
+_lock = threading.Lock()
+_load_locks = {}
+_datasets = {}
+_latest = None
+
+
+def current_rss():
+    """Memoria residente del proceso en bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # ru_maxrss es un máximo histórico (KB en Linux, bytes en macOS)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if platform.system() == "Darwin" else rss * 1024
+
+
+def _set_current(version: str):
+    """Marca la versión como la actual; la anterior se descarta si nadie la usa (con _lock tomado)"""
+    global _latest
+    previous, _latest = _latest, version
+    if previous is not None and previous != version and _datasets.get(previous, {}).get("refs") == 0:
+        del _datasets[previous]
+
+
+def _load(version: str, loader, make_current: bool = True):
+    """Carga la versión una sola vez aunque varias sesiones la pidan a la vez"""
+    with _lock:
+        if version in _datasets:
+            if make_current and _latest is None:
+                _set_current(version)
+            return _datasets[version]
+        load_lock = _load_locks.setdefault(version, threading.Lock())
+
+    with load_lock:
+        with _lock:
+            if version in _datasets:
+                if make_current and _latest is None:
+                    _set_current(version)
+                return _datasets[version]
+
+        start = time.perf_counter()
+        frames = tuple(df.rechunk() for df in loader())
+        entry = {
+            "frames": frames,
+            "refs": 0,
+            "loaded_at": time.time(),
+            "load_seconds": time.perf_counter() - start,
+            "size_bytes": sum(df.estimated_size() for df in frames),
+        }
+
+        with _lock:
+            _datasets[version] = entry
+            _load_locks.pop(version, None)
+            if make_current:
+                _set_current(version)
+        return entry
+
+
+def _release(version: str):
+    with _lock:
+        entry = _datasets.get(version)
+        if entry is None:
+            return
+        entry["refs"] -= 1
+        if entry["refs"] <= 0 and version != _latest:
+            del _datasets[version]
+
+
+class DatasetLease:
+    """Referencia de una sesión a una versión compartida de los datasets"""
+
+    def __init__(self, version: str, entry: dict):
+        self.version = version
+        self._entry = entry
+        self._finalizer = weakref.finalize(self, _release, version)
+
+    def frames(self):
+        """Copias superficiales (comparten buffers) de los DataFrames de la versión"""
+        return tuple(df.clone() for df in self._entry["frames"])
+
+    def release(self):
+        self._finalizer()
+
+
+def acquire(version: str, loader):
+    """Lease sobre la versión indicada; la carga con loader() si aún no está en memoria"""
+    while True:
+        entry = _load(version, loader)
+        with _lock:
+            # Entre la carga y el lease otra versión pudo haberla descartado
+            if _datasets.get(version) is entry:
+                entry["refs"] += 1
+                return DatasetLease(version, entry)
+
+
+def preload(version: str, loader):
+    """Carga una versión sin publicarla todavía; devuelve sus DataFrames"""
+    return _load(version, loader, make_current=False)["frames"]
+
+
+def publish(version: str):
+    """Publica una versión ya cargada: las sesiones la toman en su siguiente rerun"""
+    with _lock:
+        if version not in _datasets:
+            raise Exception(f"La versión {version} no está cargada")
+        _set_current(version)
+
+
+def current_version():
+    """Versión publicada más reciente, o None si aún no se ha cargado ninguna"""
+    with _lock:
+        return _latest
+
+
+def memory_stats():
+    """Versiones en memoria con sus sesiones, filas y tamaño"""
+    with _lock:
+        datasets = [
+            {
+                "version": version,
+                "current": version == _latest,
+                "sessions": entry["refs"],
+                "rows": sum(df.height for df in entry["frames"]),
+                "size_mb": entry["size_bytes"] / 1e6,
+                "loaded_at": entry["loaded_at"],
+                "load_seconds": entry["load_seconds"],
+            }
+            for version, entry in _datasets.items()
+        ]
+    return {
+        "datasets": datasets,
+        "shared_mb": sum(d["size_mb"] for d in datasets),
+        "rss_mb": current_rss() / 1e6,
+    }
+
+
+def frames_size_mb(*frames):
+    """Tamaño estimado de DataFrames propios de la sesión (p. ej. los filtrados)"""
+    return sum(df.estimated_size() for df in frames if df is not None) / 1e6
@@ -0,0 +1,148 @@
+import math
+import os
+
+import numpy as np
+import polars as pl
+
+# ============================================
+# RESÚMENES COMBINABLES (SKETCHES)
+# ============================================
+# Cuando los datos llegan por lotes o por porciones (sharded.py), un top N o un
+# conteo de distintos exactos obligan a juntar el agregado completo de cada
+# parte antes de ordenar. Estos resúmenes tienen tamaño acotado y se combinan
+# entre sí, así que cada lote o porción entrega el suyo y la respuesta sale de
+# combinarlos:
+#
+#   HeavyHitters    los SKETCH_CAPACITY elementos más pesados de una dimensión
+#                   con las sumas de sus medidas. Al pasar de la capacidad se
+#                   descartan los más livianos y el peso descartado se acumula
+#                   en `error`: la suma real de un elemento está entre su suma
+#                   registrada y esa más `error` (0 = exacto).
+#   DistinctSketch  conteo de valores distintos. Guarda los hashes exactos
+#                   hasta SPARSE_LIMIT valores y después pasa a HyperLogLog con
+#                   2^HLL_PRECISION registros (error relativo ~1.6%).
+#
+# Con las cardinalidades de estos datasets (decenas de departamentos o hechos)
+# ambos resúmenes son exactos; la cota solo entra en juego con dimensiones de
+# muchos valores. Cuando no es 0, el top N que sale del resumen lleva la cota
+# en la columna ERROR_COLUMN y el dashboard la muestra junto a la gráfica.
+#
+# Los resúmenes solo se arman en las porciones (sharded.py), donde cada
+# proceso recorre sus filas de todos modos; sobre el DataFrame completo los
+# agregados exactos (group_by, n_unique) son más baratos que armar el resumen.
+
+SKETCH_CAPACITY = int(os.environ.get("SKETCH_CAPACITY", 64))
+ERROR_COLUMN = "Cota de error"
+
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+SPARSE_LIMIT = HLL_REGISTERS // 4
+HASH_SEED = 20240601
+
+
+class HeavyHitters:
+    """Top de una dimensión por la primera medida, con las sumas de todas sus medidas"""
+
+    def __init__(self, dim: str, measures: list, capacity: int = SKETCH_CAPACITY):
+        self.dim = dim
+        self.measures = list(measures)
+        self.capacity = capacity
+        self.counts = None
+        self.error = 0
+
+    def _truncate(self, counts: pl.DataFrame):
+        counts = counts.sort([self.measures[0], self.dim], descending=[True, False])
+        if counts.height > self.capacity:
+            # El más pesado de los descartados acota lo que pudo perderse de cualquier elemento
+            self.error += counts[self.measures[0]][self.capacity] or 0
+            counts = counts.head(self.capacity)
+        return counts
+
+    def update(self, batch: pl.DataFrame):
+        """Incorpora un lote con la dimensión y las medidas (filas o ya agrupado)"""
+        frames = [batch.select([self.dim, *self.measures])]
+        if self.counts is not None:
+            frames.insert(0, self.counts)
+        counts = pl.concat(frames, how="vertical_relaxed").group_by(self.dim).agg(pl.col(self.measures).sum())
+        self.counts = self._truncate(counts)
+        return self
+
+    def merge(self, other: "HeavyHitters"):
+        """Combina dos resúmenes de partes disjuntas de los datos"""
+        merged = HeavyHitters(self.dim, self.measures, max(self.capacity, other.capacity))
+        merged.error = self.error + other.error
+        for part in (self, other):
+            if part.counts is not None:
+                merged.update(part.counts)
+        return merged
+
+    def frame(self):
+        """Elementos registrados con sus sumas, del más pesado al más liviano"""
+        if self.counts is None:
+            return pl.DataFrame(schema={self.dim: pl.Utf8, **{m: pl.Int64 for m in self.measures}})
+        return self.counts
+
+
+def _hashes(values: pl.Series):
+    return values.cast(pl.Utf8).unique().hash(seed=HASH_SEED)
+
+
+class DistinctSketch:
+    """Conteo de valores distintos: exacto con pocos valores, HyperLogLog con muchos"""
+
+    def __init__(self):
+        self.hashes = set()
+        self.registers = None
+
+    def _densify(self):
+        self.registers = np.zeros(HLL_REGISTERS, dtype=np.uint8)
+        if self.hashes:
+            self._add_registers(pl.Series(list(self.hashes), dtype=pl.UInt64))
+        self.hashes = set()
+
+    def _add_registers(self, hashes: pl.Series):
+        # Los primeros HLL_PRECISION bits eligen el registro; el resto aporta los ceros iniciales
+        low_bits = 64 - HLL_PRECISION
+        ranks = pl.DataFrame({"index": hashes // (1 << low_bits), "rest": hashes & ((1 << low_bits) - 1)}) \
+            .group_by("index").agg((pl.col("rest").bitwise_leading_zeros().max() - HLL_PRECISION + 1).alias("rank"))
+        index = ranks["index"].to_numpy().astype(np.int64)
+        self.registers[index] = np.maximum(self.registers[index], ranks["rank"].to_numpy().astype(np.uint8))
+
+    def update(self, values: pl.Series):
+        """Incorpora un lote de valores (los nulos cuentan como un valor, igual que n_unique)"""
+        hashes = _hashes(values)
+        if self.registers is None and len(self.hashes) + hashes.len() <= SPARSE_LIMIT:
+            self.hashes.update(hashes.to_list())
+            return self
+        if self.registers is None:
+            self._densify()
+        self._add_registers(hashes)
+        return self
+
+    def merge(self, other: "DistinctSketch"):
+        """Combina dos resúmenes de partes de los datos (pueden solaparse)"""
+        merged = DistinctSketch()
+        if self.registers is None and other.registers is None and \
+                len(self.hashes | other.hashes) <= SPARSE_LIMIT:
+            merged.hashes = self.hashes | other.hashes
+            return merged
+        merged.registers = np.zeros(HLL_REGISTERS, dtype=np.uint8)
+        for part in (self, other):
+            if part.registers is not None:
+                np.maximum(merged.registers, part.registers, out=merged.registers)
+            elif part.hashes:
+                merged._add_registers(pl.Series(list(part.hashes), dtype=pl.UInt64))
+        return merged
+
+    def estimate(self):
+        """Número de valores distintos (exacto en modo disperso)"""
+        if self.registers is None:
+            return len(self.hashes)
+        m = HLL_REGISTERS
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.power(2.0, -self.registers.astype(np.float64)).sum()
+        zeros = int((self.registers == 0).sum())
+        # Con pocos valores para el número de registros, el conteo lineal es más preciso
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
@@ -0,0 +1,157 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import orjson
+import polars as pl
+
+from aggregations import build_slices, iter_slice_sections
+from data_loader import dataset_version, load_datasets
+from figures import build_figures
+from filters import filter_key
+from sharded import iter_sharded_sections
+from startup import lazy_import
+
+go = lazy_import("plotly.graph_objects")
+pio = lazy_import("plotly.io")
+
+# ============================================
+# SNAPSHOTS PRE-RENDERIZADOS
+# ============================================
+# Uso:  python snapshots.py --output snapshots/ --workers 8
+#
+# Precalcula los agregados y el JSON de las figuras para las combinaciones de
+# filtros más usadas (vista por defecto, un solo departamento, un solo año). El
+# dashboard sirve el snapshot cuando la selección coincide y la versión de los
+# datos no ha cambiado; cualquier otra combinación se calcula en vivo.
+
+SNAPSHOT_DIR = "snapshots"
+MANIFEST_NAME = "manifest.json"
+SNAPSHOT_SLICES = ["nacional", "departamento", "año"]
+
+
+def snapshot_id(filters: dict):
+    """Nombre estable del archivo de snapshot para un estado de filtros"""
+    key = json.dumps(filter_key(filters), ensure_ascii=False)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+# ============================================
+# SERIALIZACIÓN
+# ============================================
+def _encode(obj):
+    if isinstance(obj, pl.DataFrame):
+        return {"__frame__": obj.to_dict(as_series=False)}
+    if isinstance(obj, dict):
+        return {k: _encode(v) for k, v in obj.items()}
+    return obj
+
+
+def _decode(obj):
+    if isinstance(obj, dict):
+        if "__frame__" in obj:
+            return pl.DataFrame(obj["__frame__"])
+        return {k: _decode(v) for k, v in obj.items()}
+    return obj
+
+
+def write_snapshot(label: str, filters: dict, sections: dict, output_dir: str):
+    """Construye las figuras de una porción y escribe su snapshot (se ejecuta en el pool)"""
+    figures = build_figures(sections)
+    payload = {
+        "label": label,
+        "filters": filters,
+        "sections": _encode(sections),
+        "figures": {name: orjson.loads(pio.to_json(fig, validate=False)) for name, fig in figures.items()},
+    }
+    name = snapshot_id(filters)
+    with open(os.path.join(output_dir, f"{name}.json"), "wb") as f:
+        f.write(orjson.dumps(payload))
+    return name, label
+
+
+# ============================================
+# CONSTRUCCIÓN
+# ============================================
+def build_snapshots(df_subjects: pl.DataFrame | None, df_arrivals: pl.DataFrame | None,
+                    output_dir: str = SNAPSHOT_DIR, workers: int | None = None, version: str | None = None,
+                    sharded: bool = False):
+    """Escribe los snapshots de las combinaciones comunes y su manifiesto"""
+    os.makedirs(output_dir, exist_ok=True)
+    entries = {}
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = []
+        for by in SNAPSHOT_SLICES:
+            if sharded:
+                slice_sections = iter_sharded_sections(version, by)
+            else:
+                slice_sections = iter_slice_sections(df_subjects, df_arrivals,
+                                                     build_slices(df_subjects, df_arrivals, by), by)
+            for label, filters, sections in slice_sections:
+                futures.append(pool.submit(write_snapshot, label, filters, sections, output_dir))
+
+        for future in as_completed(futures):
+            name, label = future.result()
+            entries[name] = label
+
+    manifest = {"version": version, "created": time.time(), "entries": entries}
+    with open(os.path.join(output_dir, MANIFEST_NAME), "wb") as f:
+        f.write(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+    return manifest
+
+
+# ============================================
+# LECTURA (DASHBOARD)
+# ============================================
+def read_manifest(output_dir: str = SNAPSHOT_DIR):
+    """Manifiesto de snapshots, o None si no se han generado"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def load_snapshot(filters: dict, version: str, output_dir: str = SNAPSHOT_DIR):
+    """Devuelve (secciones, figuras en JSON) si hay un snapshot vigente para los filtros"""
+    manifest = read_manifest(output_dir)
+    if manifest is None or manifest["version"] != version:
+        return None
+
+    name = snapshot_id(filters)
+    if name not in manifest["entries"]:
+        return None
+
+    with open(os.path.join(output_dir, f"{name}.json"), "rb") as f:
+        payload = orjson.loads(f.read())
+    return _decode(payload["sections"]), payload["figures"]
+
+
+def snapshot_figures(figure_json: dict):
+    """Reconstruye las figuras de Plotly a partir del JSON guardado"""
+    return {name: go.Figure(fig, skip_invalid=True) for name, fig in figure_json.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera snapshots de las combinaciones de filtros más usadas")
+    parser.add_argument("--output", default=SNAPSHOT_DIR, help="Carpeta de salida")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (por defecto, todos los núcleos)")
+    parser.add_argument("--sharded", action="store_true", help="Calcular los agregados por porciones en varios procesos")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.sharded:
+        manifest = build_snapshots(None, None, args.output, args.workers, dataset_version(), sharded=True)
+    else:
+        df_subjects, df_arrivals = load_datasets()[:2]
+        manifest = build_snapshots(df_subjects, df_arrivals, args.output, args.workers, dataset_version())
+    print(f"✅ {len(manifest['entries'])} snapshots generados en {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
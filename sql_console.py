@@ -0,0 +1,227 @@
+import os
+import re
+import time
+
+import polars as pl
+
+import result_cache
+from data_loader import load_datasets
+from filters import filter_expression
+from memory_budget import admit_heavy_query
+from registry import DATASETS, dataset_frames
+from scheduler import PRIORITY_SECTIONS, run_query
+from shared_data import acquire
+from sharded import ensure_shards, shard_paths, sharding_enabled
+from tracing import traced
+
+# ============================================
+# CONSOLA SQL SOBRE LOS DATASETS REGISTRADOS
+# ============================================
+# Consultas SQL ad hoc (solo SELECT / WITH) con pl.SQLContext. Cada dataset del
+# registro es una tabla con su nombre (subjects, arrivals, ...) y se consulta en
+# modo lazy, así que Polars empuja filtros y proyecciones hasta los datos:
+#
+#   - Las tablas traen las columnas key_* (Enum con el diccionario compartido de
+#     dimensions.py): agrupar o filtrar por ellas es más barato que por texto.
+#   - Con porciones (sharded.py) las tablas de víctimas y llegadas se leen con
+#     memory-map solo de las porciones que pueden cumplir los filtros activos.
+#   - El resultado se corta en SQL_ROW_LIMIT filas y la consulta se cancela si
+#     pasa de SQL_TIMEOUT segundos.
+#
+# Polars también resuelve como tabla una ruta entre comillas (FROM '/ruta') y
+# funciones de tabla (read_csv, read_parquet, ...) con el nombre en cualquier
+# forma de comillas, y lee el archivo ya al armar el plan. Por eso la consulta
+# se separa en tokens (literales, identificadores entre comillas, comentarios
+# anidados) y se rechaza cualquier llamada en posición de tabla, cualquier
+# literal como tabla y cualquier read_* en el texto; después, el plan armado
+# solo puede leer las tablas registradas.
+#
+# Los resultados quedan en la caché compartida por versión de los datos, texto
+# normalizado de la consulta (sin comentarios ni espacios de más) y filtros.
+
+SQL_ROW_LIMIT = int(os.environ.get("SQL_ROW_LIMIT", 10000))
+SQL_TIMEOUT = float(os.environ.get("SQL_TIMEOUT", 10))
+POLL_INTERVAL = 0.02
+
+# Tokens del texto SQL; los comentarios /* */ se cierran aparte porque se anidan
+_TOKENS = re.compile(r"""
+    (?P<string>'(?:[^']|'')*'|\$(?P<tag>\w*)\$.*?\$(?P=tag)\$)
+  | (?P<quoted>"(?:[^"]|"")*"|`(?:[^`]|``)*`)
+  | (?P<comment>--[^\n]*)
+  | (?P<open_comment>/\*)
+  | (?P<space>\s+)
+  | (?P<word>\w+)
+  | (?P<symbol>.)
+""", re.VERBOSE | re.DOTALL)
+# Funciones de tabla de Polars que leen archivos; se rechazan en cualquier parte del texto
+_FILE_FUNCTIONS = re.compile(r"\bread_(csv|parquet|ipc|json|ndjson|delta|excel|avro)\b", re.IGNORECASE)
+# Palabras tras las que viene una tabla
+_RELATION_KEYWORDS = {"from", "join"}
+# Lecturas del plan (Csv SCAN [...], Ipc SCAN [...]); las tablas en memoria son DF [...]
+_SCAN = re.compile(r"\w+ SCAN \[[^\n]*\]")
+
+
+class SQLError(Exception):
+    """Consulta inválida, rechazada o que superó el tiempo límite"""
+
+
+def tokenize(query: str):
+    """Lista de (tipo, texto) de la consulta: string, quoted, comment, space, word o symbol"""
+    tokens, pos = [], 0
+    while pos < len(query):
+        match = _TOKENS.match(query, pos)
+        kind, text = match.lastgroup, match.group()
+        if kind == "open_comment":
+            depth, end = 0, pos
+            for marker in re.finditer(r"/\*|\*/", query[pos:]):
+                depth += 1 if marker.group() == "/*" else -1
+                if depth == 0:
+                    end = pos + marker.end()
+                    break
+            if depth:
+                raise SQLError("Comentario sin cerrar")
+            kind, text = "comment", query[pos:end]
+        elif kind == "symbol" and text in "'\"`$":
+            raise SQLError("Literal o identificador sin cerrar")
+        tokens.append((kind, text))
+        pos += len(text)
+    return tokens
+
+
+def _name(token: tuple):
+    """Nombre de un identificador (con o sin comillas) en minúsculas; None si no es un nombre"""
+    kind, text = token
+    if kind == "word":
+        return text.casefold()
+    if kind == "quoted":
+        return text[1:-1].replace(text[0] * 2, text[0]).casefold()
+    return None
+
+
+def normalize_query(query: str):
+    """Texto canónico de la consulta: sin comentarios, espacios colapsados y sin ';' final"""
+    parts = []
+    for kind, text in tokenize(query):
+        if kind in ("space", "comment"):
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        else:
+            parts.append(text)
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def validate_query(query: str):
+    """Lanza SQLError si la consulta no es un único SELECT / WITH que solo lee las tablas registradas"""
+    tokens = [token for token in tokenize(query) if token[0] not in ("space", "comment")]
+    if not tokens:
+        raise SQLError("La consulta está vacía")
+    if tokens[0][0] != "word" or _name(tokens[0]) not in ("select", "with"):
+        raise SQLError("Solo se permiten consultas SELECT o WITH")
+    if ("symbol", ";") in tokens:
+        raise SQLError("Solo se permite una consulta a la vez")
+    # También dentro de literales: el texto podría leerse distinto de como se separó aquí
+    if _FILE_FUNCTIONS.search(query):
+        raise SQLError("No se permite leer archivos desde la consulta")
+
+    for i, token in enumerate(tokens):
+        if token[0] != "word" or _name(token) not in _RELATION_KEYWORDS:
+            continue
+        j = i + 1
+        while j < len(tokens) and tokens[j] == ("symbol", "("):
+            j += 1
+        if j < len(tokens) and tokens[j][0] == "string":
+            raise SQLError("No se permite leer archivos desde la consulta")
+        if j + 1 < len(tokens) and _name(tokens[j]) is not None and tokens[j + 1] == ("symbol", "("):
+            raise SQLError("Solo se pueden consultar las tablas registradas, no funciones de tabla")
+
+
+def check_sources(lf: pl.LazyFrame, tables: dict):
+    """Lanza SQLError si el plan lee algo distinto de las tablas registradas"""
+    allowed = {scan for table in tables.values() for scan in _SCAN.findall(table.explain(optimized=False))}
+    if not set(_SCAN.findall(lf.explain(optimized=False))) <= allowed:
+        raise SQLError("Solo se pueden consultar las tablas registradas")
+
+
+def dataset_tables(version: str, filters: dict):
+    """{tabla: LazyFrame} de los datasets registrados con los filtros aplicados y el lease a liberar"""
+    tables, lease = {}, None
+    if sharding_enabled():
+        manifest = ensure_shards(version)
+        for dataset in manifest["datasets"]:
+            tables[dataset] = pl.scan_ipc(shard_paths(version, manifest, dataset, filters), memory_map=True)
+    if set(DATASETS) - set(tables):
+        lease = acquire(version, load_datasets)
+        for name, df in dataset_frames(lease.frames()).items():
+            tables.setdefault(name, df.lazy())
+
+    for name, lf in tables.items():
+        predicate = filter_expression(lf.collect_schema(), filters)
+        if predicate is not None:
+            tables[name] = lf.filter(predicate)
+    return tables, lease
+
+
+def table_columns(version: str):
+    """{tabla: {columna: tipo}} para mostrar el esquema en la consola"""
+    tables, lease = dataset_tables(version, {})
+    try:
+        return {name: {col: str(dtype) for col, dtype in lf.collect_schema().items()} for name, lf in tables.items()}
+    finally:
+        if lease is not None:
+            lease.release()
+
+
+def _collect(lf: pl.LazyFrame, timeout: float):
+    """Ejecuta la consulta en segundo plano y la cancela si pasa del tiempo límite"""
+    handle = lf.collect(background=True)
+    deadline = time.perf_counter() + timeout
+    while True:
+        result = handle.fetch()
+        if result is not None:
+            return result
+        if time.perf_counter() >= deadline:
+            handle.cancel()
+            raise SQLError(f"La consulta superó el tiempo límite de {timeout:g} s")
+        time.sleep(POLL_INTERVAL)
+
+
+@traced()
+def execute_sql(version: str, query: str, filters: dict, row_limit: int = SQL_ROW_LIMIT,
+                timeout: float = SQL_TIMEOUT):
+    """Ejecuta la consulta (ya normalizada y validada) sobre las tablas filtradas"""
+    tables, lease = dataset_tables(version, filters)
+    try:
+        start = time.perf_counter()
+        try:
+            lf = pl.SQLContext(tables).execute(query, eager=False)
+            check_sources(lf, tables)
+            df = _collect(lf.limit(row_limit + 1), timeout)
+        except SQLError:
+            raise
+        except Exception as e:
+            raise SQLError(str(e).strip().splitlines()[0])
+        return {
+            "data": df.head(row_limit),
+            "truncated": df.shape[0] > row_limit,
+            "elapsed": time.perf_counter() - start,
+        }
+    finally:
+        if lease is not None:
+            lease.release()
+
+
+def run_sql(version: str, query: str, key: tuple = ()):
+    """Resultado de la consulta para la versión y la clave de filtros, desde la caché o calculado"""
+    query = normalize_query(query)
+    validate_query(query)
+    cache_key = ("sql", version, query, key)
+    result = result_cache.get(cache_key)
+    if result is not None:
+        return {**result, "cached": True}
+
+    def compute():
+        admit_heavy_query()
+        return execute_sql(version, query, {param: list(values) for param, values in key})
+
+    result = run_query(cache_key, lambda: result_cache.put(cache_key, compute()), PRIORITY_SECTIONS)
+    return {**result, "cached": False}
@@ -0,0 +1,128 @@
+import argparse
+import importlib
+import subprocess
+import sys
+import threading
+import time
+
+# ============================================
+# ARRANQUE EN FRÍO
+# ============================================
+# Los módulos pesados (Polars, Plotly, pandas, pyarrow) no se importan antes de
+# dibujar el sidebar: se declaran con lazy_import y se importan al primer uso, o
+# antes en un hilo de calentamiento que arranca junto con la app mientras se
+# dibujan el encabezado y el sidebar. Lo que app.py usa antes del sidebar
+# (data_versions, registry, shared_data, tracing) no importa Polars; los módulos
+# de cálculo se importan después. Antes de dibujar las secciones la app espera a
+# que el hilo termine (wait_for_warm_up). Cada importación queda medida en
+# import_times().
+#
+# Para medir el costo en frío de cada módulo en un proceso nuevo:
+#
+#   python startup.py
+
+PROCESS_START = time.perf_counter()
+WARMUP_MODULES = ["polars", "numpy", "plotly.graph_objects", "plotly.express", "plotly.io", "pyarrow", "pandas"]
+APP_MODULES = ["polars", "streamlit", "plotly.express", "plotly.graph_objects", "pandas", "pyarrow",
+               "aggregations", "figures", "visualizations", "snapshots", "shared_data", "data_loader",
+               "data_versions", "tracing"]
+
+_import_times = {}
+_import_lock = threading.Lock()
+_warmup_thread = None
+
+
+def timed_import(name: str):
+    """Importa un módulo y registra cuánto tardó la primera vez"""
+    # import_module espera si otro hilo está inicializando el módulo; leer
+    # sys.modules directamente podría devolver un módulo a medio importar
+    loaded = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if loaded:
+        return module
+    with _import_lock:
+        _import_times.setdefault(name, {
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+            "thread": threading.current_thread().name,
+        })
+    return module
+
+
+class LazyModule:
+    """Módulo que se importa al acceder al primer atributo"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = timed_import(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_import(name: str):
+    return LazyModule(name)
+
+
+def warm_up(modules=WARMUP_MODULES):
+    """Importa los módulos pesados en un hilo de fondo (una sola vez por proceso)"""
+    global _warmup_thread
+    with _import_lock:
+        if _warmup_thread is not None:
+            return _warmup_thread
+
+        def run():
+            for name in modules:
+                try:
+                    timed_import(name)
+                except ImportError as e:
+                    print(f"⚠️ No se pudo precargar {name}: {e}")
+
+        _warmup_thread = threading.Thread(target=run, name="warmup", daemon=True)
+    _warmup_thread.start()
+    return _warmup_thread
+
+
+def wait_for_warm_up(timeout: float | None = None):
+    """Espera a que termine el calentamiento (Polars y Streamlit leen pandas de sys.modules)"""
+    if _warmup_thread is not None:
+        _warmup_thread.join(timeout)
+
+
+def import_times():
+    """Tiempos de importación registrados en este proceso"""
+    with _import_lock:
+        return dict(_import_times)
+
+
+def since_start_ms():
+    """Milisegundos desde que se importó este módulo (arranque del proceso)"""
+    return round((time.perf_counter() - PROCESS_START) * 1000, 1)
+
+
+def cold_import_ms(name: str):
+    """Tiempo de importar un módulo en un intérprete nuevo (incluye sus dependencias)"""
+    code = f"import time; t = time.perf_counter(); import {name}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return round(float(result.stdout.strip().splitlines()[-1]) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el tiempo de importación en frío de cada módulo")
+    parser.add_argument("modules", nargs="*", default=APP_MODULES, help="Módulos a medir")
+    parser.add_argument("--repeat", type=int, default=3, help="Mediciones por módulo (se toma la menor)")
+    args = parser.parse_args()
+
+    for name in args.modules:
+        times = [cold_import_ms(name) for _ in range(args.repeat)]
+        times = [t for t in times if t is not None]
+        print(f"{name:<24} {min(times):>8,.1f} ms" if times else f"{name:<24} no se pudo importar")
+    print(f"✅ {len(args.modules)} módulos medidos")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import streamlit as st
 import polars as pl
 import plotly.express as px
 
+from chart_specs import HECHO, PPO, compute_specs
+
 
 def show_summary_arrivals(df: pl.DataFrame):
     if "ESTADO_DEPTO" in df.columns:
@@ -32,47 +34,32 @@ def show_summary_subjects(df: pl.DataFrame):
         st.plotly_chart(fig)
 
 
-def show_graphics_section(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
-    st.header("📊 Sección de Gráficas (Circulares Dinámicas)")
-
-    # Pie charts for subjects
-    if "Etnia" in df_subjects.columns:
-        summary_etnia = df_subjects.group_by("Etnia").agg(
-            pl.col("Personas por ocurrencia").sum().alias("Personas Afectadas"))
-        fig_etnia = px.pie(summary_etnia.to_pandas(), values="Personas Afectadas", names="Etnia",
-                           title="Distribución por Etnia (Víctimas)")
-        st.plotly_chart(fig_etnia)
-
-    if "Ciclo vital" in df_subjects.columns:
-        summary_ciclo = df_subjects.group_by("Ciclo vital").agg(
-            pl.col("Personas por ocurrencia").sum().alias("Personas Afectadas"))
-        fig_ciclo = px.pie(summary_ciclo.to_pandas(), values="Personas Afectadas", names="Ciclo vital",
-                           title="Distribución por Ciclo Vital (Víctimas)")
-        st.plotly_chart(fig_ciclo)
+# Gráficas circulares de la sección, declaradas sobre el motor de chart_specs.py
+GRAPHICS_SPECS = {
+    "etnia": {"dataset": "subjects", "dimension": "Etnia", "measures": {"Personas Afectadas": PPO},
+              "chart": "pie", "title": "Distribución por Etnia (Víctimas)"},
+    "ciclo_vital": {"dataset": "subjects", "dimension": "Ciclo vital", "measures": {"Personas Afectadas": PPO},
+                    "chart": "pie", "title": "Distribución por Ciclo Vital (Víctimas)"},
+    "hecho": {"dataset": "subjects", "dimension": HECHO, "measures": {"Personas Afectadas": PPO},
+              "chart": "pie", "title": "Distribución por Hecho Victimizante"},
+    "depto_llegadas": {"dataset": "arrivals", "dimension": "ESTADO_DEPTO",
+                       "measures": {"Llegadas": "Personas que llegaron"},
+                       "chart": "pie", "title": "Distribución de Llegadas por Departamento"},
+    "year_llegadas": {"dataset": "arrivals", "dimension": "Vigencia", "measures": {"Llegadas": "Personas que llegaron"},
+                      "chart": "pie", "title": "Distribución de Llegadas por Año"},
+    "etnia_llegadas": {"dataset": "arrivals", "dimension": "Etnia", "measures": {"Llegadas": "Personas que llegaron"},
+                       "chart": "pie", "title": "Distribución de Llegadas por Etnia"},
+}
 
-    if "Tipo o Nombre de Hecho Victimizante" in df_subjects.columns:
-        summary_hecho = df_subjects.group_by("Tipo o Nombre de Hecho Victimizante").agg(
-            pl.col("Personas por ocurrencia").sum().alias("Personas Afectadas"))
-        fig_hecho = px.pie(summary_hecho.to_pandas(), values="Personas Afectadas",
-                           names="Tipo o Nombre de Hecho Victimizante", title="Distribución por Hecho Victimizante")
-        st.plotly_chart(fig_hecho)
 
-    # Pie charts for arrivals
-    if "ESTADO_DEPTO" in df_arrivals.columns:
-        summary_depto_arr = df_arrivals.group_by("ESTADO_DEPTO").agg(
-            pl.col("Personas que llegaron").sum().alias("Llegadas"))
-        fig_depto_arr = px.pie(summary_depto_arr.to_pandas(), values="Llegadas", names="ESTADO_DEPTO",
-                               title="Distribución de Llegadas por Departamento")
-        st.plotly_chart(fig_depto_arr)
-
-    if "Vigencia" in df_arrivals.columns:
-        summary_year = df_arrivals.group_by("Vigencia").agg(pl.col("Personas que llegaron").sum().alias("Llegadas"))
-        fig_year = px.pie(summary_year.to_pandas(), values="Llegadas", names="Vigencia",
-                          title="Distribución de Llegadas por Año")
-        st.plotly_chart(fig_year)
+def show_graphics_section(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
+    st.header("📊 Sección de Gráficas (Circulares Dinámicas)")
 
-    if "Etnia" in df_arrivals.columns:
-        summary_etnia_arr = df_arrivals.group_by("Etnia").agg(pl.col("Personas que llegaron").sum().alias("Llegadas"))
-        fig_etnia_arr = px.pie(summary_etnia_arr.to_pandas(), values="Llegadas", names="Etnia",
-                               title="Distribución de Llegadas por Etnia")
-        st.plotly_chart(fig_etnia_arr)
+    charts = compute_specs({"subjects": df_subjects, "arrivals": df_arrivals}, GRAPHICS_SPECS)
+    for name, spec in GRAPHICS_SPECS.items():
+        data = charts[name]
+        if data is None:
+            continue
+        value = next(iter(spec["measures"]))
+        fig = px.pie(data.to_pandas(), values=value, names=spec["dimension"], title=spec["title"])
+        st.plotly_chart(fig)
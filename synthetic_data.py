@@ -0,0 +1,176 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import polars as pl
+
+# ============================================
+# GENERADOR DE DATOS SINTÉTICOS (FORMATO RUV)
+# ============================================
+# Uso:  python synthetic_data.py --rows 10M --output datasets/synthetic/10m
+#
+# Escribe hecho_victimizante.csv y llegadas.csv con las mismas columnas crudas
+# que publica el RUV, para medir el dashboard a escala de producción (1M, 10M,
+# 100M filas). Las distribuciones imitan el sesgo real: pocos departamentos y
+# el desplazamiento forzado concentran la mayoría de registros, "Ninguna" domina
+# la etnia, los años se concentran en 1997-2008 y las personas por ocurrencia
+# tienen cola larga. Se genera por bloques, así que la memoria no depende del
+# tamaño total.
+
+CHUNK_ROWS = 1_000_000
+FECHA_CORTE = "30/09/2025 12:00:00 a. m."
+
+DEPARTMENTS = [
+    "Antioquia", "Bolívar", "Valle del Cauca", "Nariño", "Cauca", "Magdalena", "Cesar", "Córdoba", "Chocó",
+    "Bogotá, D.C.", "Caquetá", "Putumayo", "Meta", "Sucre", "Tolima", "Norte de Santander", "Santander",
+    "Huila", "Caldas", "La Guajira", "Guaviare", "Arauca", "Risaralda", "Cundinamarca", "Atlántico",
+    "Boyacá", "Casanare", "Quindío", "Vichada", "Guainía", "Vaupés", "Amazonas",
+    "Archipiélago de San Andrés, Providencia y Santa Catalina", "Sin Definir",
+]
+
+# (nombre, peso)
+HECHOS = [
+    ("Desplazamiento forzado", 0.82), ("Homicidio", 0.07), ("Amenaza", 0.045), ("Desaparición forzada", 0.015),
+    ("Acto terrorista / Atentados / Combates / Enfrentamientos / Hostigamientos", 0.012),
+    ("Perdida de Bienes Muebles o Inmuebles", 0.01), ("Delitos contra la libertad y la integridad sexual", 0.007),
+    ("Secuestro", 0.005), ("Minas Antipersonal, Munición sin Explotar y Artefacto Explosivo improvisado", 0.003),
+    ("Vinculación de Niños Niñas y Adolescentes a Actividades Relacionadas con grupos armados", 0.002),
+    ("Tortura", 0.002), ("Abandono o Despojo Forzado de Tierras", 0.002), ("Lesiones Personales Fisicas", 0.002),
+    ("Confinamiento", 0.002), ("Sin información", 0.001),
+]
+ETNIAS = [
+    ("Ninguna", 0.84), ("Negro(a) o Afrocolombiano(a)", 0.085), ("Indígena", 0.05), ("No Informa", 0.012),
+    ("Gitano(a) ROM", 0.006), ("Raizal del Archipiélago de San Andrés y Providencia", 0.004), ("Palenquero", 0.003),
+]
+CICLOS = [
+    ("entre 0 y 5", 0.07), ("entre 6 y 11", 0.11), ("entre 12 y 17", 0.12), ("entre 18 y 28", 0.21),
+    ("entre 29 y 59", 0.34), ("entre 60 y 110", 0.1), ("ND", 0.05),
+]
+SEXOS = [("Mujer", 0.505), ("Hombre", 0.485), ("LGBTI", 0.004), ("No Informa", 0.006)]
+DISCAPACIDADES = [
+    ("Ninguna", 0.93), ("Física", 0.025), ("Múltiple", 0.01), ("Visual", 0.01), ("Intelectual", 0.008),
+    ("Auditiva", 0.007), ("Psicosocial", 0.01),
+]
+
+
+def parse_rows(value: str):
+    """Convierte '1M', '10M', '500k' o '2000' en número de filas"""
+    value = value.strip().lower().replace("_", "")
+    multipliers = {"k": 1_000, "m": 1_000_000, "b": 1_000_000_000}
+    if value and value[-1] in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1]])
+    return int(value)
+
+
+def _weights(items):
+    names = [name for name, _ in items]
+    weights = np.array([w for _, w in items], dtype=np.float64)
+    return names, weights / weights.sum()
+
+
+def _zipf_weights(n: int, s: float = 1.1):
+    """Pesos tipo Zipf: pocos valores concentran la mayoría de registros"""
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+
+def _year_weights(years: np.ndarray):
+    """Mezcla de un pico entre 1997-2008 y un fondo constante"""
+    peak = np.exp(-0.5 * ((years - 2002) / 4.5) ** 2)
+    weights = 0.8 * peak / peak.sum() + 0.2 / len(years)
+    return weights / weights.sum()
+
+
+def _categorical(rng, items, n: int):
+    names, weights = _weights(items)
+    return pl.Series(np.array(names)[rng.choice(len(names), n, p=weights)])
+
+
+def _people(rng, n: int, mean: float = 1.6):
+    """Personas por registro: mayormente 1, con cola larga"""
+    return rng.geometric(1 / mean, n) + (rng.random(n) < 0.002) * rng.integers(10, 500, n)
+
+
+def subjects_chunk(rng, n: int, years: np.ndarray):
+    """Bloque de registros de víctimas por hecho victimizante"""
+    hecho_names, hecho_weights = _weights(HECHOS)
+    hecho_idx = rng.choice(len(hecho_names), n, p=hecho_weights)
+    per_ocu = _people(rng, n)
+    return pl.DataFrame({
+        "FECHA_CORTE": pl.Series([FECHA_CORTE]).new_from_index(0, n),
+        "PARAM_HECHO": pl.Series(hecho_idx + 1).cast(pl.Utf8),
+        "HECHO": pl.Series(np.array(hecho_names)[hecho_idx]),
+        "SEXO": _categorical(rng, SEXOS, n),
+        "ETNIA": _categorical(rng, ETNIAS, n),
+        "DISCAPACIDAD": _categorical(rng, DISCAPACIDADES, n),
+        "CICLO_VITAL": _categorical(rng, CICLOS, n),
+        "VIGENCIA": rng.choice(years, n, p=_year_weights(years)),
+        "PER_OCU": per_ocu,
+        "PER_SA": np.minimum(per_ocu, _people(rng, n)),
+        "EVENTOS": rng.geometric(0.7, n),
+    })
+
+
+def arrivals_chunk(rng, n: int, years: np.ndarray):
+    """Bloque de registros de llegadas por departamento"""
+    dept_idx = rng.choice(len(DEPARTMENTS), n, p=_zipf_weights(len(DEPARTMENTS)))
+    per_llegada = _people(rng, n, mean=2.2)
+    return pl.DataFrame({
+        "FECHA_CORTE": pl.Series([FECHA_CORTE]).new_from_index(0, n),
+        "COD_ESTADO_DEPTO": pl.Series(dept_idx + 1).cast(pl.Utf8).str.zfill(2),
+        "ESTADO_DEPTO": pl.Series(np.array(DEPARTMENTS)[dept_idx]),
+        "HECHO": _categorical(rng, HECHOS, n),
+        "VIGENCIA": rng.choice(years, n, p=_year_weights(years)),
+        "PER_OCU": per_llegada + rng.geometric(0.8, n) - 1,
+        "PER_LLEGADA": per_llegada,
+        "EVENTOS": rng.geometric(0.6, n),
+    })
+
+
+def write_dataset(path: str, make_chunk, rows: int, rng, years: np.ndarray, chunk_rows: int = CHUNK_ROWS):
+    """Escribe un CSV por bloques de chunk_rows filas"""
+    with open(path, "wb") as f:
+        written = 0
+        while written < rows:
+            n = min(chunk_rows, rows - written)
+            make_chunk(rng, n, years).write_csv(f, include_header=written == 0)
+            written += n
+    return written
+
+
+def generate(rows: int, output_dir: str, arrivals_rows: int | None = None, seed: int = 0,
+             chunk_rows: int = CHUNK_ROWS):
+    """Genera hecho_victimizante.csv y llegadas.csv en output_dir"""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    years = np.arange(1985, 2026)
+
+    paths = {
+        "subjects": os.path.join(output_dir, "hecho_victimizante.csv"),
+        "arrivals": os.path.join(output_dir, "llegadas.csv"),
+    }
+    write_dataset(paths["subjects"], subjects_chunk, rows, rng, years, chunk_rows)
+    write_dataset(paths["arrivals"], arrivals_chunk, arrivals_rows or rows, rng, years, chunk_rows)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datasets sintéticos con el formato del RUV")
+    parser.add_argument("--rows", default="1M", help="Filas de víctimas (ej. 1M, 10M, 100M)")
+    parser.add_argument("--arrivals-rows", default=None, help="Filas de llegadas (por defecto, las mismas)")
+    parser.add_argument("--output", default="datasets/synthetic", help="Carpeta de salida")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla (misma semilla, mismos archivos)")
+    args = parser.parse_args()
+
+    rows = parse_rows(args.rows)
+    arrivals_rows = parse_rows(args.arrivals_rows) if args.arrivals_rows else None
+
+    start = time.perf_counter()
+    paths = generate(rows, args.output, arrivals_rows, args.seed)
+    sizes = ", ".join(f"{os.path.basename(p)} {os.path.getsize(p) / 1e6:,.0f} MB" for p in paths.values())
+    print(f"✅ {rows:,} filas generadas en {time.perf_counter() - start:.1f}s ({sizes})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Los módulos viven en la raíz del repositorio y leen registry.json con ruta relativa
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+@pytest.fixture(scope="session")
+def prepared_frames(tmp_path_factory):
+    """(víctimas, llegadas) sintéticas preparadas como en load_datasets, sin tocar datasets/"""
+    from data_loader import load_and_prepare_csv
+    from dimensions import add_dimension_keys
+    from registry import DATASETS
+    from synthetic_data import arrivals_chunk, subjects_chunk
+
+    folder = tmp_path_factory.mktemp("datasets")
+    rng, years = np.random.default_rng(7), np.arange(1995, 2016)
+    frames = []
+    for name, make_chunk in (("subjects", subjects_chunk), ("arrivals", arrivals_chunk)):
+        path = str(folder / f"{name}.csv")
+        make_chunk(rng, 4_000, years).write_csv(path)
+        frames.append(load_and_prepare_csv(path, {}, DATASETS[name]))
+    return add_dimension_keys(*frames, dimensions=[DATASETS[name]["dimensions"] for name in ("subjects", "arrivals")])
@@ -0,0 +1,42 @@
+import numpy as np
+import polars as pl
+
+from aggregations import compute_sections
+from comparison import compare_sections
+from filters import apply_filters, selected_years
+
+
+def assert_same(compared, expected, path=""):
+    """Compara dos secciones; los agregados por dimensión se comparan sin importar el orden de filas"""
+    if isinstance(expected, dict):
+        assert set(compared) == set(expected), (path, set(compared) ^ set(expected))
+        for key in expected:
+            assert_same(compared[key], expected[key], f"{path}/{key}")
+    elif isinstance(expected, pl.DataFrame):
+        assert compared.columns == expected.columns, path
+        assert compared.sort(compared.columns).equals(expected.sort(expected.columns)), path
+    elif isinstance(expected, np.ndarray):
+        assert np.allclose(compared, expected), path
+    elif isinstance(expected, float) and np.isnan(expected):
+        assert np.isnan(compared), path
+    else:
+        assert compared == expected, (path, compared, expected)
+
+
+def test_comparison_slices_match_separate_sections(prepared_frames):
+    subjects, arrivals = prepared_frames
+    depts = arrivals["ESTADO_DEPTO"].unique().sort().to_list()
+    fact = subjects["Tipo o Nombre de Hecho Victimizante"][0]
+    # Porciones que se solapan, una vacía y una sin filtros
+    slices = [("A", {"selected_departments": depts[:1]}),
+              ("B", {"selected_departments": depts[:3]}),
+              ("C", {"selected_years": ["2001", "2002"], "selected_fact": [fact]}),
+              ("Vacía", {"selected_departments": ["No existe"]}),
+              ("Todo", {})]
+
+    compared = compare_sections(subjects, arrivals, slices)
+    assert list(compared) == [label for label, _ in slices]
+    for label, filters in slices:
+        expected = compute_sections(apply_filters(subjects, **filters), apply_filters(arrivals, **filters),
+                                    selected_years(filters))
+        assert_same(compared[label], expected, label)
@@ -0,0 +1,72 @@
+import polars as pl
+import pytest
+
+import cuts
+
+
+@pytest.fixture
+def cuts_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cuts, "CUTS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _cut(people: list):
+    return pl.DataFrame({
+        "ESTADO_DEPTO": ["Chocó", "Chocó", "Cauca", "Cauca", "Nariño"],
+        "Tipo o Nombre de Hecho Victimizante": ["Desplazamiento forzado"] * 5,
+        "Vigencia": [2001, 2002, 2001, 2002, 2003],
+        "Personas que llegaron": people,
+        "Eventos": [1, 1, 1, 1, 1],
+    })
+
+
+def test_diff_reads_only_revised_partitions(cuts_dir, monkeypatch):
+    cuts.store_cut("arrivals", "2025-08-31", _cut([10, 20, 30, 40, 50]), "v1")
+    # 2002 corrige Chocó (+5) y Cauca (-10); 2001 y 2003 no cambian
+    cuts.store_cut("arrivals", "2025-09-30", _cut([10, 25, 30, 30, 50]), "v2")
+    assert cuts.list_cuts("arrivals") == ["2025-08-31", "2025-09-30"]
+
+    read, original = [], cuts._read_partition
+
+    def read_partition(dataset, cut, manifest, value):
+        read.append(value)
+        return original(dataset, cut, manifest, value)
+
+    monkeypatch.setattr(cuts, "_read_partition", read_partition)
+    summary = cuts.diff_cuts("arrivals", "2025-08-31", "2025-09-30")
+
+    assert summary["partitions"] == 3
+    assert summary["changed_partitions"] == ["2002"]
+    assert read == ["2002", "2002"]
+    assert summary["revised_groups"] == 2
+    assert summary["totals"] == {"Personas que llegaron": -5, "Eventos": 0}
+    by_department = dict(summary["by_department"].select("ESTADO_DEPTO", "Δ Personas que llegaron").iter_rows())
+    assert by_department == {"Chocó": 5, "Cauca": -10}
+
+
+def test_diff_counts_groups_that_appear_or_disappear(cuts_dir):
+    cuts.store_cut("arrivals", "2025-08-31", _cut([10, 20, 30, 40, 50]), "v1")
+    cuts.store_cut("arrivals", "2025-09-30", _cut([10, 20, 30, 40, 50]).filter(pl.col("Vigencia") != 2003), "v2")
+    summary = cuts.diff_cuts("arrivals", "2025-08-31", "2025-09-30")
+    assert summary["changed_partitions"] == ["2003"]
+    assert summary["totals"]["Personas que llegaron"] == -50
+
+
+def test_unchanged_cut_has_no_revisions(cuts_dir):
+    for cut in ("2025-08-31", "2025-09-30"):
+        cuts.store_cut("arrivals", cut, _cut([10, 20, 30, 40, 50]), cut)
+    summary = cuts.diff_cuts("arrivals", "2025-08-31", "2025-09-30")
+    assert summary["changed_partitions"] == [] and summary["revised_groups"] == 0 and summary["top"] is None
+
+
+def test_cuts_with_different_cleaning_rules_are_not_compared(cuts_dir):
+    rules = {"trim": True, "fold_case": True}
+    cuts.store_cut("arrivals", "2025-08-31", _cut([10, 20, 30, 40, 50]), "v1")
+    cuts.store_cut("arrivals", "2025-09-30", _cut([10, 20, 30, 40, 50]), "v2", rules)
+    with pytest.raises(cuts.CutMismatch):
+        cuts.diff_cuts("arrivals", "2025-08-31", "2025-09-30")
+
+    # Al volver a cargar el corte anterior con las reglas actuales se reemplaza y ya se compara
+    manifest = cuts.store_cut("arrivals", "2025-08-31", _cut([10, 20, 30, 40, 50]), "v1", rules)
+    assert manifest["rules"] == cuts.read_cut_manifest("arrivals", "2025-09-30")["rules"]
+    assert cuts.diff_cuts("arrivals", "2025-08-31", "2025-09-30")["revised_groups"] == 0
@@ -0,0 +1,57 @@
+import numpy as np
+import polars as pl
+
+from downsampling import (OTHERS_LABEL, downsample_frame, downsample_series, limit_series, lttb_indices, max_points,
+                          minmax_indices)
+
+
+def _noisy(n, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.normal(0, 1, n).cumsum()
+    y[n // 3] = y.max() + 50   # pico aislado
+    y[2 * n // 3] = y.min() - 50   # valle aislado
+    return np.arange(n), y
+
+
+def test_lttb_keeps_endpoints_and_extrema():
+    x, y = _noisy(10_000)
+    for threshold in (5, 50, 600):
+        idx = lttb_indices(x, y, threshold)
+        assert len(idx) <= threshold
+        assert idx[0] == 0 and idx[-1] == len(y) - 1
+        assert int(np.argmax(y)) in idx and int(np.argmin(y)) in idx
+        assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_short_series_unchanged():
+    x, y = _noisy(100)
+    assert np.array_equal(lttb_indices(x, y, 600), np.arange(100))
+
+
+def test_minmax_keeps_extrema_within_budget():
+    _, y = _noisy(5_000, seed=1)
+    idx = minmax_indices(y, 100)
+    assert len(idx) <= 200
+    assert int(np.argmax(y)) in idx and int(np.argmin(y)) in idx
+
+
+def test_downsample_frame_uses_chart_width():
+    x, y = _noisy(20_000)
+    df = pl.DataFrame({"x": x, "y": y})
+    assert downsample_frame(df, "x", "y").shape[0] <= max_points()
+    assert downsample_frame(df, "x", "y", max_points(0.5)).shape[0] <= max_points(0.5)
+    assert max_points(0.5) < max_points()
+
+
+def test_limit_series_and_downsample_series():
+    frames = [pl.DataFrame({"s": f"s{i}", "x": np.arange(2_000), "y": _noisy(2_000, seed=i)[1] + 1_000 * i})
+              for i in range(15)]
+    df = pl.concat(frames)
+    limited = limit_series(df, "s", "x", "y", max_series=5)
+    assert limited["s"].n_unique() == 5
+    assert OTHERS_LABEL in limited["s"].to_list()
+    assert abs(limited["y"].sum() - df["y"].sum()) < 1e-6 * abs(df["y"].sum())
+
+    reduced = downsample_series(limited, "s", "x", "y", points=100)
+    for _, part in reduced.group_by("s"):
+        assert part.shape[0] <= 100
@@ -0,0 +1,81 @@
+import itertools
+
+import polars as pl
+import pytest
+
+import paging
+import result_cache
+from filters import apply_filters, filter_key
+from paging import SEARCH_FOLD, display_columns, page_count, view_rows
+from text_cleaning import text_key
+
+_versions = itertools.count()
+
+
+def naive_view(df: pl.DataFrame, filters: dict, search: str, sort: tuple | None):
+    """La misma vista recorriendo las filas: filtros, búsqueda sin mayúsculas ni tildes y orden"""
+    view = apply_filters(df.with_row_index("row"), **filters)
+    needle = text_key(search, SEARCH_FOLD)
+    if needle:
+        text = [col for col in display_columns(df) if df.schema[col] == pl.Utf8]
+        found = pl.any_horizontal(
+            pl.col(col).map_elements(lambda value: needle in text_key(value, SEARCH_FOLD), return_dtype=pl.Boolean)
+            for col in text)
+        view = view.filter(found.fill_null(False))
+    if sort is not None:
+        view = view.sort(sort[0], descending=sort[1], nulls_last=True)
+    return view
+
+
+@pytest.mark.parametrize("filters, search, sort", [
+    ({}, "", None),
+    ({"selected_years": ["2001", "2002"]}, "", None),
+    ({}, "  DESPLAZAMIENTO ", None),
+    ({}, "indigena", ("Personas por ocurrencia", True)),
+    ({"selected_fact": ["Desplazamiento forzado"]}, "mujer", ("Vigencia", False)),
+    ({"selected_years": ["2003"]}, "", ("Etnia", True)),
+    ({}, "no existe en ningún valor", None),
+])
+def test_view_matches_naive_filter_search_and_sort(prepared_frames, filters, search, sort):
+    df = prepared_frames[0]
+    rows = view_rows(df, f"test-{next(_versions)}", "subjects", filter_key(filters), search, sort)
+    expected = naive_view(df, filters, search, sort)
+
+    assert sorted(rows.to_list()) == sorted(expected["row"].to_list())
+    if sort is None:
+        assert rows.to_list() == expected["row"].to_list()
+    else:
+        # Los empates pueden salir en otro orden: se compara la columna ordenada
+        assert df[sort[0]].gather(rows).to_list() == expected[sort[0]].to_list()
+
+
+def test_view_is_cached_per_version(prepared_frames):
+    df = prepared_frames[0]
+    key = filter_key({"selected_years": ["2001"]})
+    first = view_rows(df, "test-cached", "subjects", key, "Mujer", ("Vigencia", True))
+    hits = result_cache.stats()["hits"]
+    # La búsqueda se normaliza antes de armar la clave: " mujer " es la misma vista
+    assert view_rows(df, "test-cached", "subjects", key, " mujer ", ("Vigencia", True)).equals(first)
+    assert result_cache.stats()["hits"] == hits + 1
+
+
+def test_page_count():
+    assert [page_count(rows, 50) for rows in (0, 1, 50, 51, 100)] == [1, 1, 1, 2, 2]
+
+
+def test_table_page_reports_the_page_it_shows(prepared_frames, monkeypatch):
+    class Lease:
+        def release(self):
+            pass
+
+    df = prepared_frames[0]
+    monkeypatch.setattr(paging, "_dataset", lambda version, dataset: (df, Lease()))
+    key = filter_key({"selected_years": ["2001"]})
+    rows = view_rows(df, "test-page", "subjects", key)
+    last = page_count(rows.len(), 50)
+
+    # Una página que ya no existe en la vista muestra la última, y lo dice
+    result = paging.table_page("test-page", "subjects", key, last + 5, page_rows=50)
+    assert result["page"] == last and result["first"] == (last - 1) * 50
+    assert result["data"].height == rows.len() - result["first"]
+    assert paging.table_page("test-page", "subjects", key, 0, page_rows=50)["page"] == 1
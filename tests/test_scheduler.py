@@ -0,0 +1,72 @@
+import threading
+import time
+
+import scheduler
+from scheduler import PRIORITY_PREFETCH, PRIORITY_SECTIONS, run_query, scheduler_stats
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "el planificador no llegó al estado esperado"
+        time.sleep(0.005)
+
+
+def _start(key, priority, order, results=None):
+    def run():
+        result = run_query(key, lambda: order.append(key) or key, priority)
+        if results is not None:
+            results.append(result)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_merged_call_promotes_queued_prefetch(monkeypatch):
+    monkeypatch.setattr(scheduler, "MAX_HEAVY_QUERIES", 1)
+    release, order, results = threading.Event(), [], []
+
+    # Una sección ocupa el único cupo pesado
+    blocker = threading.Thread(target=lambda: run_query("blocker", release.wait, PRIORITY_SECTIONS), daemon=True)
+    blocker.start()
+    _wait_until(lambda: scheduler_stats()["classes"]["sections"]["running"] == 1)
+
+    # Un precálculo queda en cola y un clic pide lo mismo: se fusiona y lo sube de prioridad
+    threads = [_start("x", PRIORITY_PREFETCH, order)]
+    _wait_until(lambda: scheduler_stats()["classes"]["prefetch"]["waiting"] == 1)
+    promoted = scheduler_stats()["promoted"]
+    threads.append(_start("x", PRIORITY_SECTIONS, order, results))
+    _wait_until(lambda: scheduler_stats()["promoted"] == promoted + 1)
+    assert scheduler_stats()["classes"]["sections"]["waiting"] == 1
+
+    # Una sección que llega después ya no pasa delante del cálculo compartido
+    threads.append(_start("later", PRIORITY_SECTIONS, order))
+    _wait_until(lambda: scheduler_stats()["classes"]["sections"]["waiting"] == 2)
+
+    release.set()
+    for thread in [blocker, *threads]:
+        thread.join(5)
+    assert order == ["x", "later"]
+    assert results == ["x"]
+
+
+def test_identical_calls_share_one_computation(monkeypatch):
+    monkeypatch.setattr(scheduler, "MAX_HEAVY_QUERIES", 1)
+    release, calls = threading.Event(), []
+
+    def compute():
+        calls.append(1)
+        release.wait()
+        return "ok"
+
+    results, merged = [], scheduler_stats()["merged"]
+    threads = [threading.Thread(target=lambda: results.append(run_query("same", compute)), daemon=True)
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_until(lambda: scheduler_stats()["merged"] == merged + 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == [1] and results == ["ok"] * 3
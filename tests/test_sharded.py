@@ -0,0 +1,56 @@
+import polars as pl
+import pytest
+
+import sharded
+from aggregations import compute_sections
+from filters import apply_filters, filter_key, selected_years
+from sharded import assign_shards, range_shard, sharded_sections, write_shards
+from tests.test_comparison import assert_same
+
+
+def test_range_shard_does_not_overflow_on_large_frames():
+    # 100M filas en 64 porciones: index * shards pasa de 2^32
+    rows = 100_000_000
+    index = pl.Series([0, rows // 2, rows - 1], dtype=pl.UInt32)
+    shards = pl.select(range_shard(pl.lit(index), rows, 64)).to_series()
+    assert shards.to_list() == [0, 32, 63]
+
+
+def test_assign_shards_by_range_is_contiguous_and_balanced():
+    df = pl.DataFrame({"x": range(1_000)})
+    shards = df.select(assign_shards(df, None, 8)).to_series()
+    assert shards.dtype == pl.UInt32
+    assert shards.is_sorted()
+    assert shards.value_counts()["count"].to_list() == [125] * 8
+
+
+def test_assign_shards_by_column_keeps_values_together():
+    df = pl.DataFrame({"d": ["a"] * 500 + ["b"] * 300 + ["c"] * 200})
+    shards = df.with_columns(assign_shards(df, "d", 2).alias("s"))
+    assert shards.group_by("d").agg(pl.col("s").n_unique())["s"].to_list() == [1, 1, 1]
+    assert sorted(shards["s"].value_counts()["count"].to_list()) == [500, 500]
+
+
+@pytest.fixture(scope="module")
+def shard_pool():
+    # Dos trabajadores, como con SHARD_WORKERS=2
+    sharded._pool = sharded.ProcessPoolExecutor(max_workers=2, mp_context=sharded._WorkerContext())
+    yield
+    sharded._pool.shutdown()
+    sharded._pool = None
+
+
+@pytest.mark.parametrize("by", ["departamento", "año"])
+def test_sharded_sections_match_compute_sections(prepared_frames, shard_pool, tmp_path, monkeypatch, by):
+    subjects, arrivals = prepared_frames
+    monkeypatch.setattr(sharded, "SHARD_DIR", str(tmp_path))
+    write_shards("test", subjects, arrivals, by, 4)
+
+    depts = arrivals["ESTADO_DEPTO"].unique().drop_nulls().sort().to_list()
+    fact = subjects["Tipo o Nombre de Hecho Victimizante"][0]
+    for filters in ({}, {"selected_departments": depts[:2]},
+                    {"selected_years": ["2001", "2005"], "selected_fact": [fact]},
+                    {"selected_departments": ["No existe"]}):
+        expected = compute_sections(apply_filters(subjects, **filters), apply_filters(arrivals, **filters),
+                                    selected_years(filters))
+        assert_same(sharded_sections("test", filter_key(filters), by), expected, str(filters))
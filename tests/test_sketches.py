@@ -0,0 +1,84 @@
+import numpy as np
+import polars as pl
+
+from aggregations import dataset_totals, kpi_totals, merge_totals
+from chart_specs import derive_specs, merge_aggregates
+from sketches import ERROR_COLUMN, HLL_REGISTERS, DistinctSketch, HeavyHitters
+
+
+def _weighted(seed: int, rows: int = 5_000, items: int = 300):
+    # Pesos con cola larga: pocos elementos pesados y muchos livianos
+    rng = np.random.default_rng(seed)
+    ids = rng.zipf(1.3, rows) % items
+    return pl.DataFrame({"item": [f"e{i}" for i in ids], "n": rng.integers(1, 10, rows)})
+
+
+def test_heavy_hitters_error_bounds_every_item():
+    parts = [_weighted(seed) for seed in range(4)]
+    exact = dict(pl.concat(parts).group_by("item").agg(pl.col("n").sum()).iter_rows())
+
+    sketch = HeavyHitters("item", ["n"], capacity=20).update(parts[0])
+    for part in parts[1:]:
+        sketch = sketch.merge(HeavyHitters("item", ["n"], capacity=20).update(part))
+
+    assert sketch.error > 0
+    recorded = dict(sketch.frame().iter_rows())
+    assert len(recorded) == 20
+    for item, total in exact.items():
+        # Registrado: suma entre la registrada y esa más la cota; descartado: a lo sumo la cota
+        low = recorded.get(item, 0)
+        assert low <= total <= low + sketch.error
+
+
+def test_heavy_hitters_are_exact_under_capacity():
+    parts = [_weighted(seed, items=30) for seed in range(3)]
+    exact = pl.concat(parts).group_by("item").agg(pl.col("n").sum()).sort(["n", "item"], descending=[True, False])
+
+    sketch = HeavyHitters("item", ["n"], capacity=64)
+    for part in parts:
+        sketch = sketch.merge(HeavyHitters("item", ["n"], capacity=64).update(part))
+
+    assert sketch.error == 0
+    assert sketch.frame().equals(exact)
+
+
+def test_truncated_top_n_carries_its_error_bound():
+    plans = {"top": {"key": ("d", "item", ()), "post_cohorts": (), "measures": {"Total": "n"},
+                     "sort": "total", "top": 5}}
+    parts = [{("d", "item", ()): HeavyHitters("item", ["n"], capacity=10).update(_weighted(seed))}
+             for seed in range(3)]
+    merged = merge_aggregates(parts)
+    top = derive_specs(merged, plans)["top"]
+    assert top.height == 5
+    assert top[ERROR_COLUMN].to_list() == [merged[("d", "item", ())].error] * 5
+
+    small = [{("d", "item", ()): HeavyHitters("item", ["n"], capacity=400).update(_weighted(seed))}
+             for seed in range(3)]
+    assert ERROR_COLUMN not in derive_specs(merge_aggregates(small), plans)["top"].columns
+
+
+def test_distinct_sketch_merges_overlapping_parts_exactly_when_sparse():
+    a = DistinctSketch().update(pl.Series(["x", "y", None]))
+    b = DistinctSketch().update(pl.Series(["y", "z"]))
+    assert a.merge(b).estimate() == 4
+
+
+def test_distinct_sketch_estimate_is_close_in_dense_mode():
+    values = pl.Series([f"v{i}" for i in range(50_000)])
+    parts = [DistinctSketch().update(values[i::3]) for i in range(3)]
+    # Las porciones se solapan: el valor repetido no cuenta dos veces
+    parts.append(DistinctSketch().update(values[:10_000]))
+    merged = parts[0]
+    for part in parts[1:]:
+        merged = merged.merge(part)
+    assert merged.registers is not None and merged.registers.size == HLL_REGISTERS
+    assert abs(merged.estimate() - 50_000) / 50_000 < 0.05
+
+
+def test_mergeable_totals_match_live_totals():
+    df = pl.DataFrame({"ESTADO_DEPTO": ["A", "B", "A", "C", None, "B"], "Eventos": [1, 2, 3, 4, 5, 6]})
+    live = dataset_totals(df)
+    assert live["depts"] == 4
+    merged = merge_totals([dataset_totals(df[:3], mergeable=True), dataset_totals(df[3:], mergeable=True)])
+    assert merged["rows"] == live["rows"] and merged["sums"] == live["sums"]
+    assert kpi_totals(None, None, live, merged)["unique_depts"] == live["depts"]
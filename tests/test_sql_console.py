@@ -0,0 +1,68 @@
+import polars as pl
+import pytest
+
+from sql_console import SQLError, check_sources, normalize_query, validate_query
+
+FILE_READS = [
+    "SELECT * FROM read_csv('/etc/passwd')",
+    "SELECT * FROM READ_CSV('/etc/passwd')",
+    "SELECT * FROM \"read_csv\"('/etc/passwd')",
+    "SELECT * FROM \"READ_Parquet\"('/etc/passwd')",
+    "SELECT * FROM `read_ipc`('/etc/passwd')",
+    "SELECT * FROM read_json /* x */ ('/etc/passwd')",
+    "SELECT * FROM (read_csv('/etc/passwd'))",
+    "SELECT * FROM subjects UNION SELECT * FROM read_csv('/etc/passwd')",
+    "SELECT * FROM '/etc/passwd'",
+    "SELECT * FROM (('/etc/passwd'))",
+    "SELECT * FROM subjects JOIN $$/etc/passwd$$ USING (x)",
+    "WITH t AS (SELECT * FROM \"some_table_function\"('x')) SELECT * FROM t",
+    "SELECT * FROM subjects s JOIN other_function(1) o ON true",
+]
+
+
+@pytest.mark.parametrize("query", FILE_READS)
+def test_rejects_table_functions_and_file_relations(query):
+    with pytest.raises(SQLError):
+        validate_query(normalize_query(query))
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT 1 /* comentario /* anidado */ sin cerrar FROM subjects",
+    "SELECT 'sin cerrar FROM subjects",
+    "SELECT \"sin cerrar FROM subjects",
+    "SELECT * FROM subjects; SELECT * FROM arrivals",
+    "DELETE FROM subjects",
+    "   ",
+])
+def test_rejects_malformed_or_non_select(query):
+    with pytest.raises(SQLError):
+        validate_query(normalize_query(query))
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT COUNT(*) FROM subjects",
+    "select \"Etnia\", sum(\"Personas por ocurrencia\") from subjects group by \"Etnia\"",
+    "WITH t AS (SELECT * FROM arrivals) SELECT * FROM t JOIN (SELECT 1 AS x) u ON true",
+    "SELECT * FROM subjects WHERE \"Sexo\" = 'Mujer' -- comentario",
+])
+def test_accepts_queries_on_registered_tables(query):
+    validate_query(normalize_query(query))
+
+
+def test_normalize_keeps_literals_and_drops_comments():
+    query = "SELECT  'a  -- b' AS x /* c /* d */ e */\n FROM   subjects ;"
+    assert normalize_query(query) == "SELECT 'a  -- b' AS x FROM subjects"
+
+
+def test_plan_may_only_read_registered_tables(tmp_path):
+    path = tmp_path / "secret.csv"
+    path.write_text("secret\n1\n")
+    ipc = tmp_path / "shard.arrow"
+    pl.DataFrame({"a": [1]}).write_ipc(ipc)
+    tables = {"subjects": pl.DataFrame({"a": [1]}).lazy(), "arrivals": pl.scan_ipc(ipc, memory_map=True)}
+    context = pl.SQLContext(tables)
+
+    check_sources(context.execute("SELECT * FROM subjects JOIN arrivals USING (a)", eager=False), tables)
+    # La validación de texto no se aplica aquí: el plan por sí solo también se rechaza
+    with pytest.raises(SQLError):
+        check_sources(context.execute(f"SELECT * FROM read_csv('{path}')", eager=False), tables)
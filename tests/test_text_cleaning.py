@@ -0,0 +1,51 @@
+import polars as pl
+
+from text_cleaning import normalize_text_columns, rules_digest, text_key
+
+CLEANING = {
+    "fill_text_nulls": "No especificado",
+    "trim": True,
+    "fold_case": True,
+    "fold_accents": True,
+    "labels": ["Mujer", "Hombre"],
+    "synonyms": {"No informa": "No especificado", "ND": "No especificado"},
+}
+
+
+def test_text_key_folds_spaces_case_and_accents():
+    assert text_key("  INDÍGENA   Nasa ", CLEANING) == "indigena nasa"
+    assert text_key("  INDÍGENA ", {"trim": True}) == "INDÍGENA"
+
+
+def test_variants_map_to_declared_labels_and_synonyms():
+    df = pl.DataFrame({"Sexo": ["MUJER", " mujer", "Mujer", "hombre", "No Informa", "nd", None, "LGBTI"],
+                       "n": range(8)})
+    out, filled, normalized = normalize_text_columns(df, CLEANING)
+    assert out["Sexo"].to_list() == ["Mujer", "Mujer", "Mujer", "Hombre", "No especificado", "No especificado",
+                                     "No especificado", "LGBTI"]
+    assert out["n"].to_list() == list(range(8))
+    assert filled == {"Sexo": 1}
+    assert normalized == {"Sexo": 5}
+
+
+def test_undeclared_variants_take_the_most_frequent_spelling():
+    df = pl.DataFrame({"Etnia": ["Indígena"] * 3 + ["INDIGENA", "indigena ", "Negro(a) o Afrocolombiano(a)"]})
+    out, _, normalized = normalize_text_columns(df, CLEANING)
+    assert out["Etnia"].to_list() == ["Indígena"] * 5 + ["Negro(a) o Afrocolombiano(a)"]
+    assert normalized == {"Etnia": 2}
+
+
+def test_clean_columns_and_missing_rules_leave_the_frame_alone():
+    df = pl.DataFrame({"Sexo": ["Mujer", "Hombre"], "Vigencia": [2001, 2002]})
+    out, filled, normalized = normalize_text_columns(df, CLEANING)
+    assert out.equals(df) and filled == {} and normalized == {}
+
+    raw = pl.DataFrame({"Sexo": ["MUJER", None]})
+    out, filled, normalized = normalize_text_columns(raw, {})
+    assert out.equals(raw) and filled == {} and normalized == {}
+
+
+def test_rules_digest_ignores_key_order():
+    assert rules_digest(CLEANING) == rules_digest(dict(reversed(list(CLEANING.items()))))
+    assert rules_digest(CLEANING) != rules_digest({**CLEANING, "fold_accents": False})
+    assert rules_digest({}) is None
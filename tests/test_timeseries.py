@@ -0,0 +1,66 @@
+import math
+
+import polars as pl
+import pytest
+
+from dimensions import dimension_categories
+from filters import apply_filters, selected_years
+from timeseries import ROLLING_YEARS, SERIES, VALUE, YEAR, compute_trends
+
+
+def plain_trends(arrivals: pl.DataFrame, years):
+    """Las mismas columnas serie por serie y año por año, sin ventanas de Polars"""
+    grid = [int(year) for year in dimension_categories(arrivals)["year"]]
+    kept = [year for year in grid if years is None or str(year) in years]
+    sums = {(*row[:2], row[2]): row[3]
+            for row in arrivals.group_by([*SERIES, YEAR]).agg(pl.col(VALUE).sum()).drop_nulls(SERIES).iter_rows()}
+
+    rows = []
+    for series in sorted({key[:2] for key, value in sums.items() if key[2] in kept and value}):
+        values = {year: sums.get((*series, year), 0) for year in kept}
+        mean = sum(values.values()) / len(kept)
+        std = math.sqrt(sum((v - mean) ** 2 for v in values.values()) / (len(kept) - 1)) if len(kept) > 1 else 0
+        for year in kept:
+            value = values[year]
+            previous = values.get(year - 1)
+            window = [w for w in range(year - ROLLING_YEARS + 1, year + 1) if w >= grid[0]]
+            rows.append({
+                SERIES[0]: series[0], SERIES[1]: series[1], YEAR: year, VALUE: value,
+                "Cambio anual": None if previous is None else value - previous,
+                "Cambio anual (%)": (value - previous) / previous * 100 if previous else None,
+                "Media móvil": sum(values[w] for w in window) / len(window) if all(w in values for w in window)
+                else None,
+                "Acumulado": sum(values[w] for w in kept if w <= year),
+                "Puntaje z": (value - mean) / std if std else None,
+            })
+    return rows
+
+
+@pytest.mark.parametrize("filters", [{}, {"selected_years": ["2001", "2005"]},
+                                     {"selected_years": ["2003", "2004", "2005", "2009"]}])
+def test_trends_match_plain_per_series_calculation(prepared_frames, filters):
+    arrivals = apply_filters(prepared_frames[1], **filters)
+    years = selected_years(filters)
+    trends = compute_trends(arrivals, years)
+    expected = plain_trends(arrivals, years)
+
+    columns = list(expected[0])
+    actual = trends["series"].select(columns).to_dicts()
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        for column in columns:
+            if want[column] is None:
+                assert got[column] is None, (want, column)
+            else:
+                assert got[column] == pytest.approx(want[column]), (want, column)
+    assert trends["series_count"] == len({(row[SERIES[0]], row[SERIES[1]]) for row in expected})
+
+
+def test_filtered_out_years_do_not_count_as_zero(prepared_frames):
+    filters = {"selected_years": ["2001", "2005"]}
+    trends = compute_trends(apply_filters(prepared_frames[1], **filters), selected_years(filters))
+    assert sorted(trends["series"][YEAR].unique().to_list()) == [2001, 2005]
+    assert trends["last_year"] == 2005
+    # 2004 quedó fuera del filtro: 2005 no tiene cambio anual y no hay focos emergentes
+    assert trends["latest"]["Cambio anual"].null_count() == trends["latest"].height
+    assert trends["hotspots"].height == 0
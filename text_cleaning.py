@@ -0,0 +1,108 @@
+import hashlib
+import unicodedata
+
+import orjson
+import polars as pl
+
+from tracing import traced
+
+# ============================================
+# NORMALIZACIÓN DE TEXTOS POR DICCIONARIO
+# ============================================
+# Las etiquetas del RUV llegan con variantes de la misma categoría ("No Informa",
+# "NO INFORMA", "Sin información", espacios de más, con y sin tilde). Al cargar
+# se normaliza cada columna de texto una sola vez por valor distinto, no por
+# fila: se arma el diccionario de valores de la columna, se calcula la etiqueta
+# canónica de cada entrada y el resultado se reparte a las filas por su código
+# (la posición del valor en el diccionario). Reglas de "cleaning" del registro:
+#
+#   fill_text_nulls  valor para los textos nulos
+#   trim             quita espacios al inicio y al final y colapsa los internos
+#   fold_case        "MUJER" y "Mujer" son la misma categoría
+#   fold_accents     "Indigena" e "Indígena" son la misma categoría
+#   labels           escritura canónica de categorías conocidas ("Mujer", ...)
+#   synonyms         {variante: etiqueta} ("No informa": "No especificado", ...)
+#
+# Las reglas deciden qué valores son la misma categoría (la clave plegada); la
+# etiqueta que queda es la de labels o synonyms si la clave coincide y, si no,
+# la variante más frecuente en los datos. Las tildes no se quitan de lo que se
+# muestra. Las cohortes (cohorts.py) comparan contra las etiquetas canónicas.
+#
+# Cambiar las reglas cambia los textos guardados: el historial de cortes
+# (cuts.py) guarda el resumen de las reglas (rules_digest) con cada corte y no
+# compara cortes armados con reglas distintas.
+
+
+def rules_digest(cleaning: dict | None):
+    """Resumen de las reglas de limpieza (None si no hay reglas)"""
+    if not cleaning:
+        return None
+    return hashlib.sha1(orjson.dumps(cleaning, option=orjson.OPT_SORT_KEYS)).hexdigest()[:16]
+
+
+def text_key(value: str, cleaning: dict):
+    """Clave con la que se comparan las variantes de una etiqueta"""
+    if cleaning.get("trim"):
+        value = " ".join(value.split())
+    if cleaning.get("fold_case"):
+        value = value.casefold()
+    if cleaning.get("fold_accents"):
+        value = "".join(c for c in unicodedata.normalize("NFKD", value) if not unicodedata.combining(c))
+    return value
+
+
+def canonical_labels(cleaning: dict):
+    """{clave: etiqueta} de las etiquetas conocidas y los sinónimos del registro"""
+    synonyms = cleaning.get("synonyms", {})
+    fixed = [*cleaning.get("labels", []), *synonyms.values()]
+    if cleaning.get("fill_text_nulls") is not None:
+        fixed.append(cleaning["fill_text_nulls"])
+    labels = {text_key(label, cleaning): label for label in fixed}
+    labels.update({text_key(variant, cleaning): label for variant, label in synonyms.items()})
+    return labels
+
+
+def column_mapping(counts: pl.DataFrame, column: str, cleaning: dict, labels: dict):
+    """Etiqueta canónica de cada valor distinto (counts: valor y frecuencia, sin nulos)"""
+    values, frequencies = counts[column].to_list(), counts["n"].to_list()
+    keys = [text_key(value, cleaning) for value in values]
+    spelled = [" ".join(value.split()) if cleaning.get("trim") else value for value in values]
+
+    # Sin etiqueta conocida, gana la variante más frecuente (y la primera en orden para empates)
+    totals = {}
+    for key, spelling, n in zip(keys, spelled, frequencies):
+        totals.setdefault(key, {})
+        totals[key][spelling] = totals[key].get(spelling, 0) + n
+    chosen = {key: labels.get(key) or min(variants, key=lambda s: (-variants[s], s))
+              for key, variants in totals.items()}
+    return [chosen[key] for key in keys]
+
+
+@traced()
+def normalize_text_columns(df: pl.DataFrame, cleaning: dict):
+    """Normaliza las columnas de texto por diccionario; devuelve (df, nulos rellenados, filas cambiadas)"""
+    fill_value = cleaning.get("fill_text_nulls")
+    labels = canonical_labels(cleaning)
+    filled, normalized, columns = {}, {}, []
+    for name, dtype in df.schema.items():
+        if dtype != pl.Utf8:
+            continue
+        s = df[name]
+        nulls = s.null_count() if fill_value is not None else 0
+        counts = s.drop_nulls().value_counts(name="n")
+        canonical = column_mapping(counts, name, cleaning, labels)
+        changed = [n for value, label, n in zip(counts[name].to_list(), canonical, counts["n"].to_list())
+                   if value != label]
+        if not changed and not nulls:
+            continue
+
+        # Los códigos del diccionario indexan las etiquetas: nada de texto se recalcula por fila
+        codes = s.cast(pl.Enum(counts[name])).to_physical()
+        out = pl.Series(name, canonical, dtype=pl.Utf8).gather(codes)
+        if nulls:
+            out = out.fill_null(fill_value)
+            filled[name] = nulls
+        if changed:
+            normalized[name] = sum(changed)
+        columns.append(out)
+    return (df.with_columns(columns) if columns else df), filled, normalized
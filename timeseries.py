@@ -0,0 +1,123 @@
+import numpy as np
+import polars as pl
+
+from dimensions import CONFORMED_DIMENSIONS, LINKED_MEASURES, TREND_DIMENSIONS, dense_totals, dimension_categories
+from tracing import traced
+
+# ============================================
+# SERIES DE TIEMPO POR DEPARTAMENTO Y HECHO
+# ============================================
+# Cada combinación departamento × hecho victimizante de las llegadas es una
+# serie anual. Las sumas salen del arreglo denso por claves de dimensión
+# (dimensions.py), así que la grilla de años es completa: un año sin llegadas
+# vale 0 en lugar de faltar, y las ventanas no se saltan años.
+#
+# Con filtro de años la grilla solo tiene los años que pasan el filtro: un año
+# filtrado no es un año sin llegadas. Si el año anterior quedó fuera, el cambio
+# anual es nulo, y la media móvil también si su ventana toca un año filtrado.
+#
+# Todas las series se calculan a la vez con expresiones de ventana de Polars
+# (.over(serie)) sobre la grilla larga, sin ciclos por serie:
+#
+#   Cambio anual      diferencia y porcentaje frente al año anterior
+#   Media móvil       promedio de los últimos ROLLING_YEARS años
+#   Acumulado         total desde el primer año de la grilla
+#   Puntaje z         desviación del año frente a la media de su serie
+#   Anomalía          |z| >= Z_THRESHOLD
+#
+# Los "focos emergentes" son las series con mayor puntaje z en el último año
+# con datos y que crecieron frente al año anterior. El resultado queda en las
+# secciones, así que se guarda en la caché de resultados junto a los agregados.
+
+ROLLING_YEARS = 3
+Z_THRESHOLD = 2.0
+HOTSPOT_LIMIT = 20
+HOTSPOT_SERIES = 5
+
+SERIES = [CONFORMED_DIMENSIONS["department"], CONFORMED_DIMENSIONS["event"]]
+YEAR = CONFORMED_DIMENSIONS["year"]
+VALUE = LINKED_MEASURES["arrivals"][0]
+
+
+def year_mask(categories: dict, years=None):
+    """Años del diccionario que pasan el filtro de años (todos sin filtro)"""
+    if years is None:
+        return np.ones(len(categories["year"]), dtype=bool)
+    return np.isin(np.array(categories["year"], dtype=object), [str(year) for year in years])
+
+
+def series_frame(cube: np.ndarray, categories: dict, kept: np.ndarray | None = None):
+    """Grilla larga (departamento, hecho, año, valor) de las series con algún registro; nulo en años filtrados"""
+    kept = kept if kept is not None else np.ones(cube.shape[2], dtype=bool)
+    depts, events = np.nonzero(cube[:, :, kept].sum(axis=2))
+    years = len(categories["year"])
+    values = pl.Series(VALUE, cube[depts, events, :].reshape(-1).astype(np.int64))
+    if not kept.all():
+        values = values.scatter(np.flatnonzero(~np.tile(kept, len(depts))), None)
+    return pl.DataFrame([
+        pl.Series(SERIES[0], np.array(categories["department"], dtype=object)[depts].repeat(years), dtype=pl.Utf8),
+        pl.Series(SERIES[1], np.array(categories["event"], dtype=object)[events].repeat(years), dtype=pl.Utf8),
+        pl.Series(YEAR, np.tile(np.array(categories["year"], dtype=np.int64), len(depts))),
+        values,
+    ])
+
+
+def add_trend_columns(frame: pl.DataFrame):
+    """Cambio anual, media móvil, acumulado y puntaje z de todas las series a la vez (años filtrados: nulos)"""
+    value = pl.col(VALUE)
+    previous = value.shift(1)
+    z = (value - value.mean()) / value.std()
+    gaps = value.is_null().cast(pl.UInt32).rolling_sum(ROLLING_YEARS, min_samples=1)
+    return frame.sort(SERIES + [YEAR]).with_columns(
+        (value - previous).over(SERIES).alias("Cambio anual"),
+        pl.when(previous > 0).then((value - previous) / previous * 100).over(SERIES).alias("Cambio anual (%)"),
+        pl.when(gaps == 0).then(value.rolling_mean(ROLLING_YEARS, min_samples=1)).over(SERIES).alias("Media móvil"),
+        value.cum_sum().over(SERIES).alias("Acumulado"),
+        z.over(SERIES).fill_nan(None).alias("Puntaje z"),
+    ).with_columns(
+        (pl.col("Puntaje z").abs() >= Z_THRESHOLD).fill_null(False).alias("Anomalía"),
+    ).filter(value.is_not_null())
+
+
+def emerging_hotspots(latest: pl.DataFrame, limit: int = HOTSPOT_LIMIT):
+    """Series con mayor puntaje z en el último año que además crecieron frente al anterior"""
+    return latest.filter(
+        (pl.col("Cambio anual") > 0) & pl.col("Puntaje z").is_not_null()
+    ).sort(["Puntaje z", VALUE, *SERIES], descending=[True, True, False, False]).head(limit)
+
+
+def trends_summary(arrivals: dict, years=None):
+    """Series, focos emergentes y anomalías a partir de los arreglos de llegadas (years: filtro de años)"""
+    cube = arrivals["arrays"].get(TREND_DIMENSIONS)
+    categories = arrivals.get("categories", {})
+    kept = year_mask(categories, years) if "year" in categories else None
+    if cube is None or kept is None or not cube[:, :, kept].any():
+        return None
+
+    trends = add_trend_columns(series_frame(cube, categories, kept))
+    active_years = np.nonzero(cube.sum(axis=(0, 1)) * kept)[0]
+    last_year = int(categories["year"][active_years[-1]])
+    latest = trends.filter(pl.col(YEAR) == last_year)
+    hotspots = emerging_hotspots(latest)
+
+    # Serie completa de los primeros focos para graficarlos
+    top = hotspots.head(HOTSPOT_SERIES).select(SERIES)
+    return {
+        "last_year": last_year,
+        "series": trends,
+        "latest": latest,
+        "hotspots": hotspots,
+        "hotspot_series": trends.join(top, on=SERIES, how="semi"),
+        "anomalies": int(trends["Anomalía"].sum()),
+        "series_count": trends.shape[0] // int(kept.sum()),
+    }
+
+
+@traced()
+def compute_trends(df_arrivals: pl.DataFrame, years=None):
+    """Series de tiempo por departamento y hecho para un DataFrame de llegadas filtrado (years: filtro de años)"""
+    categories = dimension_categories(df_arrivals)
+    if VALUE not in df_arrivals.columns or not all(dim in categories for dim in TREND_DIMENSIONS):
+        return None
+    cube = dense_totals(df_arrivals, TREND_DIMENSIONS, VALUE, categories)
+    return trends_summary({"categories": categories, "arrays": {TREND_DIMENSIONS: cube}}, years)
@@ -0,0 +1,247 @@
+import argparse
+import contextvars
+import functools
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+import orjson
+
+from startup import lazy_import
+
+# Polars se importa al contar filas de un resultado o al analizar las trazas:
+# abrir la traza del rerun no lo necesita (ver startup.py)
+pl = lazy_import("polars")
+
+# ============================================
+# TRAZAS POR RERUN
+# ============================================
+# Cada rerun del dashboard abre una traza (start_trace) y las funciones
+# instrumentadas abren spans anidados con tiempo de pared, tiempo de CPU y filas.
+# Al cerrar la traza (end_trace) el árbol se escribe como una línea en un JSONL
+# rotativo que se puede agregar entre sesiones:
+#
+#   python tracing.py --log logs/traces.jsonl --top 15
+#
+# Fuera de una traza (reportes, snapshots, scripts) los spans no hacen nada.
+# El tiempo de CPU es el del proceso (time.process_time), así que incluye los
+# hilos de Polars y, con varias sesiones simultáneas, también el de las demás.
+
+TRACE_LOG = os.environ.get("TRACE_LOG", "logs/traces.jsonl")
+TRACE_LOG_BYTES = 5 * 1024 * 1024
+TRACE_LOG_BACKUPS = 5
+
+_current = contextvars.ContextVar("trace_span", default=None)
+_logger = None
+
+
+def _trace_logger():
+    """Logger con rotación por tamaño para las trazas"""
+    global _logger
+    if _logger is None:
+        os.makedirs(os.path.dirname(TRACE_LOG) or ".", exist_ok=True)
+        handler = RotatingFileHandler(TRACE_LOG, maxBytes=TRACE_LOG_BYTES, backupCount=TRACE_LOG_BACKUPS,
+                                      encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _logger = logging.getLogger("dashboard.traces")
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+        _logger.addHandler(handler)
+    return _logger
+
+
+def _new_span(name: str, attrs: dict | None = None):
+    return {"name": name, "wall_ms": 0.0, "cpu_ms": 0.0, "attrs": dict(attrs or {}), "children": [],
+            "_start": (time.perf_counter(), time.process_time())}
+
+
+def _close_span(node: dict):
+    wall, cpu = node.pop("_start")
+    node["wall_ms"] = round((time.perf_counter() - wall) * 1000, 3)
+    node["cpu_ms"] = round((time.process_time() - cpu) * 1000, 3)
+
+
+def count_rows(obj):
+    """Filas de un resultado: DataFrame, tupla/lista de DataFrames o diccionario de ellos"""
+    if isinstance(obj, pl.DataFrame):
+        return obj.height
+    if isinstance(obj, (tuple, list)):
+        counts = [count_rows(o) for o in obj]
+    elif isinstance(obj, dict):
+        counts = [count_rows(o) for o in obj.values()]
+    else:
+        return None
+    counts = [c for c in counts if c is not None]
+    return sum(counts) if counts else None
+
+
+# ============================================
+# API DE INSTRUMENTACIÓN
+# ============================================
+def start_trace(name: str = "rerun", **attrs):
+    """Abre la traza raíz del rerun actual"""
+    root = _new_span(name, attrs)
+    root["trace_id"] = uuid.uuid4().hex[:12]
+    root["ts"] = time.time()
+    _current.set(root)
+    return root
+
+
+def end_trace(root: dict, log: bool = True):
+    """Cierra la traza, la escribe en el JSONL y la devuelve"""
+    _close_span(root)
+    _current.set(None)
+    if log:
+        try:
+            _trace_logger().info(orjson.dumps(root, default=str).decode())
+        except OSError as e:
+            print(f"⚠️ No se pudo escribir la traza: {e}")
+    return root
+
+
+def mark(root: dict, name: str):
+    """Registra un hito del rerun en milisegundos desde el inicio de la traza"""
+    root["attrs"].setdefault("marks", {})[name] = round((time.perf_counter() - root["_start"][0]) * 1000, 3)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Span anidado bajo el span actual; no hace nada si no hay traza activa"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+
+    node = _new_span(name, attrs)
+    parent["children"].append(node)
+    token = _current.set(node)
+    try:
+        yield node
+    finally:
+        _close_span(node)
+        _current.reset(token)
+
+
+def traced(name: str | None = None):
+    """Decorador: envuelve la función en un span con filas de entrada y de salida"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+
+            rows_in = count_rows([a for a in args if isinstance(a, pl.DataFrame)])
+            with span(span_name) as node:
+                result = func(*args, **kwargs)
+                if rows_in is not None:
+                    node["attrs"]["rows_in"] = rows_in
+                rows_out = count_rows(result)
+                if rows_out is not None:
+                    node["attrs"]["rows"] = rows_out
+                return result
+        return wrapper
+    return decorator
+
+
+def flatten_trace(root: dict):
+    """Lista plana de spans (profundidad, ruta, tiempos, filas) para tablas y agregados"""
+    rows = []
+
+    def walk(node, depth, path):
+        path = f"{path}/{node['name']}" if path else node["name"]
+        rows.append({
+            "depth": depth,
+            "span": node["name"],
+            "path": path,
+            "wall_ms": node["wall_ms"],
+            "cpu_ms": node["cpu_ms"],
+            "rows_in": node["attrs"].get("rows_in"),
+            "rows": node["attrs"].get("rows"),
+        })
+        for child in node["children"]:
+            walk(child, depth + 1, path)
+
+    walk(root, 0, "")
+    return rows
+
+
+# ============================================
+# AGREGACIÓN DEL LOG ENTRE SESIONES
+# ============================================
+def read_traces(path: str = TRACE_LOG):
+    """Spans de todas las trazas del log (incluye los archivos rotados)"""
+    files = [p for p in (f"{path}.{i}" for i in range(TRACE_LOG_BACKUPS, 0, -1)) if os.path.exists(p)]
+    if os.path.exists(path):
+        files.append(path)
+
+    records = []
+    for file in files:
+        with open(file, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                root = orjson.loads(line)
+                filters = orjson.dumps(root["attrs"].get("filters")).decode()
+                for row in flatten_trace(root):
+                    records.append({"trace_id": root["trace_id"], "filters": filters, **row})
+
+    return pl.DataFrame(records, infer_schema_length=None) if records else None
+
+
+def slowest_spans(spans: "pl.DataFrame", top: int = 15):
+    """Spans con mayor tiempo de pared acumulado"""
+    return (
+        spans.group_by("path")
+        .agg(
+            pl.len().alias("Llamadas"),
+            pl.col("wall_ms").mean().alias("Pared media (ms)"),
+            pl.col("wall_ms").quantile(0.95).alias("Pared p95 (ms)"),
+            pl.col("cpu_ms").mean().alias("CPU media (ms)"),
+            pl.col("rows_in").mean().alias("Filas entrada"),
+            pl.col("rows").mean().alias("Filas salida"),
+        )
+        .sort("Pared p95 (ms)", descending=True)
+        .head(top)
+    )
+
+
+def slowest_filters(spans: "pl.DataFrame", top: int = 15):
+    """Combinaciones de filtros con reruns más lentos"""
+    return (
+        spans.filter(pl.col("depth") == 0)
+        .group_by("filters")
+        .agg(
+            pl.len().alias("Reruns"),
+            pl.col("wall_ms").mean().alias("Pared media (ms)"),
+            pl.col("wall_ms").max().alias("Pared máx (ms)"),
+        )
+        .sort("Pared media (ms)", descending=True)
+        .head(top)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume las trazas del dashboard")
+    parser.add_argument("--log", default=TRACE_LOG, help="Archivo JSONL de trazas")
+    parser.add_argument("--top", type=int, default=15, help="Filas por tabla")
+    args = parser.parse_args()
+
+    spans = read_traces(args.log)
+    if spans is None:
+        raise Exception(f"No hay trazas en {args.log}")
+
+    with pl.Config(tbl_rows=args.top, fmt_str_lengths=120, tbl_width_chars=200):
+        print("⏱️ Spans más lentos")
+        print(slowest_spans(spans, args.top))
+        print("🔍 Filtros más lentos")
+        print(slowest_filters(spans, args.top))
+    print(f"✅ {spans.filter(pl.col('depth') == 0).height} trazas analizadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,51 @@
 import streamlit as st
 import polars as pl
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
-
-def create_kpi_metrics(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
+from aggregations import (
+    kpi_totals,
+    temporal_summary,
+    geographic_summary,
+    demographic_summary,
+    comparative_summary,
+    minorities_summary,
+    children_summary,
+    critical_summary
+)
+from cohorts import CHILD_CATEGORIES
+from comparison import COMPARE_CHARTS, KPI_LABELS, comparison_frame, dimension_deltas, kpi_deltas
+from cuts import CutMismatch, cut_revisions, list_cuts
+from dimensions import LINKED_MEASURES, compute_linked
+from figures import (AGE_LABELS, comparison_bars, comparison_lines, get_figure, revisions_heatmap, revisions_year_bar,
+                     trend_detail)
+from memory_budget import MemoryPressure
+from paging import detail_columns, page_count, table_page, view_frame
+from profiler import quality_issues, quality_table
+from registry import DATASETS, dataset_label
+from sketches import ERROR_COLUMN
+from sql_console import SQL_ROW_LIMIT, SQL_TIMEOUT, SQLError, run_sql, table_columns
+from timeseries import SERIES, Z_THRESHOLD, compute_trends
+from tracing import flatten_trace, traced
+
+
+def _approximate_note(data: pl.DataFrame | None):
+    """Aviso bajo un top N que salió de un resumen truncado (agregación por porciones)"""
+    if data is not None and ERROR_COLUMN in data.columns:
+        st.caption(f"≈ Top aproximado: cada total puede estar hasta {int(data[ERROR_COLUMN][0]):,} por debajo del real")
+
+
+@traced()
+def create_kpi_metrics(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, sections: dict | None = None):
     """Crea métricas KPI principales en la parte superior del dashboard"""
 
+    kpis = sections["kpis"] if sections is not None else kpi_totals(df_subjects, df_arrivals)
+
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        if "Personas por ocurrencia" in df_subjects.columns:
-            total_victims = int(df_subjects["Personas por ocurrencia"].sum())
+        if "total_victims" in kpis:
             st.metric(
                 label="👥 Total Personas Afectadas",
-                value=f"{total_victims:,}",
+                value=f"{kpis['total_victims']:,}",
                 delta=None,
                 help="Total de personas afectadas por hechos victimizantes"
             )
@@ -23,11 +53,10 @@ def create_kpi_metrics(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
             st.metric("👥 Total Personas Afectadas", "N/A")
 
     with col2:
-        if "Personas que llegaron" in df_arrivals.columns:
-            total_displaced = int(df_arrivals["Personas que llegaron"].sum())
+        if "total_displaced" in kpis:
             st.metric(
                 label="🚶 Personas Desplazadas",
-                value=f"{total_displaced:,}",
+                value=f"{kpis['total_displaced']:,}",
                 delta=None,
                 help="Total de personas que tuvieron que desplazarse"
             )
@@ -35,11 +64,10 @@ def create_kpi_metrics(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
             st.metric("🚶 Personas Desplazadas", "N/A")
 
     with col3:
-        if "Eventos" in df_arrivals.columns:
-            total_events = int(df_arrivals["Eventos"].sum())
+        if "total_events" in kpis:
             st.metric(
                 label="⚠️ Eventos Registrados",
-                value=f"{total_events:,}",
+                value=f"{kpis['total_events']:,}",
                 delta=None,
                 help="Número total de eventos de desplazamiento"
             )
@@ -47,11 +75,10 @@ def create_kpi_metrics(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
             st.metric("⚠️ Eventos Registrados", "N/A")
 
     with col4:
-        if "ESTADO_DEPTO" in df_arrivals.columns:
-            unique_depts = df_arrivals["ESTADO_DEPTO"].n_unique()
+        if "unique_depts" in kpis:
             st.metric(
                 label="🗺️ Departamentos Afectados",
-                value=f"{unique_depts}",
+                value=f"{kpis['unique_depts']}",
                 delta=None,
                 help="Número de departamentos con llegadas registradas"
             )
@@ -59,92 +86,98 @@ def create_kpi_metrics(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
             st.metric("🗺️ Departamentos Afectados", "N/A")
 
 
-def create_temporal_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str):
+@traced()
+def create_temporal_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str,
+                             sections: dict | None = None, figures: dict | None = None):
     """Análisis de tendencias temporales"""
 
+    sections = sections if sections is not None else {"temporal": temporal_summary(df_arrivals)}
+
     col1, col2 = st.columns(2)
 
     with col1:
-        if "Vigencia" in df_arrivals.columns and "Personas que llegaron" in df_arrivals.columns:
-            yearly_data = df_arrivals.group_by("Vigencia").agg([
-                pl.col("Personas que llegaron").sum().alias("Personas Desplazadas"),
-                pl.col("Eventos").sum().alias("Eventos")
-            ]).sort("Vigencia")
-
-            fig = go.Figure()
-
-            fig.add_trace(go.Scatter(
-                x=yearly_data["Vigencia"].to_list(),
-                y=yearly_data["Personas Desplazadas"].to_list(),
-                mode='lines+markers',
-                name='Personas Desplazadas',
-                line=dict(color='#e74c3c', width=3),
-                marker=dict(size=8)
-            ))
-
-            fig.update_layout(
-                title="Evolución Temporal del Desplazamiento Forzado",
-                xaxis_title="Año",
-                yaxis_title="Número de Personas",
-                template=theme,
-                height=400,
-                hovermode='x unified'
-            )
-
+        fig = get_figure("temporal_line", sections, theme, figures)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No hay datos temporales disponibles")
 
     with col2:
-        if "Vigencia" in df_arrivals.columns and "Eventos" in df_arrivals.columns:
-            yearly_events = df_arrivals.group_by("Vigencia").agg([
-                pl.col("Eventos").sum().alias("Total Eventos")
-            ]).sort("Vigencia")
-
-            fig = px.bar(
-                yearly_events.to_pandas(),
-                x="Vigencia",
-                y="Total Eventos",
-                title="Eventos de Desplazamiento por Año",
-                labels={"Total Eventos": "Número de Eventos", "Vigencia": "Año"},
-                color="Total Eventos",
-                color_continuous_scale="Reds",
-                template=theme
-            )
-
-            fig.update_layout(height=400)
+        fig = get_figure("temporal_events_bar", sections, theme, figures)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No hay datos de eventos disponibles")
 
 
-def create_geographic_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str):
+@traced()
+def create_trends_analysis(df_arrivals: pl.DataFrame, theme: str,
+                           sections: dict | None = None, figures: dict | None = None):
+    """Cambio anual, media móvil, acumulado y anomalías por departamento y hecho; focos emergentes"""
+
+    # Los snapshots generados antes de esta sección no la traen
+    if sections is None or "trends" not in sections:
+        sections = {"trends": compute_trends(df_arrivals)}
+    trends = sections["trends"]
+
+    if trends is None:
+        st.info("Se necesitan llegadas con departamento, hecho y año para calcular las series")
+        return
+
+    hotspots = trends["hotspots"]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Series departamento × hecho", f"{trends['series_count']:,}")
+    col2.metric("Último año con datos", f"{trends['last_year']}")
+    col3.metric("Años anómalos", f"{trends['anomalies']:,}", help=f"Años con |puntaje z| ≥ {Z_THRESHOLD:g} en su serie")
+    col4.metric("Focos emergentes", f"{trends['latest'].filter(pl.col('Anomalía') & (pl.col('Cambio anual') > 0)).shape[0]:,}",
+                help="Series que crecieron en el último año con |puntaje z| por encima del umbral")
+
+    fig = get_figure("trends_zscore_heatmap", sections, theme, figures)
+    if fig is not None:
+        st.plotly_chart(fig, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        fig = get_figure("trends_hotspots_bar", sections, theme, figures)
+        if fig is not None:
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info(f"Ninguna serie creció en {trends['last_year']}")
+
+    with col2:
+        fig = get_figure("trends_series_lines", sections, theme, figures)
+        if fig is not None:
+            st.plotly_chart(fig, use_container_width=True)
+
+    # Detalle de cualquier serie, tomado de las series ya calculadas
+    series = trends["series"]
+    options = trends["latest"].sort("Acumulado", descending=True).select(SERIES).rows()
+    choice = st.selectbox("Ver serie", options, format_func=lambda row: f"{row[0]} · {row[1]}",
+                          key="trend_series")
+    if choice is not None:
+        detail = series.filter((pl.col(SERIES[0]) == choice[0]) & (pl.col(SERIES[1]) == choice[1]))
+        st.plotly_chart(trend_detail(detail, theme), use_container_width=True)
+
+    if hotspots.shape[0] > 0:
+        st.dataframe(hotspots.to_pandas(), use_container_width=True, hide_index=True)
+
+
+@traced()
+def create_geographic_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str,
+                               sections: dict | None = None, figures: dict | None = None):
     """Análisis de distribución geográfica"""
 
-    if "ESTADO_DEPTO" in df_arrivals.columns:
-        dept_summary = df_arrivals.group_by("ESTADO_DEPTO").agg([
-            pl.col("Personas que llegaron").sum().alias("Personas Desplazadas"),
-            pl.col("Eventos").sum().alias("Eventos"),
-            pl.col("Personas por ocurrencia").sum().alias("Personas Afectadas")
-        ]).sort("Personas Desplazadas", descending=True).head(10)
+    sections = sections if sections is not None else {"geographic": geographic_summary(df_arrivals)}
+    dept_summary = sections["geographic"]
 
+    if dept_summary is not None:
         col1, col2 = st.columns([2, 1])
 
         with col1:
-            fig = px.bar(
-                dept_summary.to_pandas(),
-                y="ESTADO_DEPTO",
-                x="Personas Desplazadas",
-                orientation='h',
-                title="Top 10 Departamentos con Mayor Recepción de Desplazados",
-                labels={"ESTADO_DEPTO": "Departamento", "Personas Desplazadas": "Número de Personas"},
-                color="Personas Desplazadas",
-                color_continuous_scale="RdYlBu_r",
-                template=theme
-            )
-
-            fig.update_layout(height=500, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+            fig = get_figure("geographic_bar", sections, theme, figures)
+            if fig is not None:
+                st.plotly_chart(fig, use_container_width=True)
 
         with col2:
             st.markdown("##### Resumen por Departamento")
@@ -161,130 +194,65 @@ def create_geographic_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFr
         st.warning("No hay datos geográficos disponibles")
 
 
-def create_demographic_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str):
+@traced()
+def create_demographic_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str,
+                                sections: dict | None = None, figures: dict | None = None):
     """Análisis demográfico de las víctimas"""
 
+    sections = sections if sections is not None else {"demographic": demographic_summary(df_subjects)}
+
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        if "Etnia" in df_subjects.columns and "Personas por ocurrencia" in df_subjects.columns:
-            etnia_summary = df_subjects.group_by("Etnia").agg(
-                pl.col("Personas por ocurrencia").sum().alias("Total")
-            ).sort("Total", descending=True)
-
-            fig = px.pie(
-                etnia_summary.to_pandas(),
-                values="Total",
-                names="Etnia",
-                title="Distribución por Etnia (Todas las Categorías)",
-                hole=0.4,
-                template=theme,
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            fig.update_layout(height=400)
+        fig = get_figure("etnia_pie", sections, theme, figures)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No hay datos de etnia")
 
     with col2:
-        if "Ciclo vital" in df_subjects.columns and "Personas por ocurrencia" in df_subjects.columns:
-            ciclo_summary = df_subjects.group_by("Ciclo vital").agg(
-                pl.col("Personas por ocurrencia").sum().alias("Total")
-            ).sort("Total", descending=True)
-
-            fig = px.bar(
-                ciclo_summary.to_pandas(),
-                x="Ciclo vital",
-                y="Total",
-                title="Distribución por Ciclo Vital",
-                labels={"Total": "Número de Personas", "Ciclo vital": "Grupo de Edad"},
-                color="Total",
-                color_continuous_scale="Blues",
-                template=theme
-            )
-
-            fig.update_layout(height=400, showlegend=False)
-            fig.update_xaxes(tickangle=-45)
+        fig = get_figure("ciclo_vital_bar", sections, theme, figures)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No hay datos de ciclo vital")
 
     with col3:
-        if "Sexo" in df_subjects.columns and "Personas por ocurrencia" in df_subjects.columns:
-            sexo_summary = df_subjects.group_by("Sexo").agg(
-                pl.col("Personas por ocurrencia").sum().alias("Total")
-            )
-
-            fig = go.Figure(data=[go.Pie(
-                labels=sexo_summary["Sexo"].to_list(),
-                values=sexo_summary["Total"].to_list(),
-                hole=0.5,
-                marker_colors=['#3498db', '#e74c3c', '#95a5a6']
-            )])
-
-            fig.update_layout(
-                title="Distribución por Sexo",
-                template=theme,
-                height=400
-            )
-
+        fig = get_figure("sexo_pie", sections, theme, figures)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No hay datos de sexo")
 
 
-def create_comparative_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str):
+@traced()
+def create_comparative_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str,
+                                sections: dict | None = None, figures: dict | None = None):
     """Análisis comparativo entre diferentes categorías"""
 
+    sections = sections if sections is not None else {"comparative": comparative_summary(df_subjects)}
+
     col1, col2 = st.columns(2)
 
     with col1:
-        if "Tipo o Nombre de Hecho Victimizante" in df_subjects.columns:
-            hecho_summary = df_subjects.group_by("Tipo o Nombre de Hecho Victimizante").agg(
-                pl.col("Personas por ocurrencia").sum().alias("Total Víctimas")
-            ).sort("Total Víctimas", descending=True).head(8)
-
-            fig = px.treemap(
-                hecho_summary.to_pandas(),
-                path=["Tipo o Nombre de Hecho Victimizante"],
-                values="Total Víctimas",
-                title="Distribución de Hechos Victimizantes (Treemap)",
-                color="Total Víctimas",
-                color_continuous_scale="RdYlGn_r",
-                template=theme
-            )
-
-            fig.update_layout(height=500)
+        fig = get_figure("hecho_treemap", sections, theme, figures)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
+            _approximate_note(sections["comparative"]["hecho"])
         else:
             st.info("No hay datos de hechos victimizantes")
 
     with col2:
-        if "Discapacidad" in df_subjects.columns and "Personas por ocurrencia" in df_subjects.columns:
-            discap_summary = df_subjects.group_by("Discapacidad").agg(
-                pl.col("Personas por ocurrencia").sum().alias("Total")
-            )
-
-            fig = px.bar(
-                discap_summary.to_pandas(),
-                x="Discapacidad",
-                y="Total",
-                title="Víctimas con y sin Discapacidad",
-                labels={"Total": "Número de Personas", "Discapacidad": "Estado"},
-                color="Discapacidad",
-                template=theme,
-                color_discrete_map={"NO": "#2ecc71", "SI": "#e67e22"}
-            )
-
-            fig.update_layout(height=500, showlegend=True)
+        fig = get_figure("discapacidad_bar", sections, theme, figures)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No hay datos de discapacidad")
 
 
-def create_minorities_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str):
+@traced()
+def create_minorities_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str,
+                               sections: dict | None = None, figures: dict | None = None):
     """Análisis específico de minorías étnicas y grupos vulnerables - EXCLUYE 'Ninguna'"""
 
     # REEMPLAZAR HTML CON COMPONENTE NATIVO
@@ -294,45 +262,26 @@ el desplazamiento forzado en Colombia. Este análisis **EXCLUYE la categoría "N
 pertenencia étnica específica) para visibilizar el impacto desproporcionado en comunidades étnicas.
     """)
 
-    if "Etnia" not in df_subjects.columns or "Personas por ocurrencia" not in df_subjects.columns:
+    sections = sections if sections is not None else {"minorities": minorities_summary(df_subjects)}
+    minorities = sections["minorities"]
+
+    if minorities is None:
         st.warning("No hay datos de etnia disponibles para este análisis")
         return
 
-    minorities_only = df_subjects.filter(
-        ~pl.col("Etnia").str.to_lowercase().is_in(["ninguna", "no informa", "sin información", "no especificado", "nd"])
-    )
+    etnia_detailed = minorities["by_etnia"]
 
-    if minorities_only.shape[0] == 0:
+    if etnia_detailed.shape[0] == 0:
         st.warning("No se encontraron registros de minorías étnicas en el dataset")
         return
 
-    etnia_detailed = minorities_only.group_by("Etnia").agg([
-        pl.col("Personas por ocurrencia").sum().alias("Total Víctimas"),
-        pl.col("Personas sujetas a atención").sum().alias("Personas Requieren Atención"),
-        pl.count().alias("Número de Eventos")
-    ]).sort("Total Víctimas", descending=True)
-
-    total_minorities = etnia_detailed["Total Víctimas"].sum()
-    total_all_victims = int(df_subjects["Personas por ocurrencia"].sum())
+    total_minorities = minorities["total_minorities"]
+    total_all_victims = minorities["total_all_victims"]
 
     col1, col2 = st.columns([2, 1])
 
     with col1:
-        fig = px.bar(
-            etnia_detailed.to_pandas(),
-            x="Etnia",
-            y="Total Víctimas",
-            title="Impacto del Desplazamiento en Minorías Étnicas (Excluye 'Ninguna')",
-            labels={"Total Víctimas": "Número de Víctimas", "Etnia": "Grupo Étnico"},
-            color="Total Víctimas",
-            color_continuous_scale="Reds",
-            template=theme,
-            text="Total Víctimas"
-        )
-
-        fig.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
-        fig.update_layout(height=500, showlegend=False)
-        fig.update_xaxes(tickangle=-45)
+        fig = get_figure("minorities_bar", sections, theme, figures)
         st.plotly_chart(fig, use_container_width=True)
 
         st.markdown("##### 📊 Distribución Proporcional de Minorías Étnicas")
@@ -382,9 +331,7 @@ pertenencia étnica específica) para visibilizar el impacto desproporcionado en
             help="Número de minorías étnicas diferentes afectadas"
         )
 
-        ninguna_count = df_subjects.filter(
-            pl.col("Etnia").str.to_lowercase() == "ninguna"
-        )["Personas por ocurrencia"].sum()
+        ninguna_count = minorities["ninguna_count"]
 
         st.markdown("---")
         st.markdown("##### 📈 Contexto Comparativo")
@@ -399,28 +346,15 @@ pertenencia étnica específica) para visibilizar el impacto desproporcionado en
     st.markdown("---")
     st.markdown("#### 🔍 Hechos Victimizantes en Comunidades Étnicas")
 
-    if "Tipo o Nombre de Hecho Victimizante" in minorities_only.columns:
-        hecho_minorities = minorities_only.group_by("Tipo o Nombre de Hecho Victimizante").agg(
-            pl.col("Personas por ocurrencia").sum().alias("Total Víctimas")
-        ).sort("Total Víctimas", descending=True).head(10)
-
-        fig = px.bar(
-            hecho_minorities.to_pandas(),
-            y="Tipo o Nombre de Hecho Victimizante",
-            x="Total Víctimas",
-            orientation='h',
-            title="Top 10 Hechos Victimizantes en Minorías Étnicas (Excluye 'Ninguna')",
-            labels={"Total Víctimas": "Número de Víctimas"},
-            color="Total Víctimas",
-            color_continuous_scale="YlOrRd",
-            template=theme
-        )
-
-        fig.update_layout(height=400, showlegend=False)
+    fig = get_figure("minorities_hecho_bar", sections, theme, figures)
+    if fig is not None:
         st.plotly_chart(fig, use_container_width=True)
+        _approximate_note(minorities["by_hecho"])
 
 
-def create_children_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str):
+@traced()
+def create_children_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str,
+                             sections: dict | None = None, figures: dict | None = None):
     """Análisis específico de menores de edad"""
 
     # REEMPLAZAR HTML CON COMPONENTE NATIVO
@@ -430,25 +364,23 @@ El desplazamiento infantil tiene consecuencias devastadoras en desarrollo, educa
 **La explotación sexual y laboral de menores es una consecuencia directa del conflicto armado.**
     """)
 
-    if "Ciclo vital" not in df_subjects.columns:
+    sections = sections if sections is not None else {"children": children_summary(df_subjects)}
+    children = sections["children"]
+
+    if children is None:
         st.warning("No hay datos de ciclo vital disponibles")
         return
 
-    child_categories = ['entre 0 y 5', 'entre 6 y 11', 'entre 12 y 17']
-
-    children_df = df_subjects.filter(
-        pl.col("Ciclo vital").is_in(child_categories)
-    )
-
-    if children_df.shape[0] == 0:
-        st.error(f"⚠️ No se encontraron registros de menores usando las categorías: {child_categories}")
+    if children["children_events"] == 0:
+        st.error(f"⚠️ No se encontraron registros de menores usando las categorías: {CHILD_CATEGORIES}")
         return
 
+    total_children = children["total_children"]
+
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        total_children = int(children_df["Personas por ocurrencia"].sum())
-        total_victims = int(df_subjects["Personas por ocurrencia"].sum())
+        total_victims = children["total_victims"]
         pct_children = (total_children / total_victims * 100)
 
         st.metric(
@@ -459,7 +391,7 @@ El desplazamiento infantil tiene consecuencias devastadoras en desarrollo, educa
         )
 
     with col2:
-        children_events = int(children_df.shape[0])
+        children_events = children["children_events"]
         st.metric(
             "📋 Eventos con Menores",
             f"{children_events:,}",
@@ -467,20 +399,18 @@ El desplazamiento infantil tiene consecuencias devastadoras en desarrollo, educa
         )
 
     with col3:
-        if "Sexo" in children_df.columns:
-            girls = children_df.filter(pl.col("Sexo") == "MUJER")["Personas por ocurrencia"].sum()
+        if "girls" in children:
             st.metric(
                 "👧 Niñas Afectadas",
-                f"{int(girls):,}",
+                f"{children['girls']:,}",
                 help="Niñas y adolescentes mujeres en especial riesgo de violencia sexual"
             )
 
     with col4:
-        if "Sexo" in children_df.columns:
-            boys = children_df.filter(pl.col("Sexo") == "HOMBRE")["Personas por ocurrencia"].sum()
+        if "boys" in children:
             st.metric(
                 "👦 Niños Afectados",
-                f"{int(boys):,}",
+                f"{children['boys']:,}",
                 help="Niños y adolescentes varones en riesgo de reclutamiento forzado"
             )
 
@@ -490,35 +420,12 @@ El desplazamiento infantil tiene consecuencias devastadoras en desarrollo, educa
     col1, col2 = st.columns(2)
 
     with col1:
-        age_distribution = children_df.group_by("Ciclo vital").agg(
-            pl.col("Personas por ocurrencia").sum().alias("Total Víctimas")
-        ).sort("Ciclo vital")
-
-        age_labels = {
-            'entre 0 y 5': 'Primera Infancia (0-5 años)',
-            'entre 6 y 11': 'Infancia (6-11 años)',
-            'entre 12 y 17': 'Adolescencia (12-17 años)'
-        }
-
-        age_dist_df = age_distribution.to_pandas()
-        age_dist_df['Etiqueta'] = age_dist_df['Ciclo vital'].map(age_labels)
-
-        fig = px.pie(
-            age_dist_df,
-            values="Total Víctimas",
-            names="Etiqueta",
-            title="Distribución de Menores Víctimas por Grupo de Edad",
-            hole=0.4,
-            template=theme,
-            color_discrete_sequence=px.colors.sequential.Reds_r
-        )
-
-        fig.update_traces(textposition='inside', textinfo='percent+label')
-        fig.update_layout(height=400)
+        fig = get_figure("children_age_pie", sections, theme, figures)
         st.plotly_chart(fig, use_container_width=True)
 
     with col2:
-        age_detailed = age_dist_df.copy()
+        age_detailed = children["by_age"].to_pandas()
+        age_detailed['Etiqueta'] = age_detailed['Ciclo vital'].map(AGE_LABELS)
         age_detailed['Porcentaje'] = (age_detailed['Total Víctimas'] / total_children * 100).round(2)
         age_detailed = age_detailed[['Etiqueta', 'Total Víctimas', 'Porcentaje']]
 
@@ -540,34 +447,12 @@ El desplazamiento infantil tiene consecuencias devastadoras en desarrollo, educa
     st.markdown("---")
     st.markdown("#### 🚨 Hechos Victimizantes contra Menores de Edad")
 
-    if "Tipo o Nombre de Hecho Victimizante" in children_df.columns:
-        hecho_children = children_df.group_by("Tipo o Nombre de Hecho Victimizante").agg(
-            pl.col("Personas por ocurrencia").sum().alias("Total Víctimas")
-        ).sort("Total Víctimas", descending=True).head(10)
-
-        fig = px.bar(
-            hecho_children.to_pandas(),
-            y="Tipo o Nombre de Hecho Victimizante",
-            x="Total Víctimas",
-            orientation='h',
-            title="Top 10 Crímenes contra Menores de Edad",
-            labels={"Total Víctimas": "Número de Menores Afectados"},
-            color="Total Víctimas",
-            color_continuous_scale="Reds",
-            template=theme,
-            text="Total Víctimas"
-        )
-
-        fig.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
-        fig.update_layout(height=500, showlegend=False)
+    fig = get_figure("children_hecho_bar", sections, theme, figures)
+    if fig is not None:
         st.plotly_chart(fig, use_container_width=True)
 
         st.markdown("##### 📋 Detalle Completo de Hechos Victimizantes")
-        hecho_children_full = children_df.group_by("Tipo o Nombre de Hecho Victimizante").agg(
-            pl.col("Personas por ocurrencia").sum().alias("Total Menores Víctimas")
-        ).sort("Total Menores Víctimas", descending=True)
-
-        hecho_full_df = hecho_children_full.to_pandas()
+        hecho_full_df = children["by_hecho_full"].to_pandas()
         hecho_full_df['Porcentaje del Total'] = (hecho_full_df['Total Menores Víctimas'] / total_children * 100).round(
             2)
 
@@ -596,28 +481,14 @@ El desplazamiento infantil tiene consecuencias devastadoras en desarrollo, educa
 📞 **Es imperativo fortalecer los mecanismos de protección infantil y atención psicosocial especializada.**
     """)
 
-    if "Sexo" in children_df.columns:
+    if children["by_sexo"] is not None:
         st.markdown("---")
         st.markdown("#### ⚖️ Análisis de Género en Población Menor")
 
         col1, col2 = st.columns(2)
 
         with col1:
-            gender_children = children_df.group_by("Sexo").agg(
-                pl.col("Personas por ocurrencia").sum().alias("Total")
-            )
-
-            fig = px.pie(
-                gender_children.to_pandas(),
-                values="Total",
-                names="Sexo",
-                title="Distribución por Sexo en Menores Víctimas",
-                hole=0.5,
-                template=theme,
-                color_discrete_map={"MUJER": "#e74c3c", "HOMBRE": "#3498db", "NO INFORMA": "#95a5a6"}
-            )
-
-            fig.update_layout(height=350)
+            fig = get_figure("children_gender_pie", sections, theme, figures)
             st.plotly_chart(fig, use_container_width=True)
 
         with col2:
@@ -637,38 +508,15 @@ El desplazamiento infantil tiene consecuencias devastadoras en desarrollo, educa
 - Uso en actividades ilícitas
             """)
 
-    if "Etnia" in children_df.columns:
+    if children["by_etnia"] is not None:
         st.markdown("---")
         st.markdown("#### 🌍 Menores de Minorías Étnicas Afectados")
 
-        children_minorities = children_df.filter(
-            ~pl.col("Etnia").str.to_lowercase().is_in(
-                ["ninguna", "no informa", "sin información", "no especificado", "nd"])
-        )
-
-        if children_minorities.shape[0] > 0:
-            etnia_children = children_minorities.group_by("Etnia").agg(
-                pl.col("Personas por ocurrencia").sum().alias("Total Menores")
-            ).sort("Total Menores", descending=True).head(8)
-
-            fig = px.bar(
-                etnia_children.to_pandas(),
-                x="Etnia",
-                y="Total Menores",
-                title="Menores de Minorías Étnicas Víctimas (Top 8, Excluye 'Ninguna')",
-                labels={"Total Menores": "Número de Menores", "Etnia": "Grupo Étnico"},
-                color="Total Menores",
-                color_continuous_scale="OrRd",
-                template=theme,
-                text="Total Menores"
-            )
-
-            fig.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
-            fig.update_layout(height=400, showlegend=False)
-            fig.update_xaxes(tickangle=-45)
+        fig = get_figure("children_etnia_bar", sections, theme, figures)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
 
-            total_minority_children = int(children_minorities["Personas por ocurrencia"].sum())
+            total_minority_children = children["total_minority_children"]
             pct_minority_children = (total_minority_children / total_children * 100)
 
             st.warning(f"""
@@ -679,43 +527,88 @@ enfrentan doble vulnerabilidad por su edad y su pertenencia a comunidades histó
         else:
             st.info("No se encontraron datos de menores en minorías étnicas")
 
-    if "Vigencia" in children_df.columns:
+    if children["yearly"] is not None:
         st.markdown("---")
         st.markdown("#### 📅 Evolución Temporal de Menores Afectados")
 
-        temporal_children = children_df.group_by("Vigencia").agg(
-            pl.col("Personas por ocurrencia").sum().alias("Menores Afectados")
-        ).sort("Vigencia")
-
-        if temporal_children.shape[0] > 0:
-            fig = go.Figure()
-
-            fig.add_trace(go.Scatter(
-                x=temporal_children["Vigencia"].to_list(),
-                y=temporal_children["Menores Afectados"].to_list(),
-                mode='lines+markers',
-                name='Menores Afectados',
-                line=dict(color='#e74c3c', width=3),
-                marker=dict(size=8),
-                fill='tozeroy',
-                fillcolor='rgba(231, 76, 60, 0.1)'
-            ))
+        fig = get_figure("children_trend", sections, theme, figures)
+        if fig is not None:
+            st.plotly_chart(fig, use_container_width=True)
 
-            fig.update_layout(
-                title="Tendencia de Menores Afectados por Año",
-                xaxis_title="Año",
-                yaxis_title="Número de Menores",
-                template=theme,
-                height=400,
-                hovermode='x unified'
-            )
 
+@traced()
+def create_linked_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, theme: str,
+                           sections: dict | None = None, figures: dict | None = None):
+    """Métricas que cruzan víctimas registradas y llegadas por año, hecho y región"""
+
+    # Los snapshots generados antes de esta sección no la traen
+    if sections is None or "linked" not in sections:
+        sections = {"linked": compute_linked(df_subjects, df_arrivals)}
+    linked = sections["linked"]
+
+    col1, col2, col3 = st.columns(3)
+    ratio = linked["arrivals_per_victim"]
+    col1.metric("Llegadas por víctima registrada", f"{ratio:.2f}" if ratio is not None else "N/A",
+                help="Personas que llegaron / personas afectadas en víctimas, en los mismos años")
+    if linked["by_year"] is not None and linked["by_year"].shape[0] > 0:
+        peak = linked["by_year"].drop_nulls("Llegadas por víctima").sort("Llegadas por víctima", descending=True)
+        if peak.shape[0] > 0:
+            col2.metric("Año con más llegadas por víctima", f"{peak['Vigencia'][0]}",
+                        f"{peak['Llegadas por víctima'][0]:.2f}", delta_color="off")
+    if linked["by_event"] is not None and linked["by_event"].shape[0] > 0:
+        peak = linked["by_event"].drop_nulls("Llegadas por víctima").sort("Llegadas por víctima", descending=True)
+        if peak.shape[0] > 0:
+            col3.metric("Hecho con más llegadas por víctima", peak["Tipo o Nombre de Hecho Victimizante"][0],
+                        f"{peak['Llegadas por víctima'][0]:.2f}", delta_color="off")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        fig = get_figure("linked_year_ratio", sections, theme, figures)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No hay años con víctimas y llegadas a la vez")
+
+    with col2:
+        fig = get_figure("linked_event_bar", sections, theme, figures)
+        if fig is not None:
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No hay hechos con víctimas y llegadas a la vez")
 
+    fig = get_figure("linked_region_heatmap", sections, theme, figures)
+    if fig is not None:
+        st.plotly_chart(fig, use_container_width=True)
 
-def create_critical_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
+    if linked["by_department"] is None:
+        st.caption("ℹ️ El dataset de víctimas no trae departamento, así que no hay razón de llegadas por "
+                   "víctima por departamento; la matriz por región compara las llegadas de cada departamento "
+                   "con las víctimas nacionales del mismo hecho.")
+
+
+def create_quality_profile(profile: dict):
+    """Métricas y tabla por columna del perfil de calidad de cada dataset"""
+    tabs = st.tabs([dataset_label(dataset) for dataset in profile])
+    for tab, data in zip(tabs, profile.values()):
+        columns = data["columns"].values()
+        with tab:
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Registros", f"{data['rows']:,}")
+            col2.metric("Rellenados con \"No especificado\"", f"{sum(c['rellenados'] for c in columns):,}")
+            col3.metric("Valores descartados al cargar", f"{sum(c['descartados'] for c in columns):,}",
+                        help="Valores que no se pudieron convertir al tipo de la columna y quedaron nulos")
+            col4.metric("Valores atípicos (IQR)", f"{sum(c.get('atipicos', 0) for c in columns):,}")
+            st.dataframe(quality_table(data).to_pandas(), use_container_width=True, hide_index=True)
+
+
+@traced()
+def create_critical_analysis(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame, sections: dict | None = None,
+                             profile: dict | None = None):
     """Análisis crítico y conclusiones sobre la calidad de los datos y hallazgos"""
 
+    critical = sections["critical"] if sections is not None else critical_summary(df_arrivals)
+
     # REEMPLAZAR HTML CON COMPONENTE NATIVO
     st.info("""
 **📊 Análisis Crítico de los Datos**
@@ -729,18 +622,14 @@ y propone conclusiones basadas en los patrones identificados.
     with col1:
         st.markdown("### 🔍 Problemas de Calidad de Datos")
 
-        if "ESTADO_DEPTO" in df_arrivals.columns:
-            undefined_dept = df_arrivals.filter(
-                pl.col("ESTADO_DEPTO").str.to_lowercase().is_in(
-                    ["sin definir", "no informa", "sin información", "no especificado"])
-            )
-            total_arrivals = df_arrivals.shape[0]
-            undefined_count = undefined_dept.shape[0]
+        if "undefined_count" in critical:
+            total_arrivals = critical["total_arrivals"]
+            undefined_count = critical["undefined_count"]
             undefined_pct = (undefined_count / total_arrivals * 100) if total_arrivals > 0 else 0
 
-            if "Personas que llegaron" in undefined_dept.columns:
-                undefined_people = int(undefined_dept["Personas que llegaron"].sum())
-                total_people = int(df_arrivals["Personas que llegaron"].sum())
+            if "undefined_people" in critical:
+                undefined_people = critical["undefined_people"]
+                total_people = critical["total_people"]
                 undefined_people_pct = (undefined_people / total_people * 100) if total_people > 0 else 0
 
                 st.warning(f"""
@@ -752,6 +641,14 @@ y propone conclusiones basadas en los patrones identificados.
 **Implicación:** Dificulta la focalización de recursos y atención humanitaria.
                 """)
 
+        if profile is not None:
+            lines = []
+            for dataset, data in profile.items():
+                for column, rate in quality_issues(data):
+                    lines.append(f"- **{column}** ({dataset_label(dataset)}): {rate:.1f}% sin especificar o nulo")
+            if lines:
+                st.warning("**🧾 Columnas con Información Faltante**\n\n" + "\n".join(lines))
+
         st.error("""
 **🕵️ Perpetradores No Identificados**
 
@@ -765,10 +662,9 @@ Una gran proporción de casos **no identifica al grupo armado responsable**:
 **Conclusión:** Se requiere mejorar los protocolos de recolección de información sobre perpetradores.
         """)
 
-        if "Vigencia" in df_arrivals.columns:
-            years_available = sorted(df_arrivals["Vigencia"].unique().to_list())
-            min_year = min(years_available) if years_available else "N/A"
-            max_year = max(years_available) if years_available else "N/A"
+        if "min_year" in critical:
+            min_year = critical["min_year"] if critical["min_year"] is not None else "N/A"
+            max_year = critical["max_year"] if critical["max_year"] is not None else "N/A"
 
             st.info(f"""
 **📅 Cobertura Temporal**
@@ -824,6 +720,12 @@ Los datos históricos muestran la persistencia del conflicto a lo largo de déca
 📞 **Urgencia:** Se requiere fortalecer protección infantil, atención psicosocial, y persecución penal de explotadores.
         """)
 
+    if profile is not None:
+        st.markdown("---")
+        st.markdown("### 🧪 Perfil de Calidad de los Datos")
+        st.caption("Calculado al cargar la versión actual de los datos, sobre los datasets completos (sin filtros)")
+        create_quality_profile(profile)
+
     st.markdown("---")
     st.markdown("### 📋 Recomendaciones de Política Pública")
 
@@ -867,85 +769,297 @@ una persona con historia, dignidad y derechos que deben ser garantizados.
     """)
 
 
-def create_detailed_tables(df_subjects: pl.DataFrame, df_arrivals: pl.DataFrame):
-    """Muestra tablas detalladas con paginación"""
+@traced()
+def create_revisions(theme: str):
+    """Revisiones entre dos cortes del RUV guardados (por año, departamento y grupo)"""
+    datasets = [name for name in DATASETS if len(list_cuts(name)) >= 2]
+    if not datasets:
+        st.info("ℹ️ Se necesitan al menos dos cortes cargados para ver las revisiones; cada corte se guarda "
+                "al cargar los datos.")
+        return
 
-    tab1, tab2 = st.tabs(["📋 Hechos Victimizantes", "📍 Llegadas"])
+    col1, col2, col3 = st.columns(3)
+    dataset = col1.selectbox("Dataset:", datasets, index=len(datasets) - 1, format_func=dataset_label,
+                             key="revisions_dataset")
+    cuts = list_cuts(dataset)
+    old = col2.selectbox("Corte anterior:", cuts[:-1], index=len(cuts) - 2, key="revisions_old")
+    newer = [cut for cut in cuts if cut > old]
+    new = col3.selectbox("Corte nuevo:", newer, index=len(newer) - 1, key="revisions_new")
+
+    try:
+        revisions = cut_revisions(dataset, old, new)
+    except CutMismatch as e:
+        st.warning(f"⚠️ {e}")
+        return
+    measure = LINKED_MEASURES.get(dataset, (None,))[0]
+    if measure not in revisions["measures"]:
+        measure = revisions["measures"][0]
 
-    with tab1:
-        st.markdown("##### Tabla Detallada: Víctimas por Hecho Victimizante")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Años con cambios", f"{len(revisions['changed_partitions'])} de {revisions['partitions']}",
+                help="Solo se comparan los años cuyo contenido cambió entre los dos cortes")
+    col2.metric("Grupos revisados", f"{revisions['revised_groups']:,}")
+    col3.metric(f"Cambio neto en {measure.lower()}", f"{revisions['totals'][measure]:+,}")
 
-        rows_per_page = 50
-        total_rows = df_subjects.shape[0]
-        total_pages = max((total_rows + rows_per_page - 1) // rows_per_page, 1)
-
-        page = st.number_input(
-            "Página:",
-            min_value=1,
-            max_value=total_pages,
-            value=1,
-            step=1,
-            key="page_subjects"
-        )
+    if revisions["revised_groups"] == 0:
+        st.success(f"✅ El corte {new} no cambia ninguna cifra del corte {old}")
+        return
 
-        start = (page - 1) * rows_per_page
-        end = start + rows_per_page
+    if revisions["by_year_department"] is not None:
+        st.plotly_chart(revisions_heatmap(revisions["by_year_department"], measure, theme), use_container_width=True)
+    st.plotly_chart(revisions_year_bar(revisions["by_year"], measure, theme), use_container_width=True)
 
-        page_df = df_subjects[start:end].to_pandas()
+    with st.expander(f"📋 Grupos con mayor revisión ({revisions['top'].shape[0]})"):
+        top = revisions["top"].to_pandas()
+        st.dataframe(top.style.format({col: "{:+,.0f}" if col.startswith("Δ") else "{:,.0f}"
+                                       for col in top.select_dtypes(include=['float64', 'int64']).columns
+                                       if col != "Vigencia"}),
+                     width="stretch", hide_index=True)
 
-        st.dataframe(
-            page_df.style.format({
-                col: "{:,.0f}" for col in page_df.select_dtypes(include=['float64', 'int64']).columns
-            }),
-            use_container_width=True,
-            height=400
-        )
 
-        st.caption(f"Mostrando filas {start + 1} a {min(end, total_rows)} de {total_rows:,}")
+def _delta_style(df):
+    """Formato de miles para los valores y con signo para las diferencias"""
+    formats = {}
+    for col in df.select_dtypes(include=['float64', 'int64']).columns:
+        formats[col] = "{:+,.1f}%" if col.endswith("(%)") else "{:+,.0f}" if col.startswith("Δ") else "{:,.0f}"
+    return df.style.format(formats, na_rep="—")
+
+
+@traced()
+def create_comparison(compared: dict, theme: str):
+    """Porciones lado a lado: indicadores con sus diferencias y gráficas pareadas"""
+    labels = list(compared)
+    if len(labels) < 2:
+        st.info("Defina al menos dos porciones en el panel lateral para comparar")
+        return
+
+    st.markdown(f"Diferencias frente a **{labels[0]}**")
+    base = compared[labels[0]]["kpis"]
+    for col, label in zip(st.columns(len(labels)), labels):
+        kpis = compared[label]["kpis"]
+        with col:
+            st.markdown(f"**{label}**")
+            for kpi, name in KPI_LABELS.items():
+                if kpi not in kpis:
+                    continue
+                delta = kpis[kpi] - base[kpi] if label != labels[0] and kpi in base else None
+                st.metric(name, f"{kpis[kpi]:,}", f"{delta:+,}" if delta is not None else None)
+
+    with st.expander("📋 Tabla de indicadores por porción"):
+        st.dataframe(_delta_style(kpi_deltas(compared).to_pandas()), width="stretch", hide_index=True)
+
+    for title, path, dim, measure, kind in COMPARE_CHARTS:
+        long = comparison_frame(compared, path, dim, measure)
+        if long is None or long.shape[0] == 0:
+            continue
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            builder = comparison_lines if kind == "line" else comparison_bars
+            st.plotly_chart(builder(long, dim, measure, title, theme), use_container_width=True)
+        with col2:
+            deltas = dimension_deltas(long, dim, measure, labels, by_dimension=kind == "line")
+            st.dataframe(_delta_style(deltas.to_pandas()), width="stretch", height=400, hide_index=True)
+
+    st.caption("ℹ️ Los gráficos con top N muestran vacío (—) el valor que no entra en el top de una porción.")
+
+
+def create_sql_console(version: str, key: tuple):
+    """Consola SQL sobre los datasets registrados, con los filtros activos aplicados"""
+
+    with st.expander("📚 Tablas y columnas disponibles"):
+        for name, columns in table_columns(version).items():
+            st.markdown(f"**{name}** ({dataset_label(name)})")
+            st.caption(", ".join(f'"{col}" ({dtype})' for col, dtype in columns.items()))
+        st.caption("Las columnas key_* usan el diccionario compartido entre datasets: agrupar o filtrar por "
+                   "ellas es más rápido que por las columnas de texto.")
 
-        csv = df_subjects.to_pandas().to_csv(index=False).encode('utf-8')
+    query = st.text_area(
+        "Consulta (SELECT o WITH):",
+        value='SELECT ESTADO_DEPTO, SUM("Personas que llegaron") AS llegadas\n'
+              'FROM arrivals\nGROUP BY ESTADO_DEPTO\nORDER BY llegadas DESC',
+        height=150,
+        key="sql_query"
+    )
+    if not st.button("▶️ Ejecutar consulta", key="sql_run"):
+        st.caption(f"Las consultas ven solo los datos filtrados; máximo {SQL_ROW_LIMIT:,} filas "
+                   f"y {SQL_TIMEOUT:g} s por consulta.")
+        return
+
+    try:
+        result = run_sql(version, query, key)
+    except SQLError as e:
+        st.error(f"❌ {e}")
+        return
+    except MemoryPressure as e:
+        st.warning(f"⚠️ El servidor está con poca memoria, intente de nuevo en unos segundos ({e})")
+        return
+
+    df = result["data"]
+    st.dataframe(df.to_pandas(), width="stretch", height=400)
+    source = "caché" if result["cached"] else f"{result['elapsed'] * 1000:,.0f} ms"
+    st.caption(f"{df.shape[0]:,} filas · {source}")
+    if result["truncated"]:
+        st.warning(f"⚠️ El resultado se cortó en {SQL_ROW_LIMIT:,} filas; agregue filtros, GROUP BY o LIMIT")
+    st.download_button(
+        label="📥 Descargar resultado (CSV)",
+        data=df.write_csv().encode('utf-8'),
+        file_name='consulta_sql.csv',
+        mime='text/csv',
+        key="sql_download"
+    )
+
+
+def _detailed_table(version: str, dataset: str, key: tuple, file_name: str):
+    """Tabla paginada en el servidor con orden por columna y búsqueda en los textos"""
+    columns = detail_columns(version, dataset)
+
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        search = st.text_input("Buscar en columnas de texto:", key=f"search_{dataset}").strip()
+    with col2:
+        sort_column = st.selectbox("Ordenar por:", ["(orden original)", *columns], key=f"sort_{dataset}")
+    with col3:
+        descending = st.radio("Sentido:", ["Asc.", "Desc."], horizontal=True, key=f"order_{dataset}") == "Desc."
+    sort = None if sort_column not in columns else (sort_column, descending)
+
+    # La vista puede quedar con menos páginas que la página elegida: el selector
+    # muestra la página que table_page usó en su lugar (la última)
+    result = table_page(version, dataset, key, st.session_state.get(f"page_{dataset}", 1), search, sort)
+    total_pages = page_count(result["rows"])
+    st.session_state[f"page_{dataset}"] = result["page"]
+    st.number_input("Página:", min_value=1, max_value=total_pages, step=1, key=f"page_{dataset}")
+
+    st.dataframe(
+        result["data"],
+        column_config={col: st.column_config.NumberColumn(format="localized")
+                       for col, numeric in columns.items() if numeric},
+        width="stretch",
+        height=400
+    )
+    if result["rows"]:
+        st.caption(f"Mostrando filas {result['first'] + 1} a {result['first'] + result['data'].shape[0]} "
+                   f"de {result['rows']:,} · {result['elapsed'] * 1000:,.0f} ms")
+    else:
+        st.caption("Ninguna fila coincide con los filtros y la búsqueda")
+
+    # El CSV completo de la vista solo se arma si se pide
+    if st.button("📥 Preparar descarga (CSV)", key=f"prepare_{dataset}"):
         st.download_button(
-            label="📥 Descargar datos completos (CSV)",
-            data=csv,
-            file_name='victimas_hechos.csv',
+            label="📥 Descargar datos de la vista (CSV)",
+            data=view_frame(version, dataset, key, search, sort).write_csv().encode('utf-8'),
+            file_name=file_name,
             mime='text/csv',
+            key=f"download_{dataset}"
         )
 
+
+def create_detailed_tables(version: str, key: tuple):
+    """Muestra tablas detalladas paginadas en el servidor"""
+
+    tab1, tab2 = st.tabs(["📋 Hechos Victimizantes", "📍 Llegadas"])
+
+    with tab1:
+        st.markdown("##### Tabla Detallada: Víctimas por Hecho Victimizante")
+        _detailed_table(version, "subjects", key, 'victimas_hechos.csv')
+
     with tab2:
         st.markdown("##### Tabla Detallada: Llegadas por Departamento")
+        _detailed_table(version, "arrivals", key, 'llegadas_departamentos.csv')
 
-        rows_per_page = 50
-        total_rows = df_arrivals.shape[0]
-        total_pages = max((total_rows + rows_per_page - 1) // rows_per_page, 1)
-
-        page = st.number_input(
-            "Página:",
-            min_value=1,
-            max_value=total_pages,
-            value=1,
-            step=1,
-            key="page_arrivals"
-        )
-
-        start = (page - 1) * rows_per_page
-        end = start + rows_per_page
 
-        page_df = df_arrivals[start:end].to_pandas()
+def create_debug_panel(trace: dict, imports: dict | None = None):
+    """Muestra el árbol de spans del rerun actual (tiempos y filas) y los tiempos de arranque"""
+    spans = pl.DataFrame(flatten_trace(trace))
 
+    with st.expander(f"🐞 Traza del rerun {trace['trace_id']} — {trace['wall_ms']:,.0f} ms", expanded=True):
+        table = spans.select(
+            (pl.lit("　").repeat_by(pl.col("depth")).list.join("") + pl.col("span")).alias("Span"),
+            pl.col("wall_ms").alias("Pared (ms)"),
+            pl.col("cpu_ms").alias("CPU (ms)"),
+            pl.col("rows_in").alias("Filas entrada"),
+            pl.col("rows").alias("Filas salida"),
+        )
         st.dataframe(
-            page_df.style.format({
-                col: "{:,.0f}" for col in page_df.select_dtypes(include=['float64', 'int64']).columns
-            }),
+            table.to_pandas().style.format({"Pared (ms)": "{:,.1f}", "CPU (ms)": "{:,.1f}",
+                                            "Filas entrada": "{:,.0f}", "Filas salida": "{:,.0f}"},
+                                           na_rep="-"),
             use_container_width=True,
-            height=400
+            hide_index=True
         )
 
-        st.caption(f"Mostrando filas {start + 1} a {min(end, total_rows)} de {total_rows:,}")
+        slowest = spans.filter(pl.col("depth") > 0).sort("wall_ms", descending=True).head(3)
+        if slowest.shape[0] > 0:
+            st.caption("Más lentos: " + ", ".join(
+                f"{row['span']} ({row['wall_ms']:,.0f} ms)" for row in slowest.iter_rows(named=True)
+            ))
 
-        csv = df_arrivals.to_pandas().to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Descargar datos completos (CSV)",
-            data=csv,
-            file_name='llegadas_departamentos.csv',
-            mime='text/csv',
-        )
+        marks = trace["attrs"].get("marks", {})
+        if marks:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Sidebar listo", f"{marks.get('sidebar', 0):,.0f} ms")
+            col2.metric("Página interactiva", f"{marks.get('interactive', 0):,.0f} ms")
+            col3.metric("Desde el arranque del proceso", f"{trace['attrs'].get('process_ms', 0):,.0f} ms")
+
+        if imports:
+            st.markdown("**Importaciones diferidas**")
+            st.dataframe(
+                pl.DataFrame([{"Módulo": name, "Importación (ms)": info["ms"], "Hilo": info["thread"]}
+                              for name, info in imports.items()]).to_pandas(),
+                use_container_width=True,
+                hide_index=True
+            )
+
+
+def create_admin_panel(stats: dict, session_mb: float, budget: dict | None = None, queue: dict | None = None):
+    """Muestra los datasets compartidos del proceso, su uso de memoria, el presupuesto y la cola de consultas"""
+    with st.expander("🛠️ Administración: memoria y datasets compartidos", expanded=True):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Memoria del proceso", f"{stats['rss_mb']:,.0f} MB")
+        col2.metric("Datasets compartidos", f"{stats['shared_mb']:,.0f} MB")
+        col3.metric("Sesiones activas", f"{sum(d['sessions'] for d in stats['datasets']):,}")
+        col4.metric("Datos propios de esta sesión", f"{session_mb:,.1f} MB",
+                    help="Tamaño estimado de los datos filtrados; sin filtros la sesión comparte el dataset")
+
+        if stats["datasets"]:
+            table = pl.DataFrame(stats["datasets"]).select(
+                pl.col("version").alias("Versión"),
+                pl.when(pl.col("current")).then(pl.lit("Actual")).otherwise(pl.lit("Anterior")).alias("Estado"),
+                pl.col("sessions").alias("Sesiones"),
+                pl.col("rows").alias("Filas"),
+                pl.col("size_mb").round(1).alias("Tamaño (MB)"),
+                pl.from_epoch(pl.col("loaded_at").cast(pl.Int64)).alias("Cargado"),
+                pl.col("load_seconds").round(2).alias("Carga (s)"),
+            )
+            st.dataframe(table.to_pandas(), use_container_width=True, hide_index=True)
+
+        if budget is not None:
+            st.markdown("**Presupuesto de memoria**")
+            st.progress(min(budget["ratio"], 1.0),
+                        text=f"{budget['used_mb']:,.0f} MB estimados de {budget['budget_mb']:,.0f} MB "
+                             f"({budget['ratio']:.0%})")
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Caché de resultados", f"{budget['cache_mb']:,.1f} MB")
+            col2.metric("Volcado a disco", f"{budget['spill_mb']:,.1f} MB")
+            col3.metric("Datos de sesiones", f"{budget['sessions_mb']:,.1f} MB",
+                        help=f"{budget['sessions']} sesiones activas en los últimos minutos")
+            col4.metric("Consultas rechazadas", f"{budget['rejected']:,}")
+
+        if queue is not None:
+            st.markdown("**Cola de consultas**")
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("En cola", f"{queue['queue_depth']:,}")
+            col2.metric("En curso", f"{queue['running']:,}",
+                        help=f"Máximo {queue['max_heavy']} consultas pesadas a la vez, más un cupo para KPIs")
+            col3.metric("Completadas", f"{queue['completed']:,}")
+            col4.metric("Compartidas", f"{queue['merged']:,}",
+                        help="Consultas idénticas que esperaron el resultado de otra en curso")
+            table = pl.DataFrame([{"Prioridad": name, **values} for name, values in queue["classes"].items()])
+            table = table.select(
+                pl.col("Prioridad"),
+                pl.col("waiting").alias("En cola"),
+                pl.col("running").alias("En curso"),
+                pl.col("wait_p50_ms").round(1).alias("Espera p50 (ms)"),
+                pl.col("wait_p95_ms").round(1).alias("Espera p95 (ms)"),
+                pl.col("wait_max_ms").round(1).alias("Espera máx. (ms)"),
+            )
+            st.dataframe(table.to_pandas(), use_container_width=True, hide_index=True)